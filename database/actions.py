@@ -146,4 +146,41 @@ def update_action_acknowledged_all():
         return False
     finally:
         if 'conn' in locals() and conn:
-            disconnect_from_db(conn)
\ No newline at end of file
+            disconnect_from_db(conn)
+
+def get_error_reports():
+    """
+    Retrieve the number of errors logged per signature by all processes.
+
+    Returns:
+        list: A list of dictionaries with the signature, location, latest message,
+              count, first_seen and last_seen of each error, most frequent first.
+              Returns an empty list if no data is found or an error occurs.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        conn = connect_to_db("errorreports", read_only=True)
+        if not conn:
+            log_error(logger, "[ERROR] Unable to connect to actions database.")
+            return []
+
+        cursor = conn.cursor()
+        rows, _ = run_timed_query(
+            cursor,
+            """
+            SELECT signature, script_name, file_name, line_number, message, count, first_seen, last_seen
+            FROM errorreports
+            ORDER BY count DESC
+            """,
+            description="get_error_reports",
+            fetch_all=True
+        )
+        columns = ["signature", "script_name", "file_name", "line_number", "message", "count", "first_seen", "last_seen"]
+        return [dict(zip(columns, row)) for row in rows]
+
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Database error while retrieving error reports: {e}")
+        return []
+    finally:
+        if 'conn' in locals() and conn:
+            disconnect_from_db(conn)
@@ -10,85 +10,73 @@ if parent_dir not in sys.path:
 sys.path.insert(0, "/database")
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from init import *
+import atexit
+from collections import OrderedDict
+from database.core import connect_to_attached_dbs
 
-def summarize_alerts_by_ip_last_seen():
+def _summarize_alerts_by_ip_hours(time_column, description):
     """
-    Summarize alerts by IP address over the last 12 hours in one-hour increments.
-    Returns results for every hour whether there were alerts or not.
+    Count alerts per local host and hour over the last 12 hours with a single
+    statement joining localhosts.db and alerts.db.
+
+    Args:
+        time_column (str): Alert timestamp to bucket by, "first_seen" or "last_seen".
+        description (str): Query description for the performance telemetry.
 
     Returns:
-        dict: A dictionary where the main key is the IP address, and the value is another dictionary
-            with the key "alert_intervals" containing an array of 12 values representing the count
-            of alerts for each one-hour interval, sorted from oldest to most recent.
+        dict: IP address -> {"alert_intervals": [12 hourly counts, oldest first]}.
     """
     logger = logging.getLogger(__name__)
     intervals = 12
+    now = datetime.now()
+    start_time = now - timedelta(hours=intervals)
 
-    # Step 1: Get all IPs from localhosts database
     try:
-        conn_localhosts = connect_to_db( "localhosts")
-        if not conn_localhosts:
-            log_error(logger, "[ERROR] Unable to connect to localhosts database.")
-            return {"error": "Unable to connect to localhosts database"}
-        cursor_localhosts = conn_localhosts.cursor()
-        cursor_localhosts.execute("SELECT DISTINCT ip_address FROM localhosts")
-        all_ips_rows = cursor_localhosts.fetchall()
-        all_ips = [row[0] for row in all_ips_rows]
-        disconnect_from_db(conn_localhosts)
-    except Exception as e:
-        log_error(logger, f"[ERROR] Error getting IPs from localhosts: {e}")
-        return {"error": str(e)}
-
-    # Step 2: Get alerts from alerts database
-    try:
-        conn_alerts = connect_to_db( "alerts")
-        if not conn_alerts:
-            log_error(logger, "[ERROR] Unable to connect to alerts database.")
-            return {"error": "Unable to connect to alerts database"}
-        cursor_alerts = conn_alerts.cursor()
-        now = datetime.now()
-        start_time = now - timedelta(hours=intervals)
-        alerts_query = """
-            SELECT ip_address, strftime('%Y-%m-%d %H:00:00', last_seen) as hour, COUNT(*)
-            FROM alerts
-            WHERE last_seen >= ?
-            GROUP BY ip_address, hour
-            ORDER BY ip_address, hour
-        """
-        cursor_alerts.execute(alerts_query, (start_time.strftime('%Y-%m-%d %H:%M:%S'),))
-        alerts_by_hour_rows = cursor_alerts.fetchall()
-        disconnect_from_db(conn_alerts)
+        conn = connect_to_attached_dbs(["localhosts", "alerts"], read_only=True)
+        if not conn:
+            log_error(logger, "[ERROR] Unable to connect to localhosts and alerts databases.")
+            return {"error": "Unable to connect to localhosts and alerts databases"}
+        cursor = conn.cursor()
+        rows, _ = run_timed_query(
+            cursor,
+            f"""
+            SELECT l.ip_address, strftime('%Y-%m-%d %H:00:00', a.{time_column}) AS hour, COUNT(a.id)
+            FROM localhosts.localhosts l
+            LEFT JOIN alerts.alerts a
+                ON a.ip_address = l.ip_address AND a.{time_column} >= ?
+            GROUP BY l.ip_address, hour
+            """,
+            params=(start_time.strftime('%Y-%m-%d %H:%M:%S'),),
+            description=description,
+            fetch_all=True
+        )
+        disconnect_from_db(conn)
     except Exception as e:
-        log_error(logger, f"[ERROR] Error getting alerts from alerts database: {e}")
+        log_error(logger, f"[ERROR] Error getting alerts by localhost: {e}")
         return {"error": str(e)}
 
-    # Step 3: Generate all hour intervals for the past 12 hours
-    hour_intervals = []
+    # Generate all hour intervals for the past 12 hours
+    hour_intervals = {}
     for i in range(intervals):
         interval_time = now - timedelta(hours=intervals-i-1)
-        hour_intervals.append(interval_time.strftime('%Y-%m-%d %H:00:00'))
+        hour_intervals[interval_time.strftime('%Y-%m-%d %H:00:00')] = i
 
-    # Step 4: Initialize the result dictionary with all IPs and all hours
     result = {}
-    for ip in all_ips:
-        result[ip] = {"alert_intervals": [0] * intervals}
-
-    # Step 5: Fill in the actual alert counts where they exist
-    for row in alerts_by_hour_rows:
-        ip_address = row[0]
-        hour = row[1]
-        count = row[2]
-        if ip_address in all_ips:
-            try:
-                hour_index = hour_intervals.index(hour)
-                result[ip_address]["alert_intervals"][hour_index] = count
-            except ValueError:
-                log_warn(logger, f"Hour {hour} not found in generated intervals")
-
-    log_info(logger, f"[INFO] Generated alert summary for {len(all_ips)} IPs")
+    for ip_address, hour, count in rows:
+        entry = result.setdefault(ip_address, {"alert_intervals": [0] * intervals})
+        if hour is None:
+            continue
+        hour_index = hour_intervals.get(hour)
+        if hour_index is None:
+            log_warn(logger, f"Hour {hour} not found in generated intervals")
+            continue
+        entry["alert_intervals"][hour_index] = count
+
+    log_info(logger, f"[INFO] Generated alert summary for {len(result)} IPs")
     return result
 
-def summarize_alerts_by_ip():
+
+def summarize_alerts_by_ip_last_seen():
     """
     Summarize alerts by IP address over the last 12 hours in one-hour increments.
     Returns results for every hour whether there were alerts or not.
@@ -98,72 +86,20 @@ def summarize_alerts_by_ip():
             with the key "alert_intervals" containing an array of 12 values representing the count
             of alerts for each one-hour interval, sorted from oldest to most recent.
     """
-    logger = logging.getLogger(__name__)
-    intervals = 12
+    return _summarize_alerts_by_ip_hours("last_seen", "summarize_alerts_by_ip_last_seen")
 
-    # Step 1: Get all IPs from localhosts database
-    try:
-        conn_localhosts = connect_to_db( "localhosts")
-        if not conn_localhosts:
-            log_error(logger, "[ERROR] Unable to connect to localhosts database.")
-            return {"error": "Unable to connect to localhosts database"}
-        cursor_localhosts = conn_localhosts.cursor()
-        cursor_localhosts.execute("SELECT DISTINCT ip_address FROM localhosts")
-        all_ips_rows = cursor_localhosts.fetchall()
-        all_ips = [row[0] for row in all_ips_rows]
-        disconnect_from_db(conn_localhosts)
-    except Exception as e:
-        log_error(logger, f"[ERROR] Error getting IPs from localhosts: {e}")
-        return {"error": str(e)}
-
-    # Step 2: Get alerts from alerts database
-    try:
-        conn_alerts = connect_to_db( "alerts")
-        if not conn_alerts:
-            log_error(logger, "[ERROR] Unable to connect to alerts database.")
-            return {"error": "Unable to connect to alerts database"}
-        cursor_alerts = conn_alerts.cursor()
-        now = datetime.now()
-        start_time = now - timedelta(hours=intervals)
-        alerts_query = """
-            SELECT ip_address, strftime('%Y-%m-%d %H:00:00', first_seen) as hour, COUNT(*)
-            FROM alerts
-            WHERE first_seen >= ?
-            GROUP BY ip_address, hour
-            ORDER BY ip_address, hour
-        """
-        cursor_alerts.execute(alerts_query, (start_time.strftime('%Y-%m-%d %H:%M:%S'),))
-        alerts_by_hour_rows = cursor_alerts.fetchall()
-        disconnect_from_db(conn_alerts)
-    except Exception as e:
-        log_error(logger, f"[ERROR] Error getting alerts from alerts database: {e}")
-        return {"error": str(e)}
 
-    # Step 3: Generate all hour intervals for the past 12 hours
-    hour_intervals = []
-    for i in range(intervals):
-        interval_time = now - timedelta(hours=intervals-i-1)
-        hour_intervals.append(interval_time.strftime('%Y-%m-%d %H:00:00'))
+def summarize_alerts_by_ip():
+    """
+    Summarize alerts by IP address over the last 12 hours in one-hour increments.
+    Returns results for every hour whether there were alerts or not.
 
-    # Step 4: Initialize the result dictionary with all IPs and all hours
-    result = {}
-    for ip in all_ips:
-        result[ip] = {"alert_intervals": [0] * intervals}
-
-    # Step 5: Fill in the actual alert counts where they exist
-    for row in alerts_by_hour_rows:
-        ip_address = row[0]
-        hour = row[1]
-        count = row[2]
-        if ip_address in all_ips:
-            try:
-                hour_index = hour_intervals.index(hour)
-                result[ip_address]["alert_intervals"][hour_index] = count
-            except ValueError:
-                log_warn(logger, f"Hour {hour} not found in generated intervals")
-
-    log_info(logger, f"[INFO] Generated alert summary for {len(all_ips)} IPs")
-    return result
+    Returns:
+        dict: A dictionary where the main key is the IP address, and the value is another dictionary
+            with the key "alert_intervals" containing an array of 12 values representing the count
+            of alerts for each one-hour interval, sorted from oldest to most recent.
+    """
+    return _summarize_alerts_by_ip_hours("first_seen", "summarize_alerts_by_ip")
 
 def get_hourly_alerts_summary(ip_address, start_time=None):
     """
@@ -184,7 +120,7 @@ def get_hourly_alerts_summary(ip_address, start_time=None):
     
     try:
         # Connect to the alerts database
-        conn = connect_to_db( "alerts")
+        conn = connect_to_db("alerts", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to alerts database.")
             return []
@@ -240,7 +176,7 @@ def get_all_alerts_by_ip(ip_address):
     
     try:
         # Connect to the alerts database
-        conn = connect_to_db( "alerts")
+        conn = connect_to_db("alerts", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to alerts database.")
             return []
@@ -345,7 +281,7 @@ def get_recent_alerts_database():
     
     try:
         # Connect to the alerts database
-        conn = connect_to_db( "alerts")
+        conn = connect_to_db("alerts", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to alerts database.")
             return []
@@ -424,10 +360,99 @@ def delete_alert_database(alert_id):
         if 'conn' in locals() and conn:
             disconnect_from_db(conn)
 
-def log_alert_to_db(ip_address, flow, category, alert_enrichment_1, alert_enrichment_2, alert_id_hash, realert=False):
+# In-memory alert dedupe state, shared by every handle_alert call in this process
+_known_alerts = OrderedDict()       # alert id -> [ip_address, category, pending times_seen increment]
+_alert_rate_windows = {}            # (ip_address, category) -> [window start, distinct alerts written]
+_alert_suppression_counters = {}    # (ip_address, category) -> [merged, suppressed] not yet flushed
+_last_alert_flush = time.time()
+_alert_flush_registered = False
+
+
+def _count_suppression(ip_address, category, merged=0, suppressed=0):
+    counters = _alert_suppression_counters.setdefault((ip_address, category), [0, 0])
+    counters[0] += merged
+    counters[1] += suppressed
+
+
+def flush_pending_alerts(force=False, config_dict=None):
+    """
+    Write the times_seen increments merged in memory by log_alert_to_db, along
+    with the merged/suppressed counters, in a single alerts transaction.
+
+    Args:
+        force (bool): Flush even if AlertDedupeFlushInterval has not elapsed.
+        config_dict (dict): Optional configuration dictionary.
+
+    Returns:
+        int: Number of alerts whose times_seen was updated, or -1 on error.
+    """
+    global _last_alert_flush
+    logger = logging.getLogger(__name__)
+
+    flush_interval = int((config_dict or {}).get('AlertDedupeFlushInterval', 60))
+    if not force and time.time() - _last_alert_flush < flush_interval:
+        return 0
+    _last_alert_flush = time.time()
+
+    updates = [(entry[2], alert_id) for alert_id, entry in _known_alerts.items() if entry[2] > 0]
+    counters = [(ip_address, category, merged, suppressed)
+                for (ip_address, category), (merged, suppressed) in _alert_suppression_counters.items()]
+    if not updates and not counters:
+        return 0
+
+    conn = connect_to_db("alerts")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to alerts database.")
+        return -1
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        for increment, alert_id in updates:
+            cursor.execute("""
+                UPDATE alerts
+                SET times_seen = times_seen + ?, last_seen = datetime('now', 'localtime')
+                WHERE id = ?
+            """, (increment, alert_id))
+            if cursor.rowcount == 0:
+                # Alert was deleted through the API, let its next occurrence insert it again
+                _known_alerts.pop(alert_id, None)
+            else:
+                _known_alerts[alert_id][2] = 0
+
+        cursor.executemany("""
+            INSERT INTO alertsuppression (ip_address, category, merged, suppressed, last_updated)
+            VALUES (?, ?, ?, ?, datetime('now', 'localtime'))
+            ON CONFLICT(ip_address, category)
+            DO UPDATE SET
+                merged = merged + excluded.merged,
+                suppressed = suppressed + excluded.suppressed,
+                last_updated = excluded.last_updated
+        """, counters)
+        conn.commit()
+        _alert_suppression_counters.clear()
+
+        suppressed_total = sum(row[3] for row in counters)
+        log_info(logger, f"[INFO] Flushed {len(updates)} merged alert updates, {suppressed_total} alerts suppressed by rate limit since last flush.")
+        return len(updates)
+
+    except sqlite3.Error as e:
+        conn.rollback()
+        log_error(logger, f"[ERROR] Error flushing pending alert updates: {e}")
+        return -1
+    finally:
+        disconnect_from_db(conn)
+
+
+def log_alert_to_db(ip_address, flow, category, alert_enrichment_1, alert_enrichment_2, alert_id_hash, realert=False, config_dict=None):
     """
     Logs an alert to the alerts.db SQLite database and indicates whether it was an insert or an update.
 
+    Repeats of an alert already written by this process are merged in memory and
+    their times_seen is updated by flush_pending_alerts every AlertDedupeFlushInterval
+    seconds and on exit. At most AlertRateLimitPerHostCategory distinct alerts are written per
+    host and category in each interval, further ones are counted as suppressed.
+
     Args:
         ip_address (str): The IP address associated with the alert.
         flow (dict): The flow data as a dictionary.
@@ -436,11 +461,41 @@ def log_alert_to_db(ip_address, flow, category, alert_enrichment_1, alert_enrich
         alert_enrichment_2 (str): Additional enrichment data for the alert.
         alert_id_hash (str): A unique hash for the alert.
         realert (bool): Whether this is a re-alert.
+        config_dict (dict): Optional configuration dictionary with the dedupe settings.
 
     Returns:
-        str: "insert" if a new row was inserted, "update" if an existing row was updated, or "error" if an error occurred.
+        str: "insert" if a new row was inserted, "update" if an existing row was updated,
+             "suppressed" if the rate limit dropped the alert, or "error" if an error occurred.
     """
+    global _alert_flush_registered
     logger = logging.getLogger(__name__)
+    config_dict = config_dict or {}
+    flush_interval = int(config_dict.get('AlertDedupeFlushInterval', 60))
+    rate_limit = int(config_dict.get('AlertRateLimitPerHostCategory', 100))
+    now = time.time()
+
+    if flush_interval > 0:
+        if not _alert_flush_registered:
+            # Write out the merged counts on shutdown instead of losing up to a flush interval
+            atexit.register(flush_pending_alerts, True)
+            _alert_flush_registered = True
+
+        known = _known_alerts.get(alert_id_hash)
+        if known:
+            known[2] += 1
+            _known_alerts.move_to_end(alert_id_hash)
+            _count_suppression(ip_address, category, merged=1)
+            flush_pending_alerts(config_dict=config_dict)
+            return "update"
+
+        window = _alert_rate_windows.get((ip_address, category))
+        if not window or now - window[0] >= flush_interval:
+            window = _alert_rate_windows[(ip_address, category)] = [now, 0]
+        if rate_limit > 0 and window[1] >= rate_limit:
+            _count_suppression(ip_address, category, suppressed=1)
+            flush_pending_alerts(config_dict=config_dict)
+            return "suppressed"
+
     try:
         conn = connect_to_db( "alerts")
         if not conn:
@@ -449,25 +504,37 @@ def log_alert_to_db(ip_address, flow, category, alert_enrichment_1, alert_enrich
 
         cursor = conn.cursor()
 
-        # Execute the insert or update query
+        # Insert the alert, the row count tells a new alert from a repeat (connection
+        # totals such as total_changes keep counting across pooled uses)
         cursor.execute("""
             INSERT INTO alerts (id, ip_address, flow, category, alert_enrichment_1, alert_enrichment_2, times_seen, first_seen, last_seen, acknowledged)
             VALUES (?, ?, ?, ?, ?, ?, 1, datetime('now', 'localtime'), datetime('now', 'localtime'), 0)
-            ON CONFLICT(id)
-            DO UPDATE SET
-                times_seen = times_seen + 1,
-                last_seen = datetime('now', 'localtime')
+            ON CONFLICT(id) DO NOTHING
         """, (alert_id_hash, ip_address, json.dumps(flow), category, alert_enrichment_1, alert_enrichment_2))
 
-        # Check the number of rows affected
-        if conn.total_changes == 1:
+        if cursor.rowcount == 1:
             operation = "insert"
             log_info(logger, f"[INFO] Alert logged to database for IP: {ip_address}, Category: {category} ({operation}).")
         else:
+            cursor.execute("""
+                UPDATE alerts
+                SET times_seen = times_seen + 1,
+                    last_seen = datetime('now', 'localtime')
+                WHERE id = ?
+            """, (alert_id_hash,))
             operation = "update"
 
         conn.commit()
-        
+
+        if flush_interval > 0:
+            window[1] += 1
+            _known_alerts[alert_id_hash] = [ip_address, category, 0]
+            if len(_known_alerts) > CONST_ALERT_DEDUPE_MAX_ENTRIES:
+                # Write out pending increments before forgetting the oldest alert ids
+                flush_pending_alerts(force=True, config_dict=config_dict)
+                while len(_known_alerts) > CONST_ALERT_DEDUPE_MAX_ENTRIES:
+                    _known_alerts.popitem(last=False)
+
         return operation
 
     except sqlite3.Error as e:
@@ -477,6 +544,49 @@ def log_alert_to_db(ip_address, flow, category, alert_enrichment_1, alert_enrich
         if 'conn' in locals() and conn:
             disconnect_from_db(conn)
 
+
+def get_alert_suppression_counters():
+    """
+    Retrieve the number of alerts merged and suppressed per host and category.
+
+    Returns:
+        list: A list of dictionaries with ip_address, category, merged, suppressed
+              and last_updated, ordered by suppressed count. Empty list on error.
+    """
+    logger = logging.getLogger(__name__)
+    conn = connect_to_db("alerts", read_only=True)
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to alerts database.")
+        return []
+
+    try:
+        cursor = conn.cursor()
+        rows, _ = run_timed_query(
+            cursor,
+            """
+            SELECT ip_address, category, merged, suppressed, last_updated
+            FROM alertsuppression
+            ORDER BY suppressed DESC, merged DESC
+            """,
+            description="get_alert_suppression_counters",
+            fetch_all=True
+        )
+        return [
+            {
+                "ip_address": row[0],
+                "category": row[1],
+                "merged": row[2],
+                "suppressed": row[3],
+                "last_updated": row[4]
+            }
+            for row in rows
+        ]
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error retrieving alert suppression counters: {e}")
+        return []
+    finally:
+        disconnect_from_db(conn)
+
 def get_alerts_summary():
     """
     Get a summary of alerts by category from alerts.db.
@@ -542,7 +652,7 @@ def get_recent_alerts_by_ip(ip_address):
     
     try:
         # Connect to the alerts database
-        conn = connect_to_db( "alerts")
+        conn = connect_to_db("alerts", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to alerts database.")
             return []
@@ -605,7 +715,7 @@ def get_all_alerts():
     """
     logger = logging.getLogger(__name__)
     try:
-        conn = connect_to_db( "alerts")
+        conn = connect_to_db("alerts", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to alerts database.")
             return []
@@ -662,7 +772,7 @@ def get_alerts_by_category(category_name):
     
     try:
         # Connect to the alerts database
-        conn = connect_to_db( "alerts")
+        conn = connect_to_db("alerts", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to alerts database.")
             return []
@@ -745,7 +855,7 @@ def update_alert_acknowledgment(alert_id, acknowledged):
 def get_all_alerts_by_category(category):
     logger = logging.getLogger(__name__)
     try:
-        conn = connect_to_db( "alerts")
+        conn = connect_to_db("alerts", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to alerts database")
             return []
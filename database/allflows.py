@@ -10,10 +10,16 @@ if parent_dir not in sys.path:
 sys.path.insert(0, "/database")
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from init import *
-from database.core import run_timed_query
+from database.core import run_timed_query, insert_dbperformance
+from database.tagdictionary import tags_to_mask, get_overflow_tags, get_tag_mask
 
 def update_all_flows(rows, config_dict):
-    """Update allflows.db with the rows from newflows.db."""
+    """
+    Update allflows.db with the rows from newflows.db.
+
+    Rows are pre-aggregated by primary key in memory and written with a single
+    executemany inside one transaction, using one bound timestamp for the batch.
+    """
     logger = logging.getLogger(__name__)
     conn = connect_to_db( "allflows")
     total_packets = 0
@@ -21,29 +27,80 @@ def update_all_flows(rows, config_dict):
 
     if conn:
         try:
-            allflows_cursor = conn.cursor()
+            start_time = time.time()
+
+            # Merge rows sharing the same 5-tuple so each key is written once
+            aggregated = {}
             for row in rows:
-                src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes_, flow_start, flow_end, last_seen, times_seen, tags = row
+                src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes_, flow_start, flow_end, last_seen, times_seen, tags = row[:12]
+                # Rows read from newflows carry tag_mask as a 13th column
+                tag_mask = row[12] if len(row) > 12 and row[12] is not None else tags_to_mask(tags)
                 total_packets += packets
                 total_bytes += bytes_
 
-                # Use datetime('now', 'localtime') for the current timestamp
-                allflows_cursor.execute("""
-                    INSERT INTO allflows (
-                        src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes, flow_start, flow_end, times_seen, last_seen, tags
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), datetime('now', 'localtime'), 1, datetime('now', 'localtime'), ?)
-                    ON CONFLICT(src_ip, dst_ip, src_port, dst_port, protocol)
-                    DO UPDATE SET
-                        packets = packets + excluded.packets,
-                        bytes = bytes + excluded.bytes,
-                        flow_end = excluded.flow_end,
-                        times_seen = times_seen + 1,
-                        last_seen = datetime('now', 'localtime'),
-                        tags = excluded.tags
-                """, (src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes_, tags))
+                key = (src_ip, dst_ip, src_port, dst_port, protocol)
+                existing = aggregated.get(key)
+                if existing:
+                    existing[0] += packets
+                    existing[1] += bytes_
+                    existing[2] += 1
+                    existing[3] = tags
+                    existing[4] = tag_mask
+                else:
+                    aggregated[key] = [packets, bytes_, 1, tags, tag_mask]
+
+            # allflowscompact stores IPv4 addresses as integers and epoch second timestamps
+            now = int(time.time())
+            batch = []
+            skipped = 0
+            for (src_ip, dst_ip, src_port, dst_port, protocol), (packets, bytes_, seen, tags, tag_mask) in aggregated.items():
+                src_ip_int = ip_to_int(src_ip)
+                dst_ip_int = ip_to_int(dst_ip)
+                if src_ip_int is None or dst_ip_int is None:
+                    skipped += 1
+                    continue
+                batch.append((src_ip_int, dst_ip_int, src_port, dst_port, protocol, packets, bytes_, now, now, seen, now, tags, tag_mask))
+            if skipped:
+                log_warn(logger, f"[WARN] Skipped {skipped} flows without IPv4 addresses while updating allflows.")
+
+            # Tags that did not fit in the bitmask are kept in the side table
+            overflow_batch = [
+                (*key, tag_name)
+                for key, (_, _, _, tags, _) in aggregated.items()
+                for tag_name in get_overflow_tags(tags)
+            ]
+
+            conn.execute("PRAGMA synchronous=NORMAL")
+            allflows_cursor = conn.cursor()
+            allflows_cursor.execute("BEGIN")
+            allflows_cursor.executemany("""
+                INSERT INTO allflowscompact (
+                    src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes, flow_start, flow_end, times_seen, last_seen, tags, tag_mask
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(src_ip, dst_ip, src_port, dst_port, protocol)
+                DO UPDATE SET
+                    packets = packets + excluded.packets,
+                    bytes = bytes + excluded.bytes,
+                    flow_end = excluded.flow_end,
+                    times_seen = times_seen + excluded.times_seen,
+                    last_seen = excluded.last_seen,
+                    tags = excluded.tags,
+                    tag_mask = excluded.tag_mask
+            """, batch)
+            if overflow_batch:
+                allflows_cursor.executemany("""
+                    INSERT OR IGNORE INTO flowtagsoverflow (src_ip, dst_ip, src_port, dst_port, protocol, tag_name)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, overflow_batch)
             conn.commit()
-            log_info(logger, f"[INFO] Updated allflows with {len(rows)} rows.")
+
+            execution_time = time.time() - start_time
+            rows_per_second = len(batch) / execution_time if execution_time > 0 else 0
+            log_info(logger, f"[INFO] Updated allflows with {len(rows)} rows ({len(batch)} unique flows).")
+            log_info(logger, f"[PERFORMANCE] update_all_flows wrote {len(batch)} flows in {execution_time:.2f} s ({rows_per_second:.0f} rows/s)")
+            insert_dbperformance("allflows", "update_all_flows", "update_all_flows", execution_time, len(batch))
         except sqlite3.Error as e:
+            conn.rollback()
             log_error(logger, f"[ERROR] Error updating allflows: {e}")
         finally:
             disconnect_from_db(conn)
@@ -56,7 +113,8 @@ def update_tag_to_allflows(table_name, tag, src_ip, dst_ip, dst_port):
     Update the tag for a specific row in the database.
 
     Args:
-        table_name (str): The table name.
+        table_name (str): The table name used to open the database, the tag is
+                          written to the allflowscompact table behind the allflows view.
         tag (str): The tag to add.
         src_ip (str): The source IP address.
         dst_ip (str): The destination IP address.
@@ -74,15 +132,17 @@ def update_tag_to_allflows(table_name, tag, src_ip, dst_ip, dst_port):
         cursor = conn.cursor()
 
         # Retrieve the existing tag using run_timed_query
-        select_query = f"""
-            SELECT tags FROM {table_name}
+        src_ip_int = ip_to_int(src_ip)
+        dst_ip_int = ip_to_int(dst_ip)
+        select_query = """
+            SELECT tags FROM allflowscompact
             WHERE src_ip = ? AND dst_ip = ? AND dst_port = ?
-            AND tags not like '%DeadConnectionDetection%'
+            AND (tag_mask & ?) = 0
         """
         result_rows, _ = run_timed_query(
             cursor,
             select_query,
-            params=(src_ip, dst_ip, dst_port),
+            params=(src_ip_int, dst_ip_int, dst_port, get_tag_mask(["DeadConnectionDetection"])),
             description="update_tag_to_allflows_select_tags",
             fetch_all=True
         )
@@ -94,11 +154,11 @@ def update_tag_to_allflows(table_name, tag, src_ip, dst_ip, dst_port):
         updated_tag = f"{existing_tag}{tag}" if existing_tag else tag
 
         # Update the tag in the database
-        cursor.execute(f"""
-            UPDATE {table_name}
-            SET tags = ?
+        cursor.execute("""
+            UPDATE allflowscompact
+            SET tags = ?, tag_mask = tag_mask | ?
             WHERE src_ip = ? AND dst_ip = ? AND dst_port = ?
-        """, (updated_tag, src_ip, dst_ip, dst_port))
+        """, (updated_tag, tags_to_mask(tag), src_ip_int, dst_ip_int, dst_port))
         conn.commit()
 
         log_info(logger, f"[INFO] Tag '{tag}' added to flow: {src_ip} -> {dst_ip}:{dst_port}. Updated tag: '{updated_tag}'")
@@ -141,14 +201,14 @@ def get_flows_by_source_ip(src_ip):
                    MAX(last_seen) as last_flow,
                    MIN(flow_start) as first_flow
             FROM allflows 
-            WHERE src_ip = ?
+            WHERE src_ip_int = ?
             GROUP BY dst_ip, dst_port, protocol
             ORDER BY total_bytes DESC
         """
         rows, _ = run_timed_query(
             cursor,
             query,
-            params=(src_ip,),
+            params=(ip_to_int(src_ip),),
             description=f"get_flows_by_source_ip",
             fetch_all=True
         )
@@ -201,13 +261,14 @@ def get_dead_connections_from_database():
                         a1.bytes as forward_bytes,
                         a1.times_seen as forward_seen,
                         a1.tags as row_tags,
+                        a1.tag_mask as row_tag_mask,
                         COALESCE(a2.packets, 0) as reverse_packets,
                         COALESCE(a2.bytes, 0) as reverse_bytes,
                         COALESCE(a2.times_seen, 0) as reverse_seen
                     FROM allflows a1
                     LEFT JOIN allflows a2 ON 
-                        a2.src_ip = a1.dst_ip 
-                        AND a2.dst_ip = a1.src_ip
+                        a2.src_ip_int = a1.dst_ip_int 
+                        AND a2.dst_ip_int = a1.src_ip_int
                         AND a2.src_port = a1.dst_port
                         AND a2.dst_port = a1.src_port
                         AND a2.protocol = a1.protocol
@@ -226,11 +287,7 @@ def get_dead_connections_from_database():
                     sum(reverse_bytes) as r_bytes
                 FROM ConnectionPairs
                 WHERE connection_protocol=6 -- Exclude ICMP and IGMP
-                AND row_tags not like '%DeadConnectionDetection%'
-                AND row_tags not like '%IgnoreList;%'
-                AND row_tags not like '%Broadcast;%'
-                AND row_tags not like '%Multicast;%'
-                AND row_tags not like '%LinkLocal;%'
+                AND (row_tag_mask & ?) = 0  -- DeadConnectionDetection, IgnoreList, Broadcast, Multicast, LinkLocal
                 AND responder_ip NOT LIKE '224.%'  -- Exclude multicast
                 AND responder_ip NOT LIKE '239.%'  -- Exclude multicast
                 AND responder_ip NOT LIKE '255.%'  -- Exclude broadcast
@@ -239,9 +296,11 @@ def get_dead_connections_from_database():
                     f_packets > 2
                     AND r_packets < 1
         """
+        excluded_tag_mask = get_tag_mask(["DeadConnectionDetection", "IgnoreList", "Broadcast", "Multicast", "LinkLocal"])
         raw_rows, _ = run_timed_query(
             cursor,
             query,
+            params=(excluded_tag_mask,),
             description="get_dead_connections_from_database",
             fetch_all=True
         )
@@ -318,7 +377,8 @@ def get_tag_statistics(local_ip):
             log_error(logger, "[ERROR] Unable to connect to database for tag statistics.")
             return {}
             
-        conn.create_function("TRIM", 1, lambda x: x.strip() if x else "")
+        # Not named TRIM, the function stays registered on the pooled connection
+        conn.create_function("py_trim", 1, lambda x: x.strip() if x else "")
         cursor = conn.cursor()
         
         # Use run_timed_query for the recursive query
@@ -334,7 +394,7 @@ def get_tag_statistics(local_ip):
               FROM allflows
               WHERE tags IS NOT NULL 
                 AND tags != ''
-                AND (src_ip = ? OR dst_ip = ?)  -- Filter by local_ip
+                AND (src_ip_int = ? OR dst_ip_int = ?)  -- Filter by local_ip
               
               UNION ALL
               
@@ -343,7 +403,7 @@ def get_tag_statistics(local_ip):
                 dst_ip,
                 flow_start,
                 last_seen,
-                TRIM(substr(rest, 0, instr(rest, ';'))),
+                py_trim(substr(rest, 0, instr(rest, ';'))),
                 substr(rest, instr(rest, ';') + 1)
               FROM split_tags
               WHERE rest != ''
@@ -363,7 +423,7 @@ def get_tag_statistics(local_ip):
         rows, execution_time = run_timed_query(
             cursor, 
             query, 
-            params=(local_ip, local_ip),  # Pass local_ip twice for src_ip and dst_ip conditions
+            params=(ip_to_int(local_ip), ip_to_int(local_ip)),  # Pass local_ip twice for src_ip and dst_ip conditions
             description="get_tag_statistics", 
             fetch_all=True
         )
@@ -426,13 +486,14 @@ def apply_ignorelist_entry(ignorelist_id, src_ip, dst_ip, dst_port, protocol):
         flow_where_conditions = []
         flow_params = []
         
+        # allflowscompact stores IP addresses as integers
         if src_ip != "*":
             flow_where_conditions.append("(src_ip = ? OR dst_ip = ?)")
-            flow_params.extend([src_ip, src_ip])
+            flow_params.extend([ip_to_int(src_ip), ip_to_int(src_ip)])
 
         if dst_ip != "*":
             flow_where_conditions.append("(dst_ip = ? OR src_ip = ?)")
-            flow_params.extend([dst_ip, dst_ip])
+            flow_params.extend([ip_to_int(dst_ip), ip_to_int(dst_ip)])
 
         # Match port against both src_port and dst_port
         if dst_port != "*":
@@ -448,12 +509,13 @@ def apply_ignorelist_entry(ignorelist_id, src_ip, dst_ip, dst_port, protocol):
         
         # Update query - handle tags field (could be NULL or empty)
         update_query = f"""
-            UPDATE allflows
+            UPDATE allflowscompact
             SET tags = CASE
                 WHEN tags IS NULL OR tags = '' THEN ?
                 WHEN tags LIKE ? THEN tags  -- Already has the tag
                 ELSE tags || ?  -- Append the tag
-            END
+            END,
+            tag_mask = COALESCE(tag_mask, 0) | ?
             WHERE {flow_where_clause}
         """
         
@@ -462,6 +524,7 @@ def apply_ignorelist_entry(ignorelist_id, src_ip, dst_ip, dst_port, protocol):
             ignore_tag,  # For NULL or empty tags
             f"%{ignore_tag}%",  # For LIKE check
             ignore_tag,  # For appending
+            get_tag_mask(["IgnoreList"]),  # For the bitmask
             *flow_params  # For WHERE conditions
         ]
         
@@ -481,3 +544,150 @@ def apply_ignorelist_entry(ignorelist_id, src_ip, dst_ip, dst_port, protocol):
     finally:
         if 'conn_flows' in locals() and conn_flows:
             disconnect_from_db(conn_flows)
+
+
+def purge_expired_allflows(config_dict):
+    """
+    Expire allflows rows whose last_seen is older than AllFlowsRetentionDays.
+
+    Expired rows are rolled up into the allflowsdaily summary table (per day, host,
+    destination, port and protocol) and deleted in bounded batches so that each
+    write transaction stays short. An incremental vacuum is run afterwards so the
+    freed pages are returned to the filesystem.
+
+    Args:
+        config_dict (dict): Configuration dictionary containing retention settings.
+
+    Returns:
+        int: Number of flows removed from allflows, or -1 if an error occurred.
+    """
+    logger = logging.getLogger(__name__)
+
+    retention_days = int(config_dict.get('AllFlowsRetentionDays', 0))
+    if retention_days <= 0:
+        log_info(logger, "[INFO] Allflows retention is disabled, skipping purge.")
+        return 0
+
+    batch_size = int(config_dict.get('AllFlowsRetentionBatchSize', 5000))
+    vacuum_pages = int(config_dict.get('AllFlowsIncrementalVacuumPages', 5000))
+    cutoff_time = datetime.now() - timedelta(days=retention_days)
+    cutoff = cutoff_time.strftime('%Y-%m-%d %H:%M:%S')
+    cutoff_epoch = int(cutoff_time.timestamp())
+
+    conn = connect_to_db("allflows")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to allflows database.")
+        return -1
+
+    total_deleted = 0
+    try:
+        start_time = time.time()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS allflows_expired (
+                src_ip INTEGER, dst_ip INTEGER, src_port INTEGER, dst_port INTEGER, protocol INTEGER,
+                PRIMARY KEY (src_ip, dst_ip, src_port, dst_port, protocol)
+            ) WITHOUT ROWID
+        """)
+
+        while True:
+            cursor.execute("BEGIN")
+            cursor.execute("DELETE FROM allflows_expired")
+            cursor.execute("""
+                INSERT INTO allflows_expired (src_ip, dst_ip, src_port, dst_port, protocol)
+                SELECT src_ip, dst_ip, src_port, dst_port, protocol
+                FROM allflowscompact WHERE last_seen < ? LIMIT ?
+            """, (cutoff_epoch, batch_size))
+            cursor.execute("""
+                INSERT INTO allflowsdaily (
+                    day, src_ip, dst_ip, dst_port, protocol, packets, bytes, flow_count, times_seen, first_seen, last_seen
+                )
+                SELECT date(a.last_seen), a.src_ip, a.dst_ip, a.dst_port, a.protocol,
+                       SUM(a.packets), SUM(a.bytes), COUNT(*), SUM(a.times_seen), MIN(a.flow_start), MAX(a.last_seen)
+                FROM allflows_expired e
+                JOIN allflows a ON a.src_ip_int = e.src_ip AND a.dst_ip_int = e.dst_ip
+                    AND a.src_port = e.src_port AND a.dst_port = e.dst_port AND a.protocol = e.protocol
+                GROUP BY date(a.last_seen), a.src_ip, a.dst_ip, a.dst_port, a.protocol
+                ON CONFLICT(day, src_ip, dst_ip, dst_port, protocol)
+                DO UPDATE SET
+                    packets = packets + excluded.packets,
+                    bytes = bytes + excluded.bytes,
+                    flow_count = flow_count + excluded.flow_count,
+                    times_seen = times_seen + excluded.times_seen,
+                    first_seen = MIN(first_seen, excluded.first_seen),
+                    last_seen = MAX(last_seen, excluded.last_seen)
+            """)
+            cursor.execute("""
+                DELETE FROM allflowscompact
+                WHERE (src_ip, dst_ip, src_port, dst_port, protocol) IN (
+                    SELECT src_ip, dst_ip, src_port, dst_port, protocol FROM allflows_expired
+                )
+            """)
+            deleted = cursor.rowcount
+            conn.commit()
+
+            total_deleted += deleted
+            if deleted < batch_size:
+                break
+
+        cursor.execute(f"PRAGMA incremental_vacuum({vacuum_pages})")
+        cursor.fetchall()
+
+        execution_time = time.time() - start_time
+        log_info(logger, f"[INFO] Purged {total_deleted} flows last seen before {cutoff} from allflows in {execution_time:.2f} s.")
+        return total_deleted
+
+    except sqlite3.Error as e:
+        conn.rollback()
+        log_error(logger, f"[ERROR] Database error while purging expired flows: {e}")
+        return -1
+    finally:
+        disconnect_from_db(conn)
+
+
+def get_outbound_destinations(since=None):
+    """
+    Retrieve the distinct client-to-server destinations recorded in allflows.
+    A server is identified by having a lower port number than the client.
+
+    Args:
+        since (str): Optional '%Y-%m-%d %H:%M:%S' timestamp, only flows last seen
+                     at or after it are returned.
+
+    Returns:
+        list: Tuples of (src_ip, dst_ip, dst_port, protocol), or an empty list on error.
+    """
+    logger = logging.getLogger(__name__)
+
+    conn = connect_to_db("allflows")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to allflows database.")
+        return []
+
+    try:
+        cursor = conn.cursor()
+        query = """
+            SELECT DISTINCT src_ip, dst_ip, dst_port, protocol
+            FROM allflows
+            WHERE dst_port < src_port
+        """
+        params = ()
+        if since:
+            query += " AND last_seen_epoch >= ?"
+            params = (int(datetime.strptime(since, '%Y-%m-%d %H:%M:%S').timestamp()),)
+
+        rows, _ = run_timed_query(
+            cursor,
+            query,
+            params=params,
+            description="get_outbound_destinations",
+            fetch_all=True
+        )
+        return rows
+
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Database error while retrieving outbound destinations: {e}")
+        return []
+    finally:
+        disconnect_from_db(conn)
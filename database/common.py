@@ -10,9 +10,13 @@ if parent_dir not in sys.path:
 sys.path.insert(0, "/database")
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from init import *
-from database.core import delete_table, create_table
+from database.core import delete_table, create_table, connect_to_attached_dbs
+import math
 from database.configuration import update_config_setting
 from database.localhosts import get_average_threat_score
+from database.tagdictionary import tags_to_mask
+from database.dnsqueries import split_dns_response
+from src.ddsketch import DDSketch
 
 def check_update_database_schema(config_dict):
     """
@@ -138,6 +142,45 @@ def update_database_schema(current_version, target_version):
             migrate_configurations_schema15_to_schema16()
            # delete_all_records( "dbperformance")
 
+        if current_version_int < 17:
+            log_info(logger, "[INFO] Version is less than 17, enabling incremental vacuum on allflows database")
+            migrate_allflows_schema16_to_schema17()
+
+        if current_version_int < 18:
+            log_info(logger, "[INFO] Version is less than 18, adding tag bitmask columns to flow tables")
+            migrate_flows_schema17_to_schema18()
+
+        if current_version_int < 19:
+            log_info(logger, "[INFO] Version is less than 19, building hourly performance digests")
+            migrate_performance_schema18_to_schema19()
+
+        if current_version_int < 20:
+            log_info(logger, "[INFO] Version is less than 20, converting allflows to the compact integer schema")
+            migrate_allflows_schema19_to_schema20()
+
+        if current_version_int < 21:
+            log_info(logger, "[INFO] Version is less than 21, recreating explore view table with a flow key for incremental refreshes")
+            delete_table( "explore")
+            create_table( CONST_CREATE_EXPLORE_SQL, "explore")
+
+        if current_version_int < 22:
+            log_info(logger, "[INFO] Version is less than 22, replacing the explore concat column with a full-text search index")
+            delete_table( "explorefts")
+            delete_table( "explore")
+            delete_all_records( "explorestate")
+            create_table( CONST_CREATE_EXPLORE_SQL, "explore")
+
+        if current_version_int < 23:
+            log_info(logger, "[INFO] Version is less than 23, recreating explore view table with a local host column and summary rollups")
+            delete_table( "explorefts")
+            delete_table( "explore")
+            delete_all_records( "explorestate")
+            create_table( CONST_CREATE_EXPLORE_SQL, "explore")
+
+        if current_version_int < 24:
+            log_info(logger, "[INFO] Version is less than 24, building the ipdomains table from the stored DNS responses")
+            migrate_dnsqueries_schema23_to_schema24()
+
         return True
         
     except ValueError as e:
@@ -300,6 +343,200 @@ def migrate_configurations_schema15_to_schema16():
 
 
 
+def migrate_allflows_schema16_to_schema17():
+    """
+    Switches allflows.db to incremental auto_vacuum so retention purges can shrink the file.
+    Changing auto_vacuum on an existing database only takes effect after a full VACUUM.
+    """
+    logger = logging.getLogger(__name__)
+    log_info(logger, "[INFO] Enabling incremental auto_vacuum on allflows database (this may take a while)")
+
+    try:
+        conn = connect_to_db("allflows")
+        if not conn:
+            log_error(logger, "[ERROR] Failed to connect to ALLFLOWS_DB")
+            return False
+
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA auto_vacuum")
+        if cursor.fetchone()[0] != 2:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            cursor.execute("VACUUM")
+            log_info(logger, "[INFO] Incremental auto_vacuum enabled on allflows database")
+        else:
+            log_info(logger, "[INFO] Incremental auto_vacuum already enabled on allflows database")
+
+        create_table(CONST_CREATE_ALLFLOWSDAILY_SQL, "allflowsdaily")
+        return True
+
+    except Exception as e:
+        log_error(logger, f"[ERROR] Failed to enable incremental auto_vacuum on allflows: {e}")
+        return False
+    finally:
+        if 'conn' in locals() and conn:
+            disconnect_from_db(conn)
+
+
+
+def migrate_flows_schema17_to_schema18():
+    """
+    Adds a 'tag_mask' column (int, default 0) to the newflows and allflows tables
+    and backfills allflows.tag_mask from the existing semicolon-joined tags.
+    """
+    logger = logging.getLogger(__name__)
+    log_info(logger, "[INFO] Adding 'tag_mask' column to newflows and allflows tables")
+
+    try:
+        create_table(CONST_CREATE_TAGDICTIONARY_SQL, "tagdictionary")
+        create_table(CONST_CREATE_FLOWTAGSOVERFLOW_SQL, "flowtagsoverflow")
+
+        for table_name in ("newflows", "allflows"):
+            conn = connect_to_db(table_name)
+            if not conn:
+                log_error(logger, f"[ERROR] Failed to connect to database for {table_name}")
+                return False
+
+            cursor = conn.cursor()
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            columns = [row[1] for row in cursor.fetchall()]
+            if "tag_mask" not in columns:
+                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN tag_mask INTEGER DEFAULT 0")
+                log_info(logger, f"[INFO] 'tag_mask' column added to {table_name} table")
+
+            conn.create_function("tags_to_mask", 1, tags_to_mask)
+            cursor.execute(f"UPDATE {table_name} SET tag_mask = tags_to_mask(tags) WHERE tags IS NOT NULL AND tags != ''")
+            conn.commit()
+            log_info(logger, f"[INFO] Backfilled tag_mask for {cursor.rowcount} rows in {table_name}")
+            # Closed instead of pooled, tags_to_mask stays registered on the connection
+            conn.close()
+
+        return True
+
+    except Exception as e:
+        log_error(logger, f"[ERROR] Failed to add 'tag_mask' column: {e}")
+        return False
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
+
+
+
+def migrate_performance_schema18_to_schema19():
+    """
+    Creates the dbperformancedigest rollup and backfills it from the raw
+    dbperformance rows so that existing history keeps reporting percentiles.
+    """
+    logger = logging.getLogger(__name__)
+    log_info(logger, "[INFO] Backfilling dbperformancedigest from dbperformance")
+
+    try:
+        create_table(CONST_CREATE_DBPERFORMANCE_SQL, "dbperformance")
+
+        conn = connect_to_db("dbperformance")
+        if not conn:
+            log_error(logger, "[ERROR] Failed to connect to PERFORMANCE_DB")
+            return False
+
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT substr(run_timestamp, 1, 13), function, execution_time
+            FROM dbperformance
+            WHERE run_timestamp IS NOT NULL AND function IS NOT NULL AND execution_time IS NOT NULL
+        """)
+        digests = {}
+        for hour, function, execution_time in cursor:
+            digest = digests.get((hour, function))
+            if digest is None:
+                digest = digests[(hour, function)] = [DDSketch(CONST_QUERY_TELEMETRY_SKETCH_ACCURACY), 0.0, execution_time, execution_time]
+            digest[0].add(execution_time)
+            digest[1] += execution_time
+            digest[2] = min(digest[2], execution_time)
+            digest[3] = max(digest[3], execution_time)
+
+        # Hours already digested by the telemetry writer are left alone
+        cursor.executemany("""
+            INSERT OR IGNORE INTO dbperformancedigest (hour, function, count, total_time, min_time, max_time, sketch)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(hour, function, sketch.count, total_time, min_time, max_time, sketch.to_json())
+              for (hour, function), (sketch, total_time, min_time, max_time) in digests.items()])
+        conn.commit()
+        log_info(logger, f"[INFO] Built {len(digests)} hourly performance digests")
+        return True
+
+    except Exception as e:
+        log_error(logger, f"[ERROR] Failed to backfill performance digests: {e}")
+        return False
+    finally:
+        if 'conn' in locals() and conn:
+            disconnect_from_db(conn)
+
+
+def migrate_allflows_schema19_to_schema20():
+    """
+    Moves the allflows table into the compact allflowscompact table (IPv4 addresses
+    as integers, epoch second timestamps, WITHOUT ROWID primary key) and replaces it
+    with the allflows view that keeps the text columns for existing readers.
+    Flows without IPv4 addresses cannot be stored in the compact table and are dropped.
+    """
+    logger = logging.getLogger(__name__)
+    log_info(logger, "[INFO] Converting allflows to the compact integer schema (this may take a while)")
+
+    try:
+        create_table(CONST_CREATE_ALLFLOWS_SQL, "allflows")
+
+        conn = connect_to_db("allflows")
+        if not conn:
+            log_error(logger, "[ERROR] Failed to connect to ALLFLOWS_DB")
+            return False
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'allflows'")
+        row = cursor.fetchone()
+        if not row or row[0] != "table":
+            log_info(logger, "[INFO] allflows already uses the compact schema")
+            return True
+
+        size_before = os.path.getsize(CONST_ALLFLOWS_DB)
+        conn.create_function("ip_to_int", 1, ip_to_int, deterministic=True)
+        cursor.execute("BEGIN")
+        cursor.execute("""
+            INSERT OR IGNORE INTO allflowscompact (
+                src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes,
+                flow_start, flow_end, times_seen, last_seen, tags, tag_mask
+            )
+            SELECT ip_to_int(src_ip), ip_to_int(dst_ip), src_port, dst_port, protocol, packets, bytes,
+                   CAST(strftime('%s', flow_start, 'utc') AS INTEGER),
+                   CAST(strftime('%s', flow_end, 'utc') AS INTEGER),
+                   times_seen,
+                   CAST(strftime('%s', last_seen, 'utc') AS INTEGER),
+                   tags, COALESCE(tag_mask, 0)
+            FROM allflows
+            WHERE ip_to_int(src_ip) IS NOT NULL AND ip_to_int(dst_ip) IS NOT NULL
+        """)
+        migrated = cursor.rowcount
+        cursor.execute("DROP TABLE allflows")
+        conn.commit()
+
+        # Creates the allflows view now that the table name is free
+        cursor.executescript(CONST_CREATE_ALLFLOWS_SQL)
+        cursor.execute("PRAGMA incremental_vacuum")
+        cursor.fetchall()
+
+        size_after = os.path.getsize(CONST_ALLFLOWS_DB)
+        log_info(logger, f"[INFO] Migrated {migrated} flows to allflowscompact, allflows database went from {size_before} to {size_after} bytes")
+        return True
+
+    except Exception as e:
+        if 'conn' in locals() and conn:
+            conn.rollback()
+        log_error(logger, f"[ERROR] Failed to convert allflows to the compact schema: {e}")
+        return False
+    finally:
+        if 'conn' in locals() and conn:
+            # Closed instead of pooled, ip_to_int stays registered on the connection
+            conn.close()
+
+
 def store_site_name(site_name):
     """
     Store the site name in the configuration database with the key 'SiteName'.
@@ -472,66 +709,38 @@ def collect_database_counts():
     }
 
     try:
-        # Connect to the alerts database
-        conn = connect_to_db( "alerts")
-        if conn:
-            cursor = conn.cursor()
-            # Count acknowledged alerts
-            cursor.execute("SELECT COUNT(*) FROM alerts WHERE acknowledged = 1")
-            counts["acknowledged_alerts"] = cursor.fetchone()[0]
-
-            # Count unacknowledged alerts
-            cursor.execute("SELECT COUNT(*) FROM alerts WHERE acknowledged = 0")
-            counts["unacknowledged_alerts"] = cursor.fetchone()[0]
-
-            # Count total alerts
-            cursor.execute("SELECT COUNT(*) FROM alerts")
-            counts["total_alerts"] = cursor.fetchone()[0]
-
-            conn.close()
-        else:
-            log_error(logger, "[ERROR] Unable to connect to alerts database")
-
-        conn = connect_to_db( "actions")
+        # One statement over the alerts, actions, localhosts and ignorelist databases
+        conn = connect_to_attached_dbs(["alerts", "actions", "localhosts", "ignorelist"], read_only=True)
         if conn:
             cursor = conn.cursor()
-            # Count acknowledged alerts
-            cursor.execute("SELECT COUNT(*) FROM actions WHERE acknowledged = 1")
-            counts["acknowledged_actions"] = cursor.fetchone()[0]
-
-            # Count unacknowledged alerts
-            cursor.execute("SELECT COUNT(*) FROM actions WHERE acknowledged = 0")
-            counts["unacknowledged_actions"] = cursor.fetchone()[0]
-
-            # Count total alerts
-            cursor.execute("SELECT COUNT(*) FROM actions")
-            counts["total_actions"] = cursor.fetchone()[0]
-
-            conn.close()
-        else:
-            log_error(logger, "[ERROR] Unable to connect to alerts database")
-
-        # Connect to the localhosts database
-        conn_localhosts = connect_to_db( "localhosts")
-        if conn_localhosts:
-            cursor = conn_localhosts.cursor()
-            # Count entries in localhosts
-            cursor.execute("SELECT COUNT(*) FROM localhosts")
-            counts["total_localhosts_count"] = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM localhosts where acknowledged = 1")
-            counts["acknowledged_localhosts_count"] = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM localhosts WHERE acknowledged = 0")
-            counts["unacknowledged_localhosts_count"] = cursor.fetchone()[0]
-
-            conn_localhosts.close()
+            rows, _ = run_timed_query(
+                cursor,
+                """
+                SELECT
+                    (SELECT COUNT(*) FROM alerts.alerts WHERE acknowledged = 1),
+                    (SELECT COUNT(*) FROM alerts.alerts WHERE acknowledged = 0),
+                    (SELECT COUNT(*) FROM alerts.alerts),
+                    (SELECT COUNT(*) FROM actions.actions WHERE acknowledged = 1),
+                    (SELECT COUNT(*) FROM actions.actions WHERE acknowledged = 0),
+                    (SELECT COUNT(*) FROM actions.actions),
+                    (SELECT COUNT(*) FROM localhosts.localhosts),
+                    (SELECT COUNT(*) FROM localhosts.localhosts WHERE acknowledged = 1),
+                    (SELECT COUNT(*) FROM localhosts.localhosts WHERE acknowledged = 0),
+                    (SELECT AVG(threat_score) FROM localhosts.localhosts WHERE threat_score IS NOT NULL),
+                    (SELECT COUNT(*) FROM ignorelist.ignorelist)
+                """,
+                description="collect_database_counts",
+                fetch_all=True
+            )
+            (counts["acknowledged_alerts"], counts["unacknowledged_alerts"], counts["total_alerts"],
+             counts["acknowledged_actions"], counts["unacknowledged_actions"], counts["total_actions"],
+             counts["total_localhosts_count"], counts["acknowledged_localhosts_count"],
+             counts["unacknowledged_localhosts_count"], average_threat_score, counts["ignorelist_count"]) = rows[0]
+            counts["average_threat_score"] = math.ceil(average_threat_score) if average_threat_score is not None else None
+            disconnect_from_db(conn)
         else:
-            log_error(logger, "[ERROR] Unable to connect to localhosts database")
+            log_error(logger, "[ERROR] Unable to connect to alerts, actions, localhosts and ignorelist databases")
 
-        counts["average_threat_score"] = get_average_threat_score()
-        counts["ignorelist_count"] = get_row_count("ignorelist")
-        
         # Get flow statistics from configuration
         from database.configuration import get_config_settings
         config_dict = get_config_settings()
@@ -753,9 +962,16 @@ def test_database_online(db_path):
         return False
 
 
-def get_p95_execution_times():
+def get_p95_execution_times(start_hour=None, end_hour=None, quantile=0.95):
     """
-    Retrieve the p95 execution time for each function from the dbperformance table.
+    Retrieve the p95 execution time for each function from the per hour
+    dbperformancedigest rollup, merging the digests of the requested hours
+    instead of scanning the raw dbperformance rows.
+
+    Args:
+        start_hour (str): Optional first hour to include, '%Y-%m-%d %H'.
+        end_hour (str): Optional last hour to include, '%Y-%m-%d %H'.
+        quantile (float): Quantile to report, 0.95 by default.
 
     Returns:
         dict: A dictionary where keys are function names and values are their p95 execution times.
@@ -763,28 +979,29 @@ def get_p95_execution_times():
     logger = logging.getLogger(__name__)
     result = {}
     try:
-        conn = connect_to_db("dbperformance")
+        conn = connect_to_db("dbperformancedigest", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to performance database.")
             return {}
 
         cursor = conn.cursor()
         query = """
-            SELECT function, MIN(execution_time) AS p95_execution_time
-            FROM (
-                SELECT function,
-                       execution_time,
-                       ROW_NUMBER() OVER (PARTITION BY function ORDER BY execution_time) AS rn,
-                       COUNT(*) OVER (PARTITION BY function) AS total
-                FROM dbperformance
-            )
-            WHERE rn >= CAST(total * 0.95 AS INTEGER)
-            GROUP BY function;
+            SELECT function, sketch
+            FROM dbperformancedigest
+            WHERE hour >= COALESCE(?, '') AND hour <= COALESCE(?, '9999')
         """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for function, p95_time in rows:
-            result[function] = p95_time
+        cursor.execute(query, (start_hour, end_hour))
+
+        sketches = {}
+        for function, sketch_json in cursor.fetchall():
+            sketch = DDSketch.from_json(sketch_json)
+            if function in sketches:
+                sketches[function].merge(sketch)
+            else:
+                sketches[function] = sketch
+
+        for function, sketch in sketches.items():
+            result[function] = sketch.quantile(quantile)
 
         return result
 
@@ -796,4 +1013,47 @@ def get_p95_execution_times():
         return {}
     finally:
         if 'conn' in locals() and conn:
-            disconnect_from_db(conn)
\ No newline at end of file
+            disconnect_from_db(conn)
+
+
+def migrate_dnsqueries_schema23_to_schema24():
+    """
+    Creates the ipdomains table and fills it with the addresses of the responses
+    already stored in dnsqueries, each with the last_seen of its query.
+    """
+    logger = logging.getLogger(__name__)
+
+    try:
+        create_table(CONST_CREATE_DNSQUERIES_SQL, "dnsqueries")
+
+        conn = connect_to_db("dnsqueries")
+        if not conn:
+            log_error(logger, "[ERROR] Failed to connect to DNSQUERIES_DB")
+            return False
+
+        read_cursor = conn.cursor()
+        write_cursor = conn.cursor()
+        read_cursor.execute("SELECT domain, response, last_seen FROM dnsqueries WHERE response IS NOT NULL AND response != ''")
+        migrated = 0
+        while True:
+            rows = read_cursor.fetchmany(1000)
+            if not rows:
+                break
+            ip_domains = [(ip, domain, last_seen) for domain, response, last_seen in rows for ip in split_dns_response(response)]
+            write_cursor.executemany("""
+                INSERT INTO ipdomains (ip, domain, last_seen) VALUES (?, ?, ?)
+                ON CONFLICT(ip, domain) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)
+            """, ip_domains)
+            migrated += len(ip_domains)
+        conn.commit()
+        log_info(logger, f"[INFO] Migrated {migrated} DNS response addresses to ipdomains")
+        return True
+
+    except Exception as e:
+        if 'conn' in locals() and conn:
+            conn.rollback()
+        log_error(logger, f"[ERROR] Failed to build the ipdomains table: {e}")
+        return False
+    finally:
+        if 'conn' in locals() and conn:
+            disconnect_from_db(conn)
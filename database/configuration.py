@@ -10,6 +10,17 @@ if parent_dir not in sys.path:
 sys.path.insert(0, "/database")
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from init import *
+import functools
+from src.detached import read_config_cache
+
+
+@functools.lru_cache(maxsize=16)
+def _parse_local_networks(raw):
+    """Parse a LocalNetworks JSON value once per distinct value into (cidrs, routers)."""
+    scopes = json.loads(raw)
+    cidrs = frozenset(scope['cidr'] for scope in scopes if 'cidr' in scope)
+    routers = frozenset(scope['router'] for scope in scopes if 'router' in scope and scope['router'])
+    return cidrs, routers
 
 
 def get_routers(config_dict):
@@ -22,8 +33,7 @@ def get_routers(config_dict):
     """
     raw = config_dict.get('LocalNetworks', '[]')
     try:
-        scopes = json.loads(raw)
-        return {scope['router'] for scope in scopes if 'router' in scope and scope['router']}
+        return set(_parse_local_networks(raw)[1])
     except Exception as e:
         logging.getLogger(__name__).error(f"[ERROR] Could not parse LocalNetworks for routers: {e}")
         return set()
@@ -38,34 +48,28 @@ def get_local_network_cidrs(config_dict):
     """
     raw = config_dict.get('LocalNetworks', '[]')
     try:
-        scopes = json.loads(raw)
-        return {scope['cidr'] for scope in scopes if 'cidr' in scope}
+        return set(_parse_local_networks(raw)[0])
     except Exception as e:
         logging.getLogger(__name__).error(f"[ERROR] Could not parse LocalNetworks: {e}")
         return set()
 
 
 def get_config_settings():
-    """Read configuration settings from the configuration database into a dictionary."""
-    logger = logging.getLogger(__name__)
-    try:
-        conn = connect_to_db( "configuration")
-        if not conn:
-            log_error(logger,"[ERROR] Unable to connect to configuration database")
-            return None
+    """
+    Return the configuration settings as a dictionary.
 
-        cursor = conn.cursor()
-        cursor.execute("SELECT key, value FROM configuration")
-        config_dict = dict(cursor.fetchall())
-        log_info(logger, f"[INFO] Successfully loaded {len(config_dict)} configuration settings")
-        return config_dict
-    except sqlite3.Error as e:
-        log_error(logger,f"[ERROR] Error reading configuration database: {e}")
-        disconnect_from_db(conn)
+    The settings are cached per process and only reloaded when the configuration
+    database has changed (PRAGMA data_version), so the common case is a dict
+    lookup. The returned dictionary is shared and must be treated as read-only.
+    """
+    logger = logging.getLogger(__name__)
+    config_dict, reloaded = read_config_cache()
+    if config_dict is None:
+        log_error(logger,"[ERROR] Error reading configuration database")
         return None
-    finally:
-        if 'conn' in locals() and conn:
-            disconnect_from_db(conn)
+    if reloaded:
+        log_info(logger, f"[INFO] Successfully loaded {len(config_dict)} configuration settings")
+    return config_dict
 
 def update_config_setting(key, value, silent=False):
     """
@@ -1,9 +1,14 @@
+import atexit
 import os
+import queue
+import random
 import sqlite3
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
+import threading
 import time
+from contextlib import contextmanager
 # Set up path for imports
 current_dir = Path(__file__).resolve().parent
 parent_dir = str(current_dir.parent)
@@ -14,12 +19,34 @@ sys.path.insert(0, "/database")
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import logging
 from locallogging import log_info, log_error
-from const import CONST_PERFORMANCE_DB, TABLE_DB_MAP
+from const import (
+    CONST_PERFORMANCE_DB,
+    TABLE_DB_MAP,
+    CONST_SQLITE_CONNECTION_PRAGMAS,
+    CONST_SQLITE_CACHED_STATEMENTS,
+    CONST_SQLITE_MAX_IDLE_CONNECTIONS,
+    CONST_QUERY_TELEMETRY_QUEUE_SIZE,
+    CONST_QUERY_TELEMETRY_BATCH_SIZE,
+    CONST_QUERY_TELEMETRY_FLUSH_INTERVAL,
+    CONST_QUERY_TELEMETRY_DEFAULT_SAMPLE_PERCENT,
+    CONST_QUERY_TELEMETRY_DEFAULT_RETENTION_HOURS,
+    CONST_QUERY_TELEMETRY_HISTOGRAM_RETENTION_DAYS,
+    CONST_QUERY_TELEMETRY_BUCKETS_MS,
+    CONST_QUERY_TELEMETRY_OVERFLOW_BUCKET,
+    CONST_QUERY_TELEMETRY_SKETCH_ACCURACY,
+    CONST_QUERY_TELEMETRY_DIGEST_RETENTION_DAYS,
+    CONST_CONFIGURATION_DB
+)
+from src.ddsketch import DDSketch
+from src.detached import reset_config_cache, get_config_settings_detached
 
 def delete_database(db_path):
     """Deletes the specified SQLite database file if it exists."""
     logger = logging.getLogger(__name__)
     try:
+        close_pooled_connections(db_path)
+        if db_path == CONST_CONFIGURATION_DB:
+            reset_config_cache()
         if os.path.exists(db_path):
             os.remove(db_path)
             log_info(logger, f"[INFO] Deleted: {db_path}")
@@ -29,11 +56,67 @@ def delete_database(db_path):
         log_error(logger,f"[ERROR] Error deleting {db_path}: {e}")
 
 
-def connect_to_db(table):
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers which per-thread pool it belongs to."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_key = None
+        self.leased = False
+
+
+# Idle connections per thread, keyed by (database file, read_only)
+_thread_pools = threading.local()
+
+
+def _get_thread_pool():
+    pool = getattr(_thread_pools, "connections", None)
+    if pool is None:
+        pool = _thread_pools.connections = {}
+    return pool
+
+
+def _open_connection(db_name, read_only):
+    """Open a new connection to db_name and apply the pragma profile once."""
+    conn = None
+    if read_only:
+        try:
+            conn = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True, factory=PooledConnection,
+                                   cached_statements=CONST_SQLITE_CACHED_STATEMENTS)
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        except sqlite3.OperationalError:
+            # A WAL database cannot be opened with mode=ro while its -shm file is missing
+            if conn:
+                conn.close()
+            conn = sqlite3.connect(db_name, factory=PooledConnection, cached_statements=CONST_SQLITE_CACHED_STATEMENTS)
+            conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(db_name, factory=PooledConnection, cached_statements=CONST_SQLITE_CACHED_STATEMENTS)
+    for pragma in CONST_SQLITE_CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma}").fetchall()
+    conn.pool_key = (db_name, read_only)
+    return conn
+
+
+def _is_open(conn):
+    try:
+        conn.in_transaction
+        return True
+    except sqlite3.ProgrammingError:
+        return False
+
+
+def connect_to_db(table, read_only=False):
     """
     Connect to the appropriate database based on the table name.
+
+    Connections are pooled per thread and database file: an idle connection left
+    by disconnect_from_db is reused, so the tuned pragma profile is applied only
+    once per connection. Nested calls on the same thread get separate connections.
+
     Args:
         table_name (str): The name of the table to determine which database to connect to.
+        read_only (bool): Open the database with mode=ro, for API threads that only read.
     Returns:
         sqlite3.Connection: The database connection object.
     """
@@ -43,8 +126,15 @@ def connect_to_db(table):
         raise ValueError(f"No database mapping found for table: {table}")
     
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.execute("PRAGMA busy_timeout = 10000")
+        idle = _get_thread_pool().setdefault((DB_NAME, read_only), [])
+        while idle:
+            conn = idle.pop()
+            if _is_open(conn):
+                conn.leased = True
+                return conn
+
+        conn = _open_connection(DB_NAME, read_only)
+        conn.leased = True
         #log_info(logger, f"[INFO] Connected to database: {DB_NAME} table {table}")
         return conn
     except sqlite3.Error as e:
@@ -54,14 +144,33 @@ def connect_to_db(table):
 
 def disconnect_from_db(conn):
     """
-    Safely close the database connection.
+    Release a database connection.
+
+    Pooled connections go back to the calling thread's pool for reuse. Any
+    transaction left open is rolled back, as closing the connection would have done.
 
     Args:
         conn: The SQLite connection object to close.
     """
     logger = logging.getLogger(__name__)
     try:
-        if conn:
+        if not conn:
+            return
+        if not isinstance(conn, PooledConnection) or conn.pool_key is None:
+            conn.close()
+            return
+        if not conn.leased or not _is_open(conn):
+            # Already released or closed directly by the caller
+            return
+
+        conn.leased = False
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+        idle = _get_thread_pool().setdefault(conn.pool_key, [])
+        if len(idle) < CONST_SQLITE_MAX_IDLE_CONNECTIONS:
+            idle.append(conn)
+        else:
             conn.close()
             #log_info(logger, "[INFO] Database connection closed successfully.")
     except sqlite3.Error as e:
@@ -70,6 +179,123 @@ def disconnect_from_db(conn):
         log_error(logger, f"[ERROR] Unexpected error while closing database connection: {e}")
 
 
+def close_pooled_connections(db_name=None):
+    """
+    Close the calling thread's idle pooled connections, e.g. before a database file is deleted.
+
+    Args:
+        db_name (str): Only close connections to this database file, or None for all.
+    """
+    pool = _get_thread_pool()
+    for key in list(pool.keys()):
+        if db_name is None or key[0] == db_name:
+            for conn in pool.pop(key):
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+
+
+def get_db_alias(table):
+    """
+    Return the stable schema alias of the database holding a table, used by
+    connect_to_attached_dbs: the database file name without extension, e.g.
+    "alerts" for alerts.db or "performance" for performance.db.
+    """
+    db_name = TABLE_DB_MAP.get(table)
+    if not db_name:
+        raise ValueError(f"No database mapping found for table: {table}")
+    return os.path.splitext(os.path.basename(db_name))[0]
+
+
+def connect_to_attached_dbs(tables, read_only=False):
+    """
+    Open one connection with the databases of all the given tables ATTACHed, so
+    that tables spread over several files can be joined in a single SQL statement.
+
+    Every attached database is available under its get_db_alias() schema name.
+    Table names are unique across the databases, so unqualified names resolve too.
+    Connections are pooled per thread and set of databases like connect_to_db.
+
+    Args:
+        tables (list): Table names whose databases are needed, e.g. ["alerts", "localhosts"].
+        read_only (bool): Make the connection query only.
+
+    Returns:
+        sqlite3.Connection: The database connection object, or None on error.
+
+    Example:
+        conn = connect_to_attached_dbs(["alerts", "localhosts"], read_only=True)
+        conn.execute("SELECT a.id, l.local_description FROM alerts.alerts a JOIN localhosts.localhosts l ON l.ip_address = a.ip_address")
+    """
+    logger = logging.getLogger(__name__)
+    db_names = []
+    for table in tables:
+        db_name = TABLE_DB_MAP.get(table)
+        if not db_name:
+            raise ValueError(f"No database mapping found for table: {table}")
+        if db_name not in db_names:
+            db_names.append(db_name)
+    pool_key = (":memory:", read_only, tuple(db_names))
+
+    try:
+        idle = _get_thread_pool().setdefault(pool_key, [])
+        while idle:
+            conn = idle.pop()
+            if _is_open(conn):
+                conn.leased = True
+                return conn
+
+        # Every database is attached to an empty in-memory main database, so
+        # each one is addressed the same way through its alias
+        conn = _open_connection(":memory:", False)
+        for db_name in db_names:
+            alias = os.path.splitext(os.path.basename(db_name))[0]
+            conn.execute("ATTACH DATABASE ? AS " + alias, (db_name,))
+            for pragma in CONST_SQLITE_CONNECTION_PRAGMAS:
+                conn.execute(f"PRAGMA {alias}.{pragma}").fetchall()
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        conn.pool_key = pool_key
+        conn.leased = True
+        return conn
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error attaching databases {', '.join(db_names)}: {e}")
+        return None
+
+
+@contextmanager
+def db_transaction(table, immediate=False):
+    """
+    Run a block of statements in one explicit transaction on a pooled connection.
+    The transaction is committed when the block exits normally and rolled back if
+    it raises.
+
+    Args:
+        table (str): Table name used to select the database.
+        immediate (bool): Take the write lock up front with BEGIN IMMEDIATE.
+
+    Yields:
+        sqlite3.Connection: The connection to run the statements on.
+
+    Example:
+        with db_transaction("alerts") as conn:
+            conn.execute("UPDATE alerts SET acknowledged = 1 WHERE id = ?", (alert_id,))
+    """
+    conn = connect_to_db(table)
+    if not conn:
+        raise sqlite3.OperationalError(f"Unable to connect to database for table {table}")
+    try:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        disconnect_from_db(conn)
+
+
 
 def create_table(create_table_sql, table):
     """Initializes a SQLite database with the specified schema."""
@@ -149,38 +375,225 @@ def get_row_count(table_name):
         if 'conn' in locals():
             disconnect_from_db(conn)
 
+# Query telemetry is queued here and written in batches by a background thread
+_telemetry_queue = queue.Queue(maxsize=CONST_QUERY_TELEMETRY_QUEUE_SIZE)
+_telemetry_thread = None
+_telemetry_lock = threading.Lock()
+_telemetry_sample_rate = CONST_QUERY_TELEMETRY_DEFAULT_SAMPLE_PERCENT / 100.0
+_telemetry_dropped = 0
+
+
+def _histogram_bucket(execution_time):
+    """Return the upper bound in ms of the histogram bucket for an execution time in seconds."""
+    execution_ms = execution_time * 1000
+    for bound in CONST_QUERY_TELEMETRY_BUCKETS_MS:
+        if execution_ms <= bound:
+            return bound
+    return CONST_QUERY_TELEMETRY_OVERFLOW_BUCKET
+
+
+def _read_telemetry_settings():
+    """Refresh the sample rate and raw retention from the cached configuration."""
+    global _telemetry_sample_rate
+    settings = {
+        "QueryTelemetrySamplePercent": CONST_QUERY_TELEMETRY_DEFAULT_SAMPLE_PERCENT,
+        "QueryTelemetryRetentionHours": CONST_QUERY_TELEMETRY_DEFAULT_RETENTION_HOURS,
+    }
+    config_dict = get_config_settings_detached() or {}
+    for key in settings:
+        try:
+            settings[key] = float(config_dict.get(key, settings[key]))
+        except (TypeError, ValueError):
+            pass
+    _telemetry_sample_rate = min(max(settings["QueryTelemetrySamplePercent"], 0), 100) / 100.0
+    return settings
+
+
+def _merge_telemetry_digests(cursor, digests):
+    """Merge per hour digests of this batch into the dbperformancedigest rows."""
+    for (hour, function), (sketch, total_time, min_time, max_time) in digests.items():
+        cursor.execute("""
+            SELECT count, total_time, min_time, max_time, sketch
+            FROM dbperformancedigest WHERE hour = ? AND function = ?
+        """, (hour, function))
+        row = cursor.fetchone()
+        if row:
+            sketch.merge(DDSketch.from_json(row[4]))
+            total_time += row[1]
+            min_time = min(min_time, row[2])
+            max_time = max(max_time, row[3])
+        cursor.execute("""
+            INSERT OR REPLACE INTO dbperformancedigest (hour, function, count, total_time, min_time, max_time, sketch)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (hour, function, sketch.count, total_time, min_time, max_time, sketch.to_json()))
+
+
+def _write_telemetry_batch(batch):
+    """Write sampled raw rows, per minute histograms and per hour digests in one transaction."""
+    raw_rows = [item[:6] for item in batch if item[6]]
+    histogram = {}
+    digests = {}
+    for db_name, query, description, execution_time, rows_returned, run_timestamp, _ in batch:
+        key = (run_timestamp[:16], description, _histogram_bucket(execution_time))
+        entry = histogram.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        entry[1] += execution_time
+
+        key = (run_timestamp[:13], description)
+        digest = digests.get(key)
+        if digest is None:
+            digest = digests[key] = [DDSketch(CONST_QUERY_TELEMETRY_SKETCH_ACCURACY), 0.0, execution_time, execution_time]
+        digest[0].add(execution_time)
+        digest[1] += execution_time
+        digest[2] = min(digest[2], execution_time)
+        digest[3] = max(digest[3], execution_time)
+
+    conn = connect_to_db("dbperformance")
+    if not conn:
+        return False
+    try:
+        cursor = conn.cursor()
+        # Digests are read, merged and written back, so take the write lock up front
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany("""
+            INSERT INTO dbperformance (db_name, query, function, execution_time, rows_returned, run_timestamp)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, raw_rows)
+        cursor.executemany("""
+            INSERT INTO dbperformancehistogram (minute, function, bucket_ms, count, total_time)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(minute, function, bucket_ms)
+            DO UPDATE SET
+                count = count + excluded.count,
+                total_time = total_time + excluded.total_time
+        """, [(minute, function, bucket, count, total) for (minute, function, bucket), (count, total) in histogram.items()])
+        _merge_telemetry_digests(cursor, digests)
+        conn.commit()
+        return True
+    except (sqlite3.Error, ValueError):
+        conn.rollback()
+        return False
+    finally:
+        disconnect_from_db(conn)
+
+
+def _prune_telemetry(retention_hours):
+    """Apply retention to the raw, histogram and digest telemetry tables."""
+    conn = connect_to_db("dbperformance")
+    if not conn:
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM dbperformance WHERE run_timestamp < datetime('now', 'localtime', ?)",
+                       (f"-{int(retention_hours)} hours",))
+        cursor.execute("DELETE FROM dbperformancehistogram WHERE minute < strftime('%Y-%m-%d %H:%M', 'now', 'localtime', ?)",
+                       (f"-{CONST_QUERY_TELEMETRY_HISTOGRAM_RETENTION_DAYS} days",))
+        cursor.execute("DELETE FROM dbperformancedigest WHERE hour < strftime('%Y-%m-%d %H', 'now', 'localtime', ?)",
+                       (f"-{CONST_QUERY_TELEMETRY_DIGEST_RETENTION_DAYS} days",))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+    finally:
+        disconnect_from_db(conn)
+
+
+def _telemetry_writer_loop():
+    # Runs on its own thread: errors are swallowed instead of logged, since logging
+    # can itself produce telemetry and must never block the caller
+    last_settings = 0
+    last_prune = 0
+    settings = {"QueryTelemetryRetentionHours": CONST_QUERY_TELEMETRY_DEFAULT_RETENTION_HOURS}
+    while True:
+        batch = [_telemetry_queue.get()]
+        deadline = time.time() + CONST_QUERY_TELEMETRY_FLUSH_INTERVAL
+        while len(batch) < CONST_QUERY_TELEMETRY_BATCH_SIZE:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_telemetry_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        now = time.time()
+        if now - last_settings >= 60:
+            settings = _read_telemetry_settings()
+            last_settings = now
+
+        _write_telemetry_batch(batch)
+
+        if now - last_prune >= 3600:
+            _prune_telemetry(settings["QueryTelemetryRetentionHours"])
+            last_prune = now
+
+
+def _start_telemetry_writer():
+    global _telemetry_thread
+    with _telemetry_lock:
+        if _telemetry_thread and _telemetry_thread.is_alive():
+            return
+        _telemetry_thread = threading.Thread(target=_telemetry_writer_loop, name="query-telemetry", daemon=True)
+        _telemetry_thread.start()
+        atexit.register(flush_query_telemetry)
+
+
+def flush_query_telemetry():
+    """
+    Write all queued query telemetry synchronously. Called at process exit so
+    the last batch is not lost.
+    """
+    batch = []
+    while True:
+        try:
+            batch.append(_telemetry_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _write_telemetry_batch(batch)
+
+
+def get_query_telemetry_dropped():
+    """Return the number of telemetry records dropped because the queue was full."""
+    return _telemetry_dropped
+
+
 def insert_dbperformance(table_name, query, description, execution_time, rows_returned):
     """
-    Insert a performance record into the dbperformance table.
+    Record a query execution for the dbperformance telemetry.
+
+    The record is queued and written in batches by a background thread. Every
+    record is counted in the per minute dbperformancehistogram table, while only
+    QueryTelemetrySamplePercent percent of them are kept as raw dbperformance rows.
 
     Args:
         db_name (str): The database file path.
         query (str): The SQL query string.
-        execution_time (float): Execution time in milliseconds.
+        execution_time (float): Execution time in seconds.
         rows_returned (int): Number of rows returned or affected.
-        run_timestamp (str, optional): Timestamp of the run. If None, uses current time.
-    """
-    logger = logging.getLogger(__name__)
 
+    Returns:
+        bool: True if the record was queued, False if the queue was full.
+    """
+    global _telemetry_dropped
+    if not isinstance(description, str):
+        description = " ".join(description) if description else ""
+    sampled = random.random() < _telemetry_sample_rate
+    record = (
+        table_name,
+        query,
+        description,
+        execution_time,
+        rows_returned,
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        sampled
+    )
+    _start_telemetry_writer()
     try:
-        conn = connect_to_db("dbperformance")
-        if not conn:
-            log_error(logger, f"[ERROR] Unable to connect to {CONST_PERFORMANCE_DB} for dbperformance insert.")
-            return False
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO dbperformance (db_name, query, function, execution_time, rows_returned, run_timestamp)
-            VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
-        """, (table_name, query, description, execution_time, rows_returned))
-        conn.commit()
-       # log_info(logger, f"[INFO] Inserted dbperformance record for query: {query[:50]}...")
+        _telemetry_queue.put_nowait(record)
         return True
-    except Exception as e:
-        log_error(logger, f"[ERROR] Failed to insert dbperformance record: {e}")
+    except queue.Full:
+        _telemetry_dropped += 1
         return False
-    finally:
-        if 'conn' in locals() and conn:
-            disconnect_from_db(conn)
 
 def run_timed_query(cursor, query, params=None, description=None, fetch_all=True):
     """
@@ -197,7 +610,9 @@ def run_timed_query(cursor, query, params=None, description=None, fetch_all=True
         tuple: (results, execution_time_ms) or (rowcount, execution_time_ms) for non-SELECT queries
     """
     logger = logging.getLogger(__name__)
-    desc = description or query.split()[0:3]  # Use first few words of query if no description
+    desc = description or " ".join(query.split()[0:3])  # Use first few words of query if no description
+    pool_key = getattr(cursor.connection, "pool_key", None)
+    db_name = os.path.basename(pool_key[0]) if pool_key else ""
     
     start_time = time.time()
     if params:
@@ -209,13 +624,13 @@ def run_timed_query(cursor, query, params=None, description=None, fetch_all=True
         results = cursor.fetchall()
         execution_time = (time.time() - start_time)
         log_info(logger, f"[PERFORMANCE] Query '{desc}' returned {len(results)} rows in {execution_time:.2f} ms")
-        insert_dbperformance("", query, desc, execution_time, len(results))
+        insert_dbperformance(db_name, query, desc, execution_time, len(results))
         return results, execution_time
     else:
         rowcount = cursor.rowcount
         execution_time = (time.time() - start_time)
         log_info(logger, f"[PERFORMANCE] Query '{desc}' affected {rowcount} rows in {execution_time:.2f} ms")
-        insert_dbperformance("", query, desc, execution_time, rowcount)
+        insert_dbperformance(db_name, query, desc, execution_time, rowcount)
         return rowcount, execution_time
     
 def delete_table(table_name):
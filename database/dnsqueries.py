@@ -10,6 +10,50 @@ if parent_dir not in sys.path:
 sys.path.insert(0, "/database")
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from init import *
+import threading
+from collections import OrderedDict
+
+# Most recent domain (or None) by address with the time it was read, see get_ip_domains
+_ip_domain_cache = OrderedDict()
+_ip_domain_cache_lock = threading.Lock()
+
+_UPSERT_IP_DOMAIN_SQL = """
+    INSERT INTO ipdomains (ip, domain, last_seen) VALUES (?, ?, datetime('now', 'localtime'))
+    ON CONFLICT(ip, domain) DO UPDATE SET last_seen = excluded.last_seen
+"""
+# A new query of a domain makes its addresses point to it again
+_TOUCH_IP_DOMAINS_SQL = "UPDATE ipdomains SET last_seen = datetime('now', 'localtime') WHERE domain = ?"
+
+
+def split_dns_response(response):
+    """
+    Return the IPv4 addresses of a comma separated DNS response. Status values
+    (NXDOMAIN, TIMEOUT, ERROR: ...) give an empty list.
+    """
+    addresses = []
+    for value in (response or "").split(','):
+        try:
+            addresses.append(str(ipaddress.IPv4Address(value.strip())))
+        except ValueError:
+            continue
+    return addresses
+
+
+def _cache_ip_domains(ip_domains):
+    """Add (ip, domain) pairs to the IP to domain cache, evicting the least recently used addresses."""
+    now = time.time()
+    with _ip_domain_cache_lock:
+        for ip, domain in ip_domains:
+            _ip_domain_cache[ip] = (domain, now)
+            _ip_domain_cache.move_to_end(ip)
+        while len(_ip_domain_cache) > CONST_IP_DOMAIN_CACHE_SIZE:
+            _ip_domain_cache.popitem(last=False)
+
+
+def reset_ip_domain_cache():
+    """Drop the cached IP to domain lookups."""
+    with _ip_domain_cache_lock:
+        _ip_domain_cache.clear()
 
 
 def insert_dns_query(client_ip, domain, times_seen, datasource):
@@ -44,6 +88,7 @@ def insert_dns_query(client_ip, domain, times_seen, datasource):
                 last_seen = datetime('now', 'localtime'),
                 times_seen = times_seen + excluded.times_seen
         """, (client_ip, domain, times_seen, datasource))
+        cursor.execute(_TOUCH_IP_DOMAINS_SQL, (domain,))
         
         # Commit the changes
         conn.commit()
@@ -166,6 +211,7 @@ def insert_dns_queries_batch(queries, datasource):
                 last_seen = datetime('now', 'localtime'),
                 times_seen = times_seen + excluded.times_seen
         """, batch_data)
+        cursor.executemany(_TOUCH_IP_DOMAINS_SQL, [(domain,) for domain in {row[1] for row in batch_data}])
         
         # Commit the transaction
         conn.commit()
@@ -215,9 +261,17 @@ def update_dns_query_response(response, id):
             SET response = ?, last_refresh = datetime('now', 'localtime')
             WHERE id = ?
         """, (response, id))
+
+        # Record the answered addresses for the IP to domain lookups
+        addresses = split_dns_response(response)
+        row = cursor.execute("SELECT domain FROM dnsqueries WHERE id = ?", (id,)).fetchone()
+        if row and addresses:
+            cursor.executemany(_UPSERT_IP_DOMAIN_SQL, [(ip, row[0]) for ip in addresses])
                 
         # Commit the changes
         conn.commit()
+        if row and addresses:
+            _cache_ip_domains((ip, row[0]) for ip in addresses)
         
         return True
         
@@ -284,7 +338,7 @@ def get_dnsqueries_without_responses():
 def get_ip_to_domain_mapping():
     """
     Retrieve a mapping of IP addresses to their corresponding domain names
-    from the dnsqueries table, using a recursive query to split multi-IP responses.
+    from the ipdomains table, the most recently seen domain wins.
 
     Returns:
         dict: A dictionary with IP addresses as keys and domain names as values.
@@ -294,54 +348,21 @@ def get_ip_to_domain_mapping():
 
     try:
         # Connect to the database
-        conn = connect_to_db( "dnsqueries")
+        conn = connect_to_db( "ipdomains", read_only=True)
         if not conn:
             log_error(logger, "[ERROR] Unable to connect to database for IP-domain mapping.")
             return {}
 
-        conn.create_function("TRIM", 1, lambda x: x.strip() if x else "")
         cursor = conn.cursor()
-
-        # Recursive query to split comma-separated IP addresses, wrapped in run_timed_query
-        query = """
-            WITH RECURSIVE split(id, domain, ip_address, rest) AS (
-              SELECT
-                id,
-                domain,
-                '',                     -- Initial IP (empty)
-                response || ','         -- Append comma to simplify parsing
-              FROM dnsqueries
-              WHERE response IS NOT NULL 
-                AND response != '' 
-                AND response != 'TIMEOUT'
-              
-              UNION ALL
-              
-              SELECT
-                id,
-                domain,
-                TRIM(substr(rest, 0, instr(rest, ','))),
-                substr(rest, instr(rest, ',') + 1)
-              FROM split
-              WHERE rest != ''
-            )
-            SELECT ip_address, domain
-            FROM split
-            WHERE ip_address != ''
-        """
         rows, _ = run_timed_query(
             cursor,
-            query,
+            "SELECT ip, domain FROM ipdomains ORDER BY last_seen",
             description="get_ip_to_domain_mapping",
             fetch_all=True
         )
 
-        # Create dictionary mapping IP address -> domain
-        ip_to_domain = {}
-        for ip, domain in rows:
-            # If IP is valid (check with simple validation)
-            if ip and '.' in ip and not (ip.startswith(';') or ip.startswith('#')):
-                ip_to_domain[ip.strip()] = domain
+        # Later rows are more recent and replace earlier domains of the same address
+        ip_to_domain = dict(rows)
 
         log_info(logger, f"[INFO] Created IP-to-domain mapping with {len(ip_to_domain)} entries")
         return ip_to_domain
@@ -354,4 +375,61 @@ def get_ip_to_domain_mapping():
         return {}
     finally:
         if 'conn' in locals() and conn:
-            disconnect_from_db(conn)
\ No newline at end of file
+            disconnect_from_db(conn)
+
+
+def get_ip_domains(ip_addresses, batch_size=500):
+    """
+    Look up the most recently seen domain of each address. Addresses read within
+    the last CONST_IP_DOMAIN_CACHE_TTL seconds come from an in-process LRU cache,
+    the others are read from ipdomains batch_size at a time.
+
+    Args:
+        ip_addresses (iterable): IP address strings.
+        batch_size (int): Addresses per query.
+
+    Returns:
+        dict: Domain by address, None for addresses without a DNS answer. Addresses
+              that could not be read are left out.
+    """
+    logger = logging.getLogger(__name__)
+    now = time.time()
+    domains = {}
+    missing = []
+    with _ip_domain_cache_lock:
+        for ip in set(ip_addresses):
+            entry = _ip_domain_cache.get(ip)
+            if entry and now - entry[1] < CONST_IP_DOMAIN_CACHE_TTL:
+                _ip_domain_cache.move_to_end(ip)
+                domains[ip] = entry[0]
+            else:
+                missing.append(ip)
+    if not missing:
+        return domains
+
+    conn = connect_to_db("ipdomains", read_only=True)
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to database for IP-domain lookups.")
+        return domains
+
+    try:
+        cursor = conn.cursor()
+        found = {}
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            cursor.execute(f"""
+                SELECT ip, domain FROM ipdomains
+                WHERE ip IN ({', '.join('?' * len(batch))})
+                ORDER BY last_seen
+            """, batch)
+            # Later rows are more recent and replace earlier domains of the same address
+            for ip, domain in cursor.fetchall():
+                found[ip] = domain
+        looked_up = [(ip, found.get(ip)) for ip in missing]
+        _cache_ip_domains(looked_up)
+        domains.update(looked_up)
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Database error while looking up IP-domain mappings: {e}")
+    finally:
+        disconnect_from_db(conn)
+    return domains
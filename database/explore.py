@@ -11,145 +11,406 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from init import *
 import sqlite3
 import logging
+import threading
+import time
 from locallogging import log_info, log_error
+import base64
 import bisect
-from database.core import connect_to_db, disconnect_from_db, delete_all_records
-from database.dnsqueries import get_ip_to_domain_mapping
+from array import array
+import json
+import math
+from collections import OrderedDict
+from database.core import connect_to_db, disconnect_from_db, delete_all_records, connect_to_attached_dbs, run_timed_query
+from database.dnsqueries import get_ip_to_domain_mapping, get_ip_domains
 
-def bulk_populate_master_flow_view():
+# Enrichment and upsert of explore rows, the full rebuild and the incremental
+# refresh both hold the lock (reentrant, the refresh falls back to a rebuild)
+_explore_build_lock = threading.RLock()
+# Sorted geolocation and ipasn ranges, loaded by the full rebuild and reused by
+# the incremental refresh until the next rebuild
+_enrichment_ranges = None
+
+# Row counts and filter plans by query, each with the explore dataset version it was computed at
+_explore_cache = OrderedDict()
+_explore_cache_lock = threading.Lock()
+
+# The names are the localhost DNS hostnames, _build_explore_rows prefers the DNS answers of ipdomains
+_EXPLORE_SOURCE_QUERY = """
+    SELECT a.src_ip, a.dst_ip, a.src_ip_int, a.dst_ip_int, a.src_port, a.dst_port, a.protocol, a.tags, a.flow_start, a.last_seen,
+           a.packets, a.bytes, a.times_seen,
+           COALESCE(sl.dns_hostname, '') AS src_dns,
+           COALESCE(dl.dns_hostname, '') AS dst_dns,
+           CASE WHEN sl.ip_address IS NOT NULL THEN a.src_ip WHEN dl.ip_address IS NOT NULL THEN a.dst_ip END AS local_ip
+    FROM allflows a
+    LEFT JOIN localhosts.localhosts sl ON sl.ip_address = a.src_ip
+    LEFT JOIN localhosts.localhosts dl ON dl.ip_address = a.dst_ip
+"""
+
+# Full rebuilds load this table and swap it in for explore
+_EXPLORE_SHADOW_TABLE = "explore_new"
+_EXPLORE_SUMMARY_SHADOW_TABLE = "exploresummary_new"
+# Columns indexed by explorefts
+_EXPLORE_SEARCH_COLUMNS = (
+    "src_ip", "dst_ip", "src_port", "dst_port", "protocol", "tags", "src_dns", "dst_dns",
+    "src_country", "dst_country", "src_asn", "dst_asn", "src_isp", "dst_isp"
+)
+
+# Structured filters accepted by get_latest_master_flows, see parse_explore_filters
+EXPLORE_FILTER_NAMES = (
+    "src_country", "dst_country", "src_asn", "dst_asn", "src_port", "dst_port", "protocol",
+    "src_cidr", "dst_cidr", "ip", "since", "until", "hours"
+)
+# Filters with an index on their column (src_ip_int is the prefix of idx_explore_flow_key)
+EXPLORE_INDEXED_FILTERS = (
+    "src_country", "dst_country", "src_asn", "dst_asn", "dst_port", "src_cidr", "dst_cidr", "ip", "since", "until", "hours"
+)
+_EXPLORE_PROTOCOL_NUMBERS = {"icmp": "1", "tcp": "6", "udp": "17"}
+
+# Rollups served by get_explore_summary, see CONST_EXPLORE_SUMMARY_KEYS
+EXPLORE_SUMMARY_DIMENSIONS = tuple(CONST_EXPLORE_SUMMARY_KEYS)
+# Adds the shadow table rows past a flow_id to the shadow rollups, one statement per dimension
+_EXPLORE_SUMMARY_CHUNK_QUERIES = [f"""
+    INSERT INTO {_EXPLORE_SUMMARY_SHADOW_TABLE} (dimension, key, bytes, packets, flows)
+    SELECT '{dimension}', {key.format(row=_EXPLORE_SHADOW_TABLE)}, SUM(bytes), SUM(packets), COUNT(*)
+    FROM {_EXPLORE_SHADOW_TABLE}
+    WHERE flow_id > ? AND {key.format(row=_EXPLORE_SHADOW_TABLE)} IS NOT NULL
+    GROUP BY 2
+    ON CONFLICT (dimension, key) DO UPDATE SET
+        bytes = bytes + excluded.bytes, packets = packets + excluded.packets, flows = flows + excluded.flows
+""" for dimension, key in CONST_EXPLORE_SUMMARY_KEYS.items()]
+
+_EXPLORE_COLUMNS = """
+    src_ip, dst_ip, src_ip_int, dst_ip_int, src_port, dst_port, protocol, tags, flow_start, last_seen,
+    packets, bytes, times_seen,
+    src_dns, dst_dns, local_ip, src_country, dst_country, src_asn, dst_asn, src_isp, dst_isp
+"""
+
+
+def _load_range_table(table, value_columns):
     """
-    Extract all data from allflows, dnskeyvalue, geolocation, and ipasn,
-    join in Python memory, and bulk insert into master_flow_view in CONST_EXPLORE_DB.
-    The 'concat' column is the '_' concatenation of all other columns for each row.
+    Read the ranges of geolocation or ipasn ordered by start address into parallel
+    arrays: starts and ends as 64 bit integer arrays and the values as a list,
+    repeated values share one object.
+
+    Returns:
+        tuple: (starts, ends, values)
     """
-    logger = logging.getLogger(__name__)
+    starts = array("q")
+    ends = array("q")
+    values = []
+    shared_values = {}
+    src_conn = connect_to_db(table)
     try:
-        log_info(logger, f"[INFO] Loading allflows...")
-        src_conn= connect_to_db( "allflows")
         src_cursor = src_conn.cursor()
-        src_cursor.execute("SELECT rowid, src_ip, dst_ip, src_port, dst_port, protocol, tags, flow_start, last_seen, packets, bytes, times_seen FROM allflows")
-        allflows_rows = src_cursor.fetchall()
+        src_cursor.execute(f"SELECT start_ip, end_ip, {value_columns} FROM {table} ORDER BY start_ip")
+        while True:
+            rows = src_cursor.fetchmany(CONST_EXPLORE_BUILD_CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                starts.append(int(row[0]))
+                ends.append(int(row[1]))
+                value = row[2] if len(row) == 3 else row[2:]
+                values.append(shared_values.setdefault(value, value))
+    finally:
         disconnect_from_db(src_conn)
-        log_info(logger, f"[INFO] Loaded {len(allflows_rows)} flows.")
+    return starts, ends, values
 
-        log_info(logger, f"[INFO] Loading dnskeyvalue...")
-        tgt_conn = connect_to_db( "dnskeyvalue")
-        tgt_cursor = tgt_conn.cursor()
-        tgt_cursor.execute("SELECT ip, domain FROM dnskeyvalue")
-        dnskeyvalue = dict(tgt_cursor.fetchall())
-        disconnect_from_db(tgt_conn)
 
-        log_info(logger, f"[INFO] Loading geolocation...")
-        src_conn = connect_to_db( "geolocation")
-        src_cursor = src_conn.cursor()
-        src_cursor.execute("SELECT start_ip, end_ip, country_name FROM geolocation")
-        geolocation_rows = src_cursor.fetchall()
-        geolocations = []
-        for start_ip, end_ip, country in geolocation_rows:
-            geolocations.append((int(start_ip), int(end_ip), country))
-        disconnect_from_db(src_conn)
+def _load_enrichment_ranges():
+    """
+    Load the geolocation and ipasn ranges sorted by start address for bisect lookups.
+
+    Returns:
+        tuple: ((geo_starts, geo_ends, countries), (ipasn_starts, ipasn_ends, (asn, isp) pairs))
+    """
+    logger = logging.getLogger(__name__)
+    log_info(logger, f"[INFO] Loading geolocation...")
+    geolocations = _load_range_table("geolocation", "country_name")
+    log_info(logger, f"[INFO] Loading ipasn...")
+    ipasns = _load_range_table("ipasn", "asn, isp_name")
+    log_info(logger, f"[INFO] Loaded {len(geolocations[0])} geolocation and {len(ipasns[0])} ipasn ranges.")
+    return geolocations, ipasns
 
-        # Prepare sorted lists for geolocation and ipasn
-        geolocations_sorted = sorted(geolocations, key=lambda x: x[0])
-        geo_starts = [start for start, end, country in geolocations_sorted]
 
-        log_info(logger, f"[INFO] Loading ipasn...")
-        src_conn = connect_to_db( "ipasn")
-        src_cursor = src_conn.cursor()
-        src_cursor.execute("SELECT start_ip, end_ip, asn, isp_name FROM ipasn")
-        ipasn_rows = src_cursor.fetchall()
-        ipasns = []
-        for start_ip, end_ip, asn, isp in ipasn_rows:
-            ipasns.append((int(start_ip), int(end_ip), asn, isp))
-        disconnect_from_db(src_conn)
+def _lookup_ranges(ranges, ip_ints):
+    """
+    Return the value of the range containing each address of ip_ints.
 
-        ipasns_sorted = sorted(ipasns, key=lambda x: x[0])
-        ipasn_starts = [start for start, end, asn, isp in ipasns_sorted]
+    Args:
+        ranges (tuple): (starts, ends, values) from _load_range_table.
+        ip_ints (iterable): Integer addresses, None is allowed.
 
-        def lookup_geo(ip_int):
-            idx = bisect.bisect_right(geo_starts, ip_int) - 1
-            if idx >= 0:
-                start, end, country = geolocations_sorted[idx]
-                if start <= ip_int <= end:
-                    return country
-            return None
+    Returns:
+        dict: Value (or None) by address.
+    """
+    starts, ends, values = ranges
+    found = {None: None}
+    # Addresses in ascending order narrow the bisect window as the batch advances
+    low = 0
+    for ip_int in sorted(ip for ip in set(ip_ints) if ip is not None):
+        idx = bisect.bisect_right(starts, ip_int, low) - 1
+        if idx >= 0 and ip_int <= ends[idx]:
+            found[ip_int] = values[idx]
+        else:
+            found[ip_int] = None
+        low = max(idx, 0)
+    return found
+
+
+def _build_explore_rows(allflows_rows, enrichment_ranges):
+    """
+    Add DNS names, country, ASN and ISP to rows read with _EXPLORE_SOURCE_QUERY.
+    The addresses of the batch are looked up once each, see _lookup_ranges and
+    get_ip_domains.
+
+    Returns:
+        list: Tuples in _EXPLORE_COLUMNS order.
+    """
+    geolocations, ipasns = enrichment_ranges
+    ip_ints = [row[2] for row in allflows_rows] + [row[3] for row in allflows_rows]
+    countries = _lookup_ranges(geolocations, ip_ints)
+    asns = _lookup_ranges(ipasns, ip_ints)
+    domains = get_ip_domains([row[0] for row in allflows_rows] + [row[1] for row in allflows_rows])
+    master_rows = []
+    for row in allflows_rows:
+        src_ip_int, dst_ip_int = row[2], row[3]
+        src_asn, src_isp = asns[src_ip_int] or (None, None)
+        dst_asn, dst_isp = asns[dst_ip_int] or (None, None)
+        master_rows.append(
+            row[:13] + (domains.get(row[0]) or row[13], domains.get(row[1]) or row[14]) + row[15:] +
+            (countries[src_ip_int], countries[dst_ip_int], src_asn, dst_asn, src_isp, dst_isp)
+        )
+    return master_rows
+
+
+def _set_explore_watermark(cursor, watermark):
+    cursor.execute(
+        "INSERT OR REPLACE INTO explorestate (name, value) VALUES ('watermark', ?)",
+        (watermark,)
+    )
+
+
+def _bump_explore_version(cursor):
+    """Increment the explore dataset version, invalidating the cached counts of every process."""
+    cursor.execute("""
+        INSERT INTO explorestate (name, value) VALUES ('version', 1)
+        ON CONFLICT (name) DO UPDATE SET value = value + 1
+    """)
 
-        def lookup_ipasn(ip_int):
-            idx = bisect.bisect_right(ipasn_starts, ip_int) - 1
-            if idx >= 0:
-                start, end, asn, isp = ipasns_sorted[idx]
-                if start <= ip_int <= end:
-                    return asn, isp
-            return None, None
-
-        log_info(logger, "[INFO] Joining data in memory and preparing for insert...")
-        master_rows = []
-        total_flows = len(allflows_rows)
-        progress_step = max(1, total_flows // 20)  # Log progress every 2%
-        # Load localhosts DNS hostnames
-        tgt_conn = connect_to_db( "localhosts")
-        tgt_cursor = tgt_conn.cursor()
-        tgt_cursor.execute("SELECT ip_address, dns_hostname FROM localhosts")
-        localhosts_dns = {row[0]: row[1] for row in tgt_cursor.fetchall()}
-        disconnect_from_db(tgt_conn)
-
-        for idx, row in enumerate(allflows_rows, 1):
-            (flow_id, src_ip, dst_ip, src_port, dst_port, protocol, tags, flow_start, last_seen, packets, bytes_, times_seen) = row
-            src_ip_int = ip_to_int(src_ip)
-            dst_ip_int = ip_to_int(dst_ip)
-            src_dns = dnskeyvalue.get(src_ip) or localhosts_dns.get(src_ip, '')
-            dst_dns = dnskeyvalue.get(dst_ip) or localhosts_dns.get(dst_ip, '')
-            src_country = lookup_geo(src_ip_int) if src_ip_int is not None else None
-            dst_country = lookup_geo(dst_ip_int) if dst_ip_int is not None else None
-            src_asn, src_isp = lookup_ipasn(src_ip_int) if src_ip_int is not None else (None, None)
-            dst_asn, dst_isp = lookup_ipasn(dst_ip_int) if dst_ip_int is not None else (None, None)
-            concat_values = [
-                str(flow_id), str(src_ip), str(dst_ip), str(src_ip_int), str(dst_ip_int),
-                str(src_port), str(dst_port), str(protocol), str(tags), str(flow_start), str(last_seen),
-                str(packets), str(bytes_), str(times_seen),
-                str(src_dns), str(dst_dns), str(src_country), str(dst_country),
-                str(src_asn), str(dst_asn), str(src_isp), str(dst_isp)
-            ]
-            concat = "_".join(concat_values)
-            master_rows.append((
-                flow_id, src_ip, dst_ip, src_ip_int, dst_ip_int, src_port, dst_port, protocol, tags, flow_start, last_seen,
-                packets, bytes_, times_seen,
-                src_dns, dst_dns, src_country, dst_country, src_asn, dst_asn, src_isp, dst_isp, concat
-            ))
-           # if idx % progress_step == 0 or idx == total_flows:
-               # log_info(logger, f"[PROGRESS] Joined {idx}/{total_flows} flows in memory...")
-
-        delete_all_records("explore")
-        log_info(logger, f"[INFO] Inserting {len(master_rows)} rows into master_flow_view in {CONST_EXPLORE_DB}...")
-
-        # Batch insert with progress counter
-        batch_size = 1000
-        total = len(master_rows)
-
-        tgt_conn = connect_to_db( "explore")
-        tgt_cursor= tgt_conn.cursor()
-
-        for i in range(0, total, batch_size):
-            batch = master_rows[i:i+batch_size]
-            tgt_cursor.executemany("""
-                INSERT OR REPLACE INTO explore (
-                    flow_id, src_ip, dst_ip, src_ip_int, dst_ip_int, src_port, dst_port, protocol, tags, flow_start, last_seen,
-                    packets, bytes, times_seen,
-                    src_dns, dst_dns, src_country, dst_country, src_asn, dst_asn, src_isp, dst_isp, concat
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, batch)
-            tgt_conn.commit()
-            #log_info(logger, f"[PROGRESS] Inserted {min(i+batch_size, total)}/{total} rows into master_flow_view...")
-
-        disconnect_from_db(tgt_conn)
-        log_info(logger, f"[INFO] Inserted {total} records into master_flow_view in {CONST_EXPLORE_DB}.")
+
+def get_explore_watermark():
+    """
+    Return the last_seen (epoch seconds) of the newest allflows row already in
+    explore, or None if explore was never built.
+    """
+    conn = connect_to_db("explorestate", read_only=True)
+    try:
+        row = conn.execute("SELECT value FROM explorestate WHERE name = 'watermark'").fetchone()
+        return row[0] if row else None
+    finally:
+        disconnect_from_db(conn)
+
+
+def _swap_explore_shadow_table(conn, watermark):
+    """
+    Replace explore and exploresummary with the loaded shadow tables in one
+    transaction. The indexes, the search index and the triggers are built on the
+    new rows inside the same transaction, so readers see the old explore until the
+    commit and a complete, indexed explore after it.
+
+    Args:
+        conn: Connection to the explore database.
+        watermark (int): Refresh watermark covered by the shadow table rows.
+    """
+    # The script leaves its transaction open for the state updates, which bind parameters
+    conn.executescript(f"""
+        BEGIN IMMEDIATE;
+        DROP TABLE explore;
+        DROP TABLE IF EXISTS exploresummary;
+        ALTER TABLE {_EXPLORE_SHADOW_TABLE} RENAME TO explore;
+        ALTER TABLE {_EXPLORE_SUMMARY_SHADOW_TABLE} RENAME TO exploresummary;
+        {CONST_CREATE_EXPLORE_SQL};
+        INSERT INTO explorefts (explorefts) VALUES ('rebuild');
+    """)
+    cursor = conn.cursor()
+    _set_explore_watermark(cursor, watermark)
+    _bump_explore_version(cursor)
+    conn.commit()
+
+
+def bulk_populate_master_flow_view():
+    """
+    Rebuild explore from allflows, ipdomains, geolocation, and ipasn. Flows are
+    read in chunks of CONST_EXPLORE_BUILD_CHUNK_SIZE, enriched and written to a
+    shadow table that replaces explore at the end (see _swap_explore_shadow_table),
+    so memory use depends on the chunk size and the enrichment ranges, not on the
+    size of allflows. The rollups of exploresummary are added up chunk by chunk in
+    a shadow table swapped in with it.
+
+    This full rebuild also reloads the enrichment ranges and resets the watermark
+    of refresh_master_flow_view, it is the repair path for the incremental refresh.
+
+    Returns:
+        dict: Rows written, duration and rows per second, or None on failure.
+    """
+    global _enrichment_ranges
+    logger = logging.getLogger(__name__)
+    try:
+        with _explore_build_lock:
+            _enrichment_ranges = _load_enrichment_ranges()
+
+            start_time = time.time()
+            src_conn = connect_to_attached_dbs(["allflows", "localhosts"], read_only=True)
+            tgt_conn = connect_to_db( "explore")
+            tgt_cursor= tgt_conn.cursor()
+            total = 0
+            try:
+                src_cursor = src_conn.cursor()
+                # Flows updated while loading get a later last_seen and are picked up by the next refresh
+                watermark = src_cursor.execute("SELECT MAX(last_seen) FROM allflowscompact").fetchone()[0] or 0
+
+                # The rows go to a shadow table without indexes, readers keep using explore meanwhile
+                tgt_cursor.execute(f"DROP TABLE IF EXISTS {_EXPLORE_SHADOW_TABLE}")
+                tgt_cursor.execute(f"DROP TABLE IF EXISTS {_EXPLORE_SUMMARY_SHADOW_TABLE}")
+                tgt_cursor.execute(CONST_CREATE_EXPLORE_TABLE_SQL.format(table=_EXPLORE_SHADOW_TABLE))
+                tgt_cursor.execute(CONST_CREATE_EXPLORE_SUMMARY_TABLE_SQL.format(table=_EXPLORE_SUMMARY_SHADOW_TABLE))
+                tgt_conn.commit()
+
+                log_info(logger, f"[INFO] Streaming allflows into master_flow_view in {CONST_EXPLORE_DB}...")
+                src_cursor.execute(_EXPLORE_SOURCE_QUERY)
+                while True:
+                    allflows_rows = src_cursor.fetchmany(CONST_EXPLORE_BUILD_CHUNK_SIZE)
+                    if not allflows_rows:
+                        break
+                    tgt_cursor.executemany(f"""
+                        INSERT INTO {_EXPLORE_SHADOW_TABLE} ({_EXPLORE_COLUMNS})
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, _build_explore_rows(allflows_rows, _enrichment_ranges))
+                    # flow_id counts up from 1 in the new table, the chunk holds the ids past total
+                    for query in _EXPLORE_SUMMARY_CHUNK_QUERIES:
+                        tgt_cursor.execute(query, (total,))
+                    tgt_conn.commit()
+                    total += len(allflows_rows)
+                disconnect_from_db(src_conn)
+                src_conn = None
+
+                _swap_explore_shadow_table(tgt_conn, watermark)
+            except sqlite3.Error:
+                if tgt_conn.in_transaction:
+                    tgt_conn.rollback()
+                tgt_cursor.execute(f"DROP TABLE IF EXISTS {_EXPLORE_SHADOW_TABLE}")
+                tgt_cursor.execute(f"DROP TABLE IF EXISTS {_EXPLORE_SUMMARY_SHADOW_TABLE}")
+                tgt_conn.commit()
+                raise
+            finally:
+                if src_conn:
+                    disconnect_from_db(src_conn)
+                disconnect_from_db(tgt_conn)
+
+            duration = time.time() - start_time
+            rows_per_second = total / duration if duration > 0 else 0
+            log_info(logger, f"[INFO] Inserted {total} records into master_flow_view in {CONST_EXPLORE_DB} "
+                             f"in {duration:.2f} s ({rows_per_second:.0f} rows/s).")
+            return {"rows": total, "duration": duration, "rows_per_second": rows_per_second}
     except Exception as e:
         log_error(logger, f"[ERROR] Failed to bulk populate master_flow_view: {e}")
+        return None
+
+
+def refresh_master_flow_view():
+    """
+    Bring explore up to date by enriching and upserting only the allflows rows
+    whose last_seen is at or past the stored watermark, read in chunks of
+    CONST_EXPLORE_REFRESH_BATCH_SIZE, and deleting explore rows older than the
+    oldest flow left in allflows (purged by retention).
+
+    Rows removed from allflows in other ways (deleted local hosts) stay in explore
+    until the next full rebuild. Without a watermark a full rebuild runs instead.
+    The exploresummary rollups follow the upserts and deletes through triggers.
+
+    Returns:
+        int: Number of explore rows inserted or updated, or None on failure.
+    """
+    global _enrichment_ranges
+    logger = logging.getLogger(__name__)
+    with _explore_build_lock:
+        try:
+            watermark = get_explore_watermark()
+            if watermark is None:
+                log_info(logger, "[INFO] Explore has no refresh watermark yet, running a full rebuild.")
+                bulk_populate_master_flow_view()
+                return None
+            if _enrichment_ranges is None:
+                _enrichment_ranges = _load_enrichment_ranges()
+
+            start_time = time.time()
+            update_columns = ", ".join(
+                f"{column} = excluded.{column}" for column in (
+                    "src_ip", "dst_ip", "tags", "flow_start", "last_seen", "packets", "bytes", "times_seen",
+                    "src_dns", "dst_dns", "local_ip", "src_country", "dst_country", "src_asn", "dst_asn", "src_isp", "dst_isp"
+                )
+            )
+
+            src_conn = connect_to_attached_dbs(["allflows", "localhosts"], read_only=True)
+            tgt_conn = connect_to_db("explore")
+            tgt_cursor = tgt_conn.cursor()
+            refreshed = 0
+            try:
+                src_cursor = src_conn.cursor()
+                oldest, newest = src_cursor.execute("SELECT MIN(last_seen), MAX(last_seen) FROM allflowscompact").fetchone()
+                # Rows seen in the watermark second may have changed after the last run, upserts are idempotent
+                src_cursor.execute(_EXPLORE_SOURCE_QUERY + " WHERE a.last_seen_epoch >= ?", (watermark,))
+                # Streamed in chunks like the full rebuild, all of them land in one explore transaction
+                while True:
+                    allflows_rows = src_cursor.fetchmany(CONST_EXPLORE_REFRESH_BATCH_SIZE)
+                    if not allflows_rows:
+                        break
+                    tgt_cursor.executemany(f"""
+                        INSERT INTO explore ({_EXPLORE_COLUMNS})
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (src_ip_int, dst_ip_int, src_port, dst_port, protocol) DO UPDATE SET {update_columns}
+                    """, _build_explore_rows(allflows_rows, _enrichment_ranges))
+                    refreshed += len(allflows_rows)
+                disconnect_from_db(src_conn)
+                src_conn = None
+
+                if oldest is not None:
+                    # explore keeps last_seen in the text format of the allflows view
+                    tgt_cursor.execute("DELETE FROM explore WHERE last_seen < datetime(?, 'unixepoch', 'localtime')", (oldest,))
+                else:
+                    tgt_cursor.execute("DELETE FROM explore")
+                purged = tgt_cursor.rowcount
+                if purged:
+                    # The triggers subtract deleted rows from the rollups, drop the ones left empty
+                    tgt_cursor.execute("DELETE FROM exploresummary WHERE flows <= 0")
+
+                # The watermark and the rows it covers are committed together
+                _set_explore_watermark(tgt_cursor, max(watermark, newest or 0))
+                if refreshed or purged:
+                    _bump_explore_version(tgt_cursor)
+                tgt_conn.commit()
+            except sqlite3.Error:
+                if tgt_conn.in_transaction:
+                    tgt_conn.rollback()
+                raise
+            finally:
+                if src_conn:
+                    disconnect_from_db(src_conn)
+                disconnect_from_db(tgt_conn)
+
+            log_info(logger, f"[INFO] Refreshed explore with {refreshed} flows seen since the watermark "
+                             f"and removed {purged} expired flows in {(time.time() - start_time) * 1000:.2f} ms.")
+            return refreshed
+        except Exception as e:
+            log_error(logger, f"[ERROR] Failed to refresh master_flow_view: {e}")
+            return None
 
 
 def create_dns_key_value():
     """
     Runs get_ip_to_domain_mapping from database.dnsqueries and writes the results to exploreflow.db as dnskeyvalue table.
+    Explore reads the names from ipdomains, dnskeyvalue is a snapshot of it for other readers.
     """
 
     logger = logging.getLogger(__name__)
@@ -177,35 +438,230 @@ def create_dns_key_value():
         log_error(logger, f"[ERROR] Failed to create dnskeyvalue table: {e}")
 
 
-def get_latest_master_flows(limit=100, page=0):
+def _cached_explore_value(cursor, key, compute):
+    """
+    Return compute(), computed once per explore dataset version.
+
+    Args:
+        cursor: Cursor on the explore database.
+        key (str): Cache key identifying the query and its parameters.
+        compute (callable): Computes the value from the explore database.
+    """
+    row = cursor.execute("SELECT value FROM explorestate WHERE name = 'version'").fetchone()
+    version = row[0] if row else 0
+    with _explore_cache_lock:
+        cached = _explore_cache.get(key)
+        if cached and cached[0] == version:
+            _explore_cache.move_to_end(key)
+            return cached[1]
+
+    value = compute()
+    with _explore_cache_lock:
+        _explore_cache[key] = (version, value)
+        _explore_cache.move_to_end(key)
+        while len(_explore_cache) > CONST_EXPLORE_COUNT_CACHE_SIZE:
+            _explore_cache.popitem(last=False)
+    return value
+
+
+def _cached_explore_count(cursor, key, count_query, params=()):
+    """Return the row count of count_query, counted once per explore dataset version."""
+    return _cached_explore_value(cursor, key, lambda: cursor.execute(count_query, params).fetchone()[0])
+
+
+def encode_explore_cursor(packets, flow_id):
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps([packets, flow_id]).encode()).decode().rstrip("=")
+
+
+def decode_explore_cursor(token):
+    """
+    Decode a cursor made by encode_explore_cursor.
+
+    Returns:
+        tuple: (packets, flow_id)
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        packets, flow_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {token}")
+    if not isinstance(packets, int) or not isinstance(flow_id, int):
+        raise ValueError(f"Invalid cursor: {token}")
+    return packets, flow_id
+
+
+def parse_explore_filters(params):
+    """
+    Validate the structured explore filters given as API query parameters.
+
+    Supported filters: src_country, dst_country, src_asn, dst_asn (with or without
+    the AS prefix), src_port, dst_port, protocol (number or tcp/udp/icmp), src_cidr,
+    dst_cidr (IPv4 networks), ip (either side of the flow), since, until
+    ('YYYY-MM-DD HH:MM:SS', local time) and hours (seen in the last N hours).
+
+    Args:
+        params (dict): Filter name to raw string value, unknown names are ignored.
+
+    Returns:
+        list: (name, predicate, parameters) tuples. Predicates mark their columns
+              with {p} so the planner can keep them from using an index.
+
+    Raises:
+        ValueError: If a filter value is invalid.
+    """
+    filters = []
+    for name in EXPLORE_FILTER_NAMES:
+        value = params.get(name)
+        if value is None or str(value).strip() == "":
+            continue
+        value = str(value).strip()
+
+        if name in ("src_country", "dst_country"):
+            filters.append((name, f"{{p}}{name} = ?", (value,)))
+        elif name in ("src_asn", "dst_asn"):
+            number = value[2:] if value.upper().startswith("AS") else value
+            filters.append((name, f"{{p}}{name} IN (?, ?)", (number, f"AS{number}")))
+        elif name in ("src_port", "dst_port"):
+            if not value.isdigit() or int(value) > 65535:
+                raise ValueError(f"Invalid {name}: {value}")
+            filters.append((name, f"{{p}}{name} = ?", (int(value),)))
+        elif name == "protocol":
+            protocol = _EXPLORE_PROTOCOL_NUMBERS.get(value.lower(), value)
+            if not protocol.isdigit():
+                raise ValueError(f"Invalid protocol: {value}")
+            # explore stores the protocol number as text
+            filters.append((name, "{p}protocol = ?", (protocol,)))
+        elif name in ("src_cidr", "dst_cidr"):
+            start_ip, end_ip, _ = ip_network_to_range(value)
+            if start_ip is None:
+                raise ValueError(f"Invalid {name}: {value}")
+            column = "src_ip_int" if name == "src_cidr" else "dst_ip_int"
+            filters.append((name, f"{{p}}{column} BETWEEN ? AND ?", (start_ip, end_ip)))
+        elif name == "ip":
+            ip_int = ip_to_int(value)
+            if ip_int is None:
+                raise ValueError(f"Invalid ip: {value}")
+            filters.append((name, "({p}src_ip_int = ? OR {p}dst_ip_int = ?)", (ip_int, ip_int)))
+        elif name in ("since", "until", "hours"):
+            if name == "hours":
+                try:
+                    hours = float(value)
+                    if not math.isfinite(hours):
+                        raise ValueError(value)
+                    timestamp = (datetime.now() - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
+                except (ValueError, OverflowError):
+                    raise ValueError(f"Invalid hours: {value}")
+            else:
+                try:
+                    timestamp = datetime.strptime(value, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+                except ValueError:
+                    raise ValueError(f"Invalid {name}, expected YYYY-MM-DD HH:MM:SS: {value}")
+            operator = "<=" if name == "until" else ">="
+            filters.append((name, f"{{p}}last_seen {operator} ?", (timestamp,)))
+    return filters
+
+
+def _plan_explore_filters(cursor, filters, probe_limit):
+    """
+    Choose the index that drives a filtered explore query.
+
+    Each indexed filter is probed with a count bounded by probe_limit (read from its
+    own index), the filter matching the fewest rows drives the query and the others
+    are only checked on the rows it returns: their columns get a unary +, which keeps
+    SQLite from using an index for them. When every filter matches probe_limit rows
+    or more the query walks idx_explore_packets in page order instead.
+
+    Returns:
+        tuple: (where clause, parameters, driving filter name or None)
+    """
+    driving, driving_rows = None, probe_limit
+    for name, predicate, params in filters:
+        if name not in EXPLORE_INDEXED_FILTERS:
+            continue
+        rows = cursor.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM explore WHERE {predicate.format(p='')} LIMIT ?)",
+            params + (probe_limit,)
+        ).fetchone()[0]
+        if rows < driving_rows:
+            driving, driving_rows = name, rows
+
+    clauses, where_params = [], []
+    for name, predicate, params in filters:
+        clauses.append(predicate.format(p="" if name == driving else "+"))
+        where_params.extend(params)
+    return " AND ".join(clauses), tuple(where_params), driving
+
+
+def get_latest_master_flows(limit=100, page=0, after=None, filters=None):
     """
     Get `limit` rows from explore in CONST_EXPLORE_DB,
-    sorted by packets descending, with pagination support.
-    Returns a dict with 'total', 'page', 'limit', and 'results'.
+    sorted by packets descending (then flow_id descending), with pagination support.
+
+    Pages are read from idx_explore_packets. With `after` (the 'next' cursor of the
+    previous page) the page starts right after the cursor row at any depth, `page`
+    is kept for compatibility and skips page * limit rows.
+    `filters` (from parse_explore_filters) restrict the rows, the most selective
+    indexed filter drives the query (see _plan_explore_filters).
+    Returns a dict with 'total', 'page', 'limit', 'next', and 'results'.
+    'next' is None on the last page.
     """
     try:
-        offset = page * limit
-        conn = connect_to_db( "explore")
+        conn = connect_to_db("explore", read_only=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
 
         # Get total count
-        cursor.execute("SELECT COUNT(*) FROM explore")
-        total = cursor.fetchone()[0]
+        total = _cached_explore_count(cursor, "total", "SELECT COUNT(*) FROM explore")
+        where, params, driving = "", (), None
+        if filters:
+            cache_key = json.dumps([[name, list(values)] for name, _, values in filters])
+            params = tuple(value for _, _, values in filters for value in values)
+            total_rows = total
+            total = _cached_explore_count(
+                cursor, f"filters:{cache_key}",
+                "SELECT COUNT(*) FROM explore WHERE " + " AND ".join(predicate.format(p="") for _, predicate, _ in filters),
+                params
+            )
+            # Walking idx_explore_packets reads about limit * total_rows / total rows for a page,
+            # a filter index is used when it matches fewer rows than that
+            probe_limit = min(total_rows, max(CONST_EXPLORE_FILTER_PROBE_LIMIT, limit * total_rows // max(total, 1)))
+            where, params, driving = _cached_explore_value(
+                cursor, f"plan:{limit}:{cache_key}",
+                lambda: _plan_explore_filters(cursor, filters, probe_limit)
+            )
+
+        # Rows found through a filter index are sorted, otherwise idx_explore_packets gives the order
+        sort_column = "+packets" if driving else "packets"
+        conditions = [where] if where else []
+        page_params = params
+        if after:
+            packets, flow_id = decode_explore_cursor(after)
+            conditions.append(f"({sort_column}, flow_id) < (?, ?)")
+            page_params += (packets, flow_id)
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
         # Get paginated results
-        cursor.execute(
-            "SELECT * FROM explore ORDER BY packets DESC LIMIT ? OFFSET ?",
-            (limit, offset)
-        )
+        cursor.execute(f"""
+            SELECT * FROM explore
+            {where_clause}
+            ORDER BY {sort_column} DESC, flow_id DESC
+            LIMIT ? OFFSET ?
+        """, page_params + (limit, 0 if after else page * limit))
         rows = cursor.fetchall()
         disconnect_from_db(conn)
         results = [dict(row) for row in rows]
+        next_cursor = None
+        if len(results) == limit:
+            next_cursor = encode_explore_cursor(results[-1]["packets"], results[-1]["flow_id"])
 
         return {
             "total": total,
             "page": page,
             "limit": limit,
+            "next": next_cursor,
             "results": results,
             "success": True
         }
@@ -215,40 +671,49 @@ def get_latest_master_flows(limit=100, page=0):
             "total": 0,
             "page": page,
             "limit": limit,
+            "next": None,
             "results": [],
             "success": False,
             "error": str(e)
         }
 
-def search_master_flows_by_concat(search_string, page=0, page_size=100):
+def search_master_flows(search_string, page=0, page_size=100):
     """
-    Search the explore table for rows where the concat column matches the search_string (wildcard, case-insensitive).
+    Search the explore table for rows where any searchable column contains the
+    search_string (case-insensitive substring) using the explorefts trigram index.
+    Strings shorter than the trigram length fall back to LIKE over the same columns.
     Supports pagination via page and page_size.
     Returns a dict with 'total', 'page', 'page_size', and 'results'.
     """
     try:
         offset = page * page_size
-        conn = connect_to_db( "explore")
+        conn = connect_to_db("explore", read_only=True)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
 
-        # Get total count
-        count_query = """
-            SELECT COUNT(*) FROM explore
-            WHERE concat LIKE ? COLLATE NOCASE
-        """
-        like_pattern = f"%{search_string}%"
-        cursor.execute(count_query, (like_pattern,))
-        total = cursor.fetchone()[0]
+        if len(search_string) >= CONST_EXPLORE_SEARCH_MIN_LENGTH:
+            # A quoted FTS5 phrase, trigram phrases match substrings
+            match = '"' + search_string.replace('"', '""') + '"'
+            total = _cached_explore_count(cursor, f"match:{match}", "SELECT COUNT(*) FROM explorefts WHERE explorefts MATCH ?", (match,))
 
-        # Get paginated results
-        query = """
-            SELECT * FROM explore
-            WHERE concat LIKE ? COLLATE NOCASE
-            ORDER BY packets DESC
-            LIMIT ? OFFSET ?
-        """
-        cursor.execute(query, (like_pattern, page_size, offset))
+            cursor.execute("""
+                SELECT e.* FROM explorefts
+                JOIN explore e ON e.flow_id = explorefts.rowid
+                WHERE explorefts MATCH ?
+                ORDER BY e.packets DESC
+                LIMIT ? OFFSET ?
+            """, (match, page_size, offset))
+        else:
+            like_pattern = "%" + search_string.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where = " OR ".join(f"{column} LIKE :pattern ESCAPE '\\'" for column in _EXPLORE_SEARCH_COLUMNS)
+            total = _cached_explore_count(cursor, f"like:{like_pattern}", f"SELECT COUNT(*) FROM explore WHERE {where}", {"pattern": like_pattern})
+
+            cursor.execute(f"""
+                SELECT * FROM explore
+                WHERE {where}
+                ORDER BY packets DESC
+                LIMIT :limit OFFSET :offset
+            """, {"pattern": like_pattern, "limit": page_size, "offset": offset})
         rows = cursor.fetchall()
         disconnect_from_db(conn)
         results = [dict(row) for row in rows]
@@ -261,7 +726,7 @@ def search_master_flows_by_concat(search_string, page=0, page_size=100):
             "success": True,
         }
     except Exception as e:
-        log_error(logging.getLogger(__name__), f"[ERROR] Failed to search master flows by concat: {e}")
+        log_error(logging.getLogger(__name__), f"[ERROR] Failed to search master flows: {e}")
         return {
             "total": 0,
             "page": page,
@@ -269,4 +734,53 @@ def search_master_flows_by_concat(search_string, page=0, page_size=100):
             "results": [],
             "success": False,
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+def get_explore_summary(dimension, limit=CONST_EXPLORE_SUMMARY_DEFAULT_LIMIT):
+    """
+    Return the top rows of an explore rollup by bytes. The rollups are maintained
+    with explore, so this reads at most limit rows of idx_exploresummary_bytes.
+
+    Args:
+        dimension (str): One of EXPLORE_SUMMARY_DIMENSIONS (country, asn, dst_port, host).
+        limit (int): Number of rows, at most CONST_EXPLORE_SUMMARY_MAX_LIMIT.
+
+    Returns:
+        list: Dicts with 'key', 'bytes', 'packets' and 'flows', or None on error.
+
+    Raises:
+        ValueError: If the dimension is unknown or the limit is not positive.
+    """
+    if dimension not in EXPLORE_SUMMARY_DIMENSIONS:
+        raise ValueError(f"Unknown summary dimension: {dimension}")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, CONST_EXPLORE_SUMMARY_MAX_LIMIT)
+
+    logger = logging.getLogger(__name__)
+    conn = connect_to_db("exploresummary", read_only=True)
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to explore database.")
+        return None
+
+    try:
+        conn.row_factory = sqlite3.Row
+        rows, _ = run_timed_query(
+            conn.cursor(),
+            """
+            SELECT key, bytes, packets, flows FROM exploresummary
+            WHERE dimension = ?
+            ORDER BY bytes DESC
+            LIMIT ?
+            """,
+            params=(dimension, limit),
+            description=f"get_explore_summary_{dimension}",
+            fetch_all=True
+        )
+        return [dict(row) for row in rows]
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Failed to read the explore {dimension} summary: {e}")
+        return None
+    finally:
+        disconnect_from_db(conn)
@@ -341,7 +341,8 @@ def delete_localhost_database(ip_address):
         conn_flows = connect_to_db( "allflows")
         if conn_flows:
             cursor_flows = conn_flows.cursor()
-            cursor_flows.execute("DELETE FROM allflows WHERE src_ip = ? OR dst_ip = ?", (ip_address, ip_address))
+            ip_int = ip_to_int(ip_address)
+            cursor_flows.execute("DELETE FROM allflowscompact WHERE src_ip = ? OR dst_ip = ?", (ip_int, ip_int))
             conn_flows.commit()
             log_info(logger, f"[INFO] Deleted flows from allflows for IP: {ip_address}")
             disconnect_from_db(conn_flows)
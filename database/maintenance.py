@@ -0,0 +1,191 @@
+import os
+import sys
+from database.core import connect_to_db, disconnect_from_db
+from pathlib import Path
+# Set up path for imports
+current_dir = Path(__file__).resolve().parent
+parent_dir = str(current_dir.parent)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+sys.path.insert(0, "/database")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from init import *
+
+
+def _database_size(db_path):
+    """Return the size in bytes of a database file and of its WAL file."""
+    size = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    wal_path = f"{db_path}-wal"
+    wal_size = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    return size, wal_size
+
+
+def maintain_database(table, vacuum_pages):
+    """
+    Run maintenance on the database file holding the given table: refresh the
+    planner statistics (bounded ANALYZE followed by PRAGMA optimize), return up
+    to vacuum_pages free pages to the filesystem when the database uses
+    incremental auto_vacuum, and truncate the WAL with a checkpoint.
+
+    Args:
+        table (str): Any table of the database, used to find its file in TABLE_DB_MAP.
+        vacuum_pages (int): Maximum number of free pages released by incremental vacuum.
+
+    Returns:
+        dict: Duration, sizes before and after and free page counts, or None if the
+              database does not exist.
+    """
+    logger = logging.getLogger(__name__)
+    db_path = TABLE_DB_MAP[table]
+    if not os.path.exists(db_path):
+        return None
+
+    size_before, wal_size_before = _database_size(db_path)
+    result = {
+        "db_name": db_path,
+        "size_before": size_before + wal_size_before,
+        "wal_size_before": wal_size_before,
+        "freelist_before": None,
+        "freelist_after": None,
+        "checkpoint_busy": None,
+        "error": None,
+    }
+
+    start_time = time.time()
+    conn = connect_to_db(table)
+    if not conn:
+        log_error(logger, f"[ERROR] Unable to connect to {db_path} for maintenance.")
+        return None
+
+    try:
+        cursor = conn.cursor()
+        result["freelist_before"] = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+        # analysis_limit keeps ANALYZE to a sample of each index on large tables
+        cursor.execute(f"PRAGMA analysis_limit = {int(CONST_DATABASE_MAINTENANCE_ANALYSIS_LIMIT)}").fetchall()
+        cursor.execute("ANALYZE")
+        cursor.execute("PRAGMA optimize").fetchall()
+        conn.commit()
+
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2 and vacuum_pages > 0:
+            cursor.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+            conn.commit()
+
+        result["freelist_after"] = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        busy, _, _ = cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        result["checkpoint_busy"] = busy
+    except sqlite3.Error as e:
+        conn.rollback()
+        result["error"] = str(e)
+        log_warn(logger, f"[WARN] Maintenance of {db_path} failed: {e}")
+    finally:
+        disconnect_from_db(conn)
+
+    size_after, wal_size_after = _database_size(db_path)
+    result["size_after"] = size_after + wal_size_after
+    result["wal_size_after"] = wal_size_after
+    result["duration"] = time.time() - start_time
+    return result
+
+
+def record_database_maintenance(results):
+    """
+    Store the outcome of a maintenance run in the dbmaintenance table.
+
+    Args:
+        results (list): Dictionaries returned by maintain_database.
+    """
+    logger = logging.getLogger(__name__)
+    conn = connect_to_db("dbmaintenance")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to performance database.")
+        return
+
+    try:
+        run_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        conn.executemany("""
+            INSERT INTO dbmaintenance (
+                run_timestamp, db_name, duration, size_before, size_after, wal_size_before, wal_size_after,
+                freelist_before, freelist_after, checkpoint_busy, error
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(run_timestamp, r["db_name"], r["duration"], r["size_before"], r["size_after"], r["wal_size_before"],
+               r["wal_size_after"], r["freelist_before"], r["freelist_after"], r["checkpoint_busy"], r["error"])
+              for r in results])
+        conn.commit()
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error recording database maintenance: {e}")
+    finally:
+        disconnect_from_db(conn)
+
+
+def get_last_database_maintenance():
+    """
+    Return the time of the last maintenance run as a datetime, or None if it never ran.
+    """
+    logger = logging.getLogger(__name__)
+    conn = connect_to_db("dbmaintenance")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to performance database.")
+        return None
+
+    try:
+        row = conn.execute("SELECT MAX(run_timestamp) FROM dbmaintenance").fetchone()
+        return datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S') if row and row[0] else None
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error reading database maintenance history: {e}")
+        return None
+    finally:
+        disconnect_from_db(conn)
+
+
+def run_database_maintenance(config_dict):
+    """
+    Run maintenance on every database in TABLE_DB_MAP and record the duration
+    and size change of each.
+
+    Args:
+        config_dict (dict): Configuration dictionary containing DatabaseMaintenanceVacuumPages.
+
+    Returns:
+        list: The per database results.
+    """
+    logger = logging.getLogger(__name__)
+    vacuum_pages = int(config_dict.get('DatabaseMaintenanceVacuumPages', 10000))
+
+    # One table per database file, several tables share a file
+    tables_by_db = {}
+    for table, db_path in TABLE_DB_MAP.items():
+        tables_by_db.setdefault(db_path, table)
+
+    results = []
+    for db_path, table in tables_by_db.items():
+        result = maintain_database(table, vacuum_pages)
+        if result is None:
+            continue
+        results.append(result)
+        log_info(logger, f"[INFO] Maintained {db_path} in {result['duration']:.2f} s, "
+                         f"size {result['size_before']} -> {result['size_after']} bytes, "
+                         f"free pages {result['freelist_before']} -> {result['freelist_after']}")
+
+    record_database_maintenance(results)
+    saved = sum(r["size_before"] - r["size_after"] for r in results)
+    log_info(logger, f"[INFO] Database maintenance finished for {len(results)} databases, {saved} bytes released.")
+    return results
+
+
+def database_maintenance_due(config_dict):
+    """
+    Maintenance runs once a day during DatabaseMaintenanceHour (local time, when
+    the network is expected to be quiet).
+
+    Args:
+        config_dict (dict): Configuration dictionary containing DatabaseMaintenanceHour.
+
+    Returns:
+        bool: True if maintenance should run now.
+    """
+    maintenance_hour = int(config_dict.get('DatabaseMaintenanceHour', 3))
+    if maintenance_hour < 0 or datetime.now().hour != maintenance_hour:
+        return False
+    last_run = get_last_database_maintenance()
+    return last_run is None or datetime.now() - last_run >= timedelta(hours=CONST_DATABASE_MAINTENANCE_MIN_INTERVAL_HOURS)
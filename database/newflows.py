@@ -36,7 +36,10 @@ def get_new_flows():
             
         # Execute the query
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM newflows")
+        cursor.execute("""
+            SELECT src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes, flow_start, flow_end, last_seen, times_seen, tags, tag_mask
+            FROM newflows
+        """)
         rows = cursor.fetchall()
         
         # Convert tuple rows to lists
@@ -60,8 +63,8 @@ def update_new_flow(record):
 
     c.execute('''
         INSERT INTO newflows (
-            src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes, flow_start, flow_end, last_seen, times_seen, tags
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), datetime('now', 'localtime'), datetime('now', 'localtime'), 1,?)
+            src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes, flow_start, flow_end, last_seen, times_seen, tags, tag_mask
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), datetime('now', 'localtime'), datetime('now', 'localtime'), 1, ?, ?)
         ON CONFLICT(src_ip, dst_ip, src_port, dst_port, protocol)
         DO UPDATE SET 
             packets = packets + excluded.packets,
@@ -69,7 +72,7 @@ def update_new_flow(record):
             flow_end = excluded.flow_end,
             last_seen = excluded.last_seen,
             times_seen = times_seen + 1
-    ''', (record['src_ip'], record['dst_ip'], record['src_port'], record['dst_port'],record['protocol'], record['packets'], record['bytes'],  record['tags']))
+    ''', (record['src_ip'], record['dst_ip'], record['src_port'], record['dst_port'],record['protocol'], record['packets'], record['bytes'],  record['tags'], record.get('tag_mask', 0)))
 
     
 
@@ -0,0 +1,241 @@
+import os
+import sys
+from database.core import connect_to_db, disconnect_from_db
+from pathlib import Path
+# Set up path for imports
+current_dir = Path(__file__).resolve().parent
+parent_dir = str(current_dir.parent)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+sys.path.insert(0, "/database")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from init import *
+
+
+def enqueue_notification(channel, message):
+    """
+    Add a message to the notification outbox for delivery by the dispatcher.
+
+    Args:
+        channel (str): Delivery channel, e.g. "telegram".
+        message (str): The message text.
+
+    Returns:
+        int: The outbox id of the message, or None if an error occurred.
+    """
+    logger = logging.getLogger(__name__)
+    conn = connect_to_db("notificationoutbox")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to notificationoutbox database.")
+        return None
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO notificationoutbox (channel, message, status, attempts, next_attempt_at, created_at)
+            VALUES (?, ?, 'pending', 0, ?, datetime('now', 'localtime'))
+        """, (channel, message, time.time()))
+        conn.commit()
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error adding {channel} notification to outbox: {e}")
+        return None
+    finally:
+        disconnect_from_db(conn)
+
+
+def _has_claimable_notifications(channel, now):
+    """
+    Check on a read-only connection whether claim_pending_notifications has
+    anything to do, so an idle dispatcher does not take the write lock.
+    """
+    conn = connect_to_db("notificationoutbox", read_only=True)
+    if not conn:
+        # Let the claim itself report the connection error
+        return True
+
+    try:
+        row = conn.execute("""
+            SELECT EXISTS (
+                SELECT 1 FROM notificationoutbox
+                WHERE status = 'pending' AND channel = ? AND next_attempt_at <= ?
+            ) OR EXISTS (
+                SELECT 1 FROM notificationoutbox
+                WHERE status = 'sending' AND channel = ? AND claimed_at < ?
+            )
+        """, (channel, now, channel, now - CONST_NOTIFICATION_CLAIM_TIMEOUT)).fetchone()
+        return bool(row[0])
+    except sqlite3.Error:
+        return True
+    finally:
+        disconnect_from_db(conn)
+
+
+def claim_pending_notifications(channel, limit):
+    """
+    Claim due pending notifications of a channel for this process, oldest first,
+    so that concurrent dispatchers never send the same message twice. Messages
+    claimed by a dispatcher that died before finishing are released first. The
+    write lock is only taken when a read-only check finds such messages.
+
+    Args:
+        channel (str): Delivery channel, e.g. "telegram".
+        limit (int): Maximum number of messages to claim.
+
+    Returns:
+        list: Tuples of (id, message, attempts), or an empty list on error.
+    """
+    logger = logging.getLogger(__name__)
+    now = time.time()
+    if not _has_claimable_notifications(channel, now):
+        return []
+
+    conn = connect_to_db("notificationoutbox")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to notificationoutbox database.")
+        return []
+
+    pid = os.getpid()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            UPDATE notificationoutbox
+            SET status = 'pending', claimed_by = NULL, claimed_at = NULL
+            WHERE status = 'sending' AND channel = ? AND claimed_at < ?
+        """, (channel, now - CONST_NOTIFICATION_CLAIM_TIMEOUT))
+        cursor.execute("""
+            UPDATE notificationoutbox
+            SET status = 'sending', claimed_by = ?, claimed_at = ?
+            WHERE id IN (
+                SELECT id FROM notificationoutbox
+                WHERE status = 'pending' AND channel = ? AND next_attempt_at <= ?
+                ORDER BY id
+                LIMIT ?
+            )
+        """, (pid, now, channel, now, limit))
+        cursor.execute("""
+            SELECT id, message, attempts FROM notificationoutbox
+            WHERE status = 'sending' AND claimed_by = ? AND claimed_at = ?
+            ORDER BY id
+        """, (pid, now))
+        rows = cursor.fetchall()
+        conn.commit()
+        return rows
+    except sqlite3.Error as e:
+        conn.rollback()
+        log_error(logger, f"[ERROR] Error claiming {channel} notifications from outbox: {e}")
+        return []
+    finally:
+        disconnect_from_db(conn)
+
+
+def release_notifications(ids):
+    """
+    Hand claimed notifications back to the outbox without counting an attempt,
+    for messages that did not fit in the notification being sent.
+
+    Args:
+        ids (list): Outbox ids claimed by this process.
+    """
+    logger = logging.getLogger(__name__)
+    if not ids:
+        return
+
+    conn = connect_to_db("notificationoutbox")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to notificationoutbox database.")
+        return
+
+    try:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            UPDATE notificationoutbox
+            SET status = 'pending', claimed_by = NULL, claimed_at = NULL
+            WHERE id = ? AND status = 'sending'
+        """, [(outbox_id,) for outbox_id in ids])
+        conn.commit()
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error releasing notifications back to the outbox: {e}")
+    finally:
+        disconnect_from_db(conn)
+
+
+def complete_notifications(ids, error=None, max_attempts=5):
+    """
+    Record the outcome of a delivery attempt for claimed notifications.
+
+    Successful messages are marked sent. Failed ones are rescheduled with an
+    exponential backoff, or marked failed once max_attempts is reached.
+
+    Args:
+        ids (list): Outbox ids that were part of the attempt.
+        error (str): Error description, or None if the delivery succeeded.
+        max_attempts (int): Number of attempts before a message is given up on.
+    """
+    logger = logging.getLogger(__name__)
+    if not ids:
+        return
+
+    conn = connect_to_db("notificationoutbox")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to notificationoutbox database.")
+        return
+
+    try:
+        cursor = conn.cursor()
+        if error is None:
+            cursor.executemany("""
+                UPDATE notificationoutbox
+                SET status = 'sent', attempts = attempts + 1, claimed_by = NULL, claimed_at = NULL,
+                    last_error = NULL, sent_at = datetime('now', 'localtime')
+                WHERE id = ?
+            """, [(outbox_id,) for outbox_id in ids])
+        else:
+            now = time.time()
+            cursor.executemany("""
+                UPDATE notificationoutbox
+                SET status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END,
+                    attempts = attempts + 1,
+                    next_attempt_at = ? + MIN(? * (1 << attempts), ?),
+                    claimed_by = NULL, claimed_at = NULL,
+                    last_error = ?
+                WHERE id = ?
+            """, [(max_attempts, now, CONST_NOTIFICATION_RETRY_BACKOFF, CONST_NOTIFICATION_RETRY_BACKOFF_MAX, error, outbox_id)
+                  for outbox_id in ids])
+        conn.commit()
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error updating notification outbox status: {e}")
+    finally:
+        disconnect_from_db(conn)
+
+
+def delete_old_notifications(days=CONST_NOTIFICATION_RETENTION_DAYS):
+    """
+    Delete sent and failed notifications created more than the given number of days ago.
+
+    Args:
+        days (int): Number of days to keep delivered and failed messages.
+
+    Returns:
+        int: Number of rows deleted, or -1 on error.
+    """
+    logger = logging.getLogger(__name__)
+    conn = connect_to_db("notificationoutbox")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to notificationoutbox database.")
+        return -1
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM notificationoutbox
+            WHERE status IN ('sent', 'failed') AND created_at < datetime('now', 'localtime', ?)
+        """, (f"-{int(days)} days",))
+        conn.commit()
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error deleting old notifications: {e}")
+        return -1
+    finally:
+        disconnect_from_db(conn)
@@ -0,0 +1,146 @@
+import os
+import sys
+from database.core import connect_to_db, disconnect_from_db
+from pathlib import Path
+# Set up path for imports
+current_dir = Path(__file__).resolve().parent
+parent_dir = str(current_dir.parent)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+sys.path.insert(0, "/database")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from init import *
+from src.const import CONST_BUILTIN_TAG_BITS, CONST_TAG_BITMASK_WIDTH
+
+# Process-local cache of tag name -> bit position (None when the tag has no bit)
+_tag_bit_cache = dict(CONST_BUILTIN_TAG_BITS)
+
+
+def split_tag_string(tags):
+    """
+    Split a semicolon-joined tag string into individual tag names.
+
+    Per-entry ignorelist tags (IgnoreList_<id>) are detail annotations of the
+    IgnoreList tag and are not returned.
+
+    Args:
+        tags (str): Tag string such as "IgnoreList;Broadcast;MyTag;"
+
+    Returns:
+        list: Tag names in the order they appear.
+    """
+    if not tags:
+        return []
+    return [tag.strip() for tag in str(tags).split(";") if tag.strip() and not tag.strip().startswith("IgnoreList_")]
+
+
+def get_tag_bit(tag_name):
+    """
+    Get the bitmask position of a tag, assigning the next free bit in the
+    tagdictionary table the first time a custom tag is seen.
+
+    Args:
+        tag_name (str): The tag name.
+
+    Returns:
+        int: The bit position, or None if the bitmask is full and the tag must
+             be stored in the flowtagsoverflow side table instead.
+    """
+    if tag_name in _tag_bit_cache:
+        return _tag_bit_cache[tag_name]
+
+    logger = logging.getLogger(__name__)
+    conn = connect_to_db("tagdictionary")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to tagdictionary database.")
+        return None
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR IGNORE INTO tagdictionary (tag_name, tag_bit)
+            SELECT ?, COALESCE(MAX(tag_bit), -1) + 1 FROM tagdictionary
+            HAVING COALESCE(MAX(tag_bit), -1) + 1 < ?
+        """, (tag_name, CONST_TAG_BITMASK_WIDTH))
+        conn.commit()
+
+        cursor.execute("SELECT tag_bit FROM tagdictionary WHERE tag_name = ?", (tag_name,))
+        row = cursor.fetchone()
+        tag_bit = row[0] if row else None
+        if tag_bit is None:
+            log_warn(logger, f"[WARN] Tag bitmask is full, tag '{tag_name}' will be stored in flowtagsoverflow")
+        _tag_bit_cache[tag_name] = tag_bit
+        return tag_bit
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error assigning bit for tag '{tag_name}': {e}")
+        return None
+    finally:
+        disconnect_from_db(conn)
+
+
+def get_tag_mask(tag_names):
+    """
+    Build the combined bitmask for a list of tag names.
+
+    Args:
+        tag_names (list): Tag names to include in the mask.
+
+    Returns:
+        int: Bitmask with the bit of every tag that has one set.
+    """
+    mask = 0
+    for tag_name in tag_names:
+        tag_bit = get_tag_bit(tag_name)
+        if tag_bit is not None:
+            mask |= 1 << tag_bit
+    return mask
+
+
+def tags_to_mask(tags):
+    """
+    Convert a semicolon-joined tag string to its integer bitmask.
+
+    Args:
+        tags (str): Tag string as stored in newflows.tags / allflows.tags.
+
+    Returns:
+        int: The tag bitmask.
+    """
+    return get_tag_mask(split_tag_string(tags))
+
+
+def get_overflow_tags(tags):
+    """
+    Return the tags of a tag string that have no bit in the bitmask.
+
+    Args:
+        tags (str): Tag string as stored in newflows.tags / allflows.tags.
+
+    Returns:
+        list: Tag names that must be kept in the flowtagsoverflow side table.
+    """
+    return [tag_name for tag_name in split_tag_string(tags) if get_tag_bit(tag_name) is None]
+
+
+def get_tag_dictionary():
+    """
+    Retrieve all entries of the tag dictionary.
+
+    Returns:
+        dict: Mapping of tag name to bit position, or an empty dict on error.
+    """
+    logger = logging.getLogger(__name__)
+    conn = connect_to_db("tagdictionary")
+    if not conn:
+        log_error(logger, "[ERROR] Unable to connect to tagdictionary database.")
+        return {}
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT tag_name, tag_bit FROM tagdictionary ORDER BY tag_bit")
+        return dict(cursor.fetchall())
+    except sqlite3.Error as e:
+        log_error(logger, f"[ERROR] Error reading tag dictionary: {e}")
+        return {}
+    finally:
+        disconnect_from_db(conn)
@@ -77,7 +77,7 @@ def update_traffic_stats(rows, config_dict):
 
         # Process each row and update the trafficstats table
         for row in rows:
-            src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes_, flow_start, flow_end, last_seen, times_seen, tags = row
+            src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes_, flow_start, flow_end, last_seen, times_seen, tags, *_ = row
 
             if not is_ip_in_range(src_ip, LOCAL_NETWORKS):
                 continue
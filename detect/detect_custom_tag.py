@@ -42,7 +42,7 @@ def detect_custom_tag(rows, config_dict):
 
     # Iterate through rows to check for matching tags
     for row in rows:
-        src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes, flow_start, flow_end, times_seen, last_seen, tags = row
+        src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes, flow_start, flow_end, times_seen, last_seen, tags, *_ = row
         # Ensure the row has a 'tags' column
 
         if not is_ip_in_range(src_ip, LOCAL_NETWORKS):
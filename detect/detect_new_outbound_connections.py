@@ -1,3 +1,5 @@
+import atexit
+import json
 import os
 import sqlite3
 import sys
@@ -16,21 +18,139 @@ import logging
 from locallogging import log_info, log_error, log_warn
 from notifications.core import handle_alert
 from init import *
+from src.bloomfilter import ScalableBloomFilter
+
+# Per local host seen-set of (destination, port, protocol), loaded once per process
+_seen_destinations = None
+# time.time() of the last save and whether first contacts were added since
+_seen_destinations_saved_at = 0
+_seen_destinations_dirty = False
+
+
+def _seen_destination_key(dst_ip, dst_port, protocol):
+    return f"{dst_ip}|{dst_port}|{protocol}"
+
+
+def _new_seen_filter():
+    return ScalableBloomFilter(CONST_SEEN_DESTINATIONS_CAPACITY, CONST_SEEN_DESTINATIONS_ERROR_RATE)
+
+
+def _add_outbound_destinations(seen, rows, local_networks):
+    """Add (src_ip, dst_ip, dst_port, protocol) rows from local sources to the seen-set."""
+    added = 0
+    for src_ip, dst_ip, dst_port, protocol in rows:
+        if src_ip not in seen:
+            if not is_ip_in_range(src_ip, local_networks):
+                continue
+            seen[src_ip] = _new_seen_filter()
+        if seen[src_ip].add(_seen_destination_key(dst_ip, dst_port, protocol)):
+            added += 1
+    return added
+
+
+def load_seen_destinations(config_dict):
+    """
+    Load the per local host seen-destination filters from disk and catch them up
+    with flows recorded in allflows since they were saved. The filters are rebuilt
+    from allflows when no usable file exists. Must run before the first batch of
+    flows is written to allflows so that its first contacts are not marked as seen.
+
+    Args:
+        config_dict: Dictionary containing configuration settings
+    """
+    global _seen_destinations, _seen_destinations_saved_at, _seen_destinations_dirty
+    logger = logging.getLogger(__name__)
+    local_networks = get_local_network_cidrs(config_dict)
+    start_time = time.time()
+
+    seen = None
+    saved_at = None
+    if os.path.exists(CONST_SEEN_DESTINATIONS_FILE):
+        try:
+            with open(CONST_SEEN_DESTINATIONS_FILE, "r") as f:
+                data = json.load(f)
+            saved_at = data["saved_at"]
+            seen = {src_ip: ScalableBloomFilter.from_dict(bloom) for src_ip, bloom in data["hosts"].items()}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log_warn(logger, f"[WARN] Unable to read {CONST_SEEN_DESTINATIONS_FILE}, rebuilding from allflows: {e}")
+            seen = None
+
+    if seen is None:
+        seen = {}
+        saved_at = None
+
+    added = _add_outbound_destinations(seen, get_outbound_destinations(saved_at), local_networks)
+    if _seen_destinations is None:
+        atexit.register(save_seen_destinations)
+    _seen_destinations = seen
+    _seen_destinations_saved_at = time.time()
+    _seen_destinations_dirty = added > 0
+
+    log_info(logger, f"[INFO] Loaded seen destinations for {len(seen)} local hosts ({'caught up' if saved_at else 'rebuilt'} {added} entries from allflows) in {time.time() - start_time:.2f} s")
+
+
+def ensure_seen_destinations(config_dict):
+    """
+    Load the seen-destination filters if this process has not done so yet.
+    Called before the current batch is written to allflows, so that turning
+    NewOutboundDetection on at runtime does not mark its first contacts as seen.
+
+    Args:
+        config_dict: Dictionary containing configuration settings
+    """
+    if _seen_destinations is None:
+        load_seen_destinations(config_dict)
+
+
+def save_seen_destinations():
+    """
+    Persist the seen-destination filters so that the next start only needs to
+    replay flows seen after this point. Does nothing when no first contacts
+    were added since the last save.
+    """
+    global _seen_destinations_saved_at, _seen_destinations_dirty
+    logger = logging.getLogger(__name__)
+    if _seen_destinations is None or not _seen_destinations_dirty:
+        return
+
+    data = {
+        "saved_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "hosts": {src_ip: bloom.to_dict() for src_ip, bloom in _seen_destinations.items()}
+    }
+    temp_file = f"{CONST_SEEN_DESTINATIONS_FILE}.tmp"
+    try:
+        with open(temp_file, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_file, CONST_SEEN_DESTINATIONS_FILE)
+        _seen_destinations_saved_at = time.time()
+        _seen_destinations_dirty = False
+    except OSError as e:
+        log_warn(logger, f"[WARN] Unable to save seen destinations to {CONST_SEEN_DESTINATIONS_FILE}: {e}")
+
 
 def detect_new_outbound_connections(rows, config_dict):
     """
     Detect new outbound connections from local clients to external servers.
     A server is identified by having a lower port number than the client.
+    Only the first contact between a local client and a destination/port/protocol
+    raises an alert, repeats are answered from the in-memory seen-set, which is
+    saved at most every CONST_SEEN_DESTINATIONS_SAVE_INTERVAL seconds and on exit.
     
     Args:
         rows: List of flow records
         config_dict: Dictionary containing configuration settings
     """
+    global _seen_destinations_dirty
     logger = logging.getLogger(__name__)
     log_info(logger,f"[INFO] Preparing to detect new outbound connections")
 
     LOCAL_NETWORKS = get_local_network_cidrs(config_dict)
 
+    if _seen_destinations is None:
+        log_warn(logger, "[WARN] Seen destinations were not loaded before the batch was written to allflows, first contacts in this batch will not alert")
+        load_seen_destinations(config_dict)
+
+    first_contacts = 0
     try:
 
         for row in rows:
@@ -45,6 +165,12 @@ def detect_new_outbound_connections(rows, config_dict):
             # If source is local and destination port is lower (indicating server),
             # this might be a new outbound connection
             if is_src_local and dst_port < src_port:
+                if src_ip not in _seen_destinations:
+                    _seen_destinations[src_ip] = _new_seen_filter()
+                if not _seen_destinations[src_ip].add(_seen_destination_key(dst_ip, dst_port, protocol)):
+                    continue
+                first_contacts += 1
+
                 # Create a unique identifier for this connection
                 alert_id = f"{src_ip}_{dst_ip}_{protocol}_{dst_port}_NewOutboundDetection"
                 
@@ -69,5 +195,10 @@ def detect_new_outbound_connections(rows, config_dict):
 
     except Exception as e:
         log_error(logger, f"[ERROR] Error in detect_new_outbound_connections: {e}")
-    
-    log_info(logger,f"[INFO] Finished detecting new outbound connections")
+
+    if first_contacts > 0:
+        _seen_destinations_dirty = True
+    if time.time() - _seen_destinations_saved_at >= CONST_SEEN_DESTINATIONS_SAVE_INTERVAL:
+        save_seen_destinations()
+
+    log_info(logger,f"[INFO] Finished detecting new outbound connections - {first_contacts} first contacts")
@@ -22,8 +22,14 @@ from src.const import (
     CONST_CREATE_IPASN_SQL,
     CONST_TEST_SOURCE_DB,
     CONST_CREATE_ALLFLOWS_SQL,
+    CONST_CREATE_ALLFLOWSDAILY_SQL,
+    CONST_CREATE_TAGDICTIONARY_SQL,
+    CONST_CREATE_FLOWTAGSOVERFLOW_SQL,
+    CONST_BUILTIN_TAG_BITS,
+    CONST_TAG_BITMASK_WIDTH,
     CONST_CREATE_ALERTS_SQL,
     CONST_CREATE_IGNORELIST_SQL,
+    CONST_CREATE_NOTIFICATIONOUTBOX_SQL,
     CONST_EXPLORE_DB,
     CONST_CREATE_CONFIG_SQL,
     CONST_CREATE_NEWFLOWS_SQL,
@@ -33,6 +39,9 @@ from src.const import (
     CONST_CREATE_GEOLOCATION_SQL,
     CONST_CREATE_REPUTATIONLIST_SQL,
     CONST_CREATE_EXPLORE_SQL,
+    CONST_CREATE_EXPLORE_TABLE_SQL,
+    CONST_CREATE_EXPLORE_SUMMARY_TABLE_SQL,
+    CONST_EXPLORE_SUMMARY_KEYS,
     CONST_CREATE_SERVICES_SQL,
     CONST_CREATE_CUSTOMTAGS_SQL,
     CONST_PERFORMANCE_DB,
@@ -44,6 +53,38 @@ from src.const import (
     CONST_LINK_LOCAL_RANGE,
     CONST_CREATE_DBPERFORMANCE_SQL,
     CONST_SITE,
+    CONST_EVENT_FLOW_BATCH_READY,
+    CONST_EVENT_CONFIG_CHANGED,
+    CONST_EVENT_ENRICHMENT_UPDATED,
+    CONST_EVENT_IGNORELIST_CHANGED,
+    CONST_EVENT_FALLBACK_REFRESH_SECONDS,
+    CONST_ALERT_DEDUPE_MAX_ENTRIES,
+    CONST_LOCALHOST_ALERT_FLAGS_TTL,
+    CONST_NOTIFICATION_DISPATCH_INTERVAL,
+    CONST_NOTIFICATION_CONNECT_TIMEOUT,
+    CONST_NOTIFICATION_READ_TIMEOUT,
+    CONST_NOTIFICATION_RETRY_BACKOFF,
+    CONST_NOTIFICATION_RETRY_BACKOFF_MAX,
+    CONST_NOTIFICATION_CLAIM_TIMEOUT,
+    CONST_NOTIFICATION_RETENTION_DAYS,
+    CONST_TELEGRAM_MAX_MESSAGE_LENGTH,
+    CONST_QUERY_TELEMETRY_SKETCH_ACCURACY,
+    CONST_SEEN_DESTINATIONS_FILE,
+    CONST_SEEN_DESTINATIONS_CAPACITY,
+    CONST_SEEN_DESTINATIONS_ERROR_RATE,
+    CONST_SEEN_DESTINATIONS_SAVE_INTERVAL,
+    CONST_DATABASE_MAINTENANCE_CHECK_INTERVAL,
+    CONST_DATABASE_MAINTENANCE_MIN_INTERVAL_HOURS,
+    CONST_DATABASE_MAINTENANCE_ANALYSIS_LIMIT,
+    CONST_EXPLORE_REFRESH_BATCH_SIZE,
+    CONST_EXPLORE_BUILD_CHUNK_SIZE,
+    CONST_EXPLORE_SEARCH_MIN_LENGTH,
+    CONST_EXPLORE_COUNT_CACHE_SIZE,
+    CONST_EXPLORE_FILTER_PROBE_LIMIT,
+    CONST_EXPLORE_SUMMARY_DEFAULT_LIMIT,
+    CONST_EXPLORE_SUMMARY_MAX_LIMIT,
+    CONST_IP_DOMAIN_CACHE_SIZE,
+    CONST_IP_DOMAIN_CACHE_TTL,
     IS_CONTAINER,
     VERSION,
     CONST_API_LISTEN_ADDRESS,
@@ -82,12 +123,21 @@ from src.locallogging import (
     log_error, 
     log_warn,
     get_machine_unique_identifier,
-    dump_json
+    dump_json,
+    flush_logs,
+    get_error_report_counts
+)
+
+from src.eventbus import (
+    publish_event,
+    subscribe_events,
+    wait_for_events
 )
 
 from database.explore import (
     bulk_populate_master_flow_view,
-     create_dns_key_value
+     create_dns_key_value,
+    refresh_master_flow_view
 )
 # Database core functions
 from database.core import (
@@ -135,7 +185,9 @@ from database.alerts import (
     summarize_alerts_by_ip,
     get_all_alerts_by_ip,
     summarize_alerts_by_ip_last_seen,
-    delete_ignorelisted_alerts
+    delete_ignorelisted_alerts,
+    flush_pending_alerts,
+    get_alert_suppression_counters
 )
 
 from database.ipasn import  (
@@ -158,7 +210,8 @@ from database.dnsqueries import (
     insert_dns_queries_batch,
     get_dnsqueries_without_responses,
     update_dns_query_response,
-    get_ip_to_domain_mapping
+    get_ip_to_domain_mapping,
+    get_ip_domains
 )
 
 # Localhost functions
@@ -183,7 +236,9 @@ from database.allflows import (
     get_flows_by_source_ip,
     get_dead_connections_from_database,
     get_tag_statistics,
-    apply_ignorelist_entry
+    apply_ignorelist_entry,
+    purge_expired_allflows,
+    get_outbound_destinations
 )
 
 # Traffic Stats functions
@@ -216,7 +271,13 @@ from database.actions import (
     update_action_acknowledged, 
     insert_action, 
     get_all_actions,
-    update_action_acknowledged_all
+    update_action_acknowledged_all,
+    get_error_reports
+)
+
+from database.maintenance import (
+    run_database_maintenance,
+    database_maintenance_due
 )
 
 # Service functions
@@ -234,4 +295,12 @@ from database.tornodes import (
 
 from database.newflows import (
     update_new_flow
+)
+
+from database.tagdictionary import (
+    get_tag_bit,
+    get_tag_mask,
+    tags_to_mask,
+    get_overflow_tags,
+    get_tag_dictionary
 )
\ No newline at end of file
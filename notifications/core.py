@@ -1,13 +1,40 @@
 import requests
-from src.const import IS_CONTAINER, VERSION, CONST_SITE
+from src.const import IS_CONTAINER, VERSION, CONST_SITE, CONST_ALERT_DEDUPE_MAX_ENTRIES, CONST_LOCALHOST_ALERT_FLAGS_TTL
 from database.configuration import get_config_settings
 import os
 import logging
+import time
 from src.locallogging import log_info, log_error, log_warn
 from database.alerts import log_alert_to_db
 from notifications.telegram import send_telegram_message
 from database.localhosts import get_localhost_by_ip
 
+# local ip -> (read at, excluded from alerting, alerts enabled)
+_localhost_alert_flags = {}
+
+
+def _get_localhost_alert_flags(local_ip):
+    """
+    Return (excluded, alerts_enabled) for a local host, read from localhosts at
+    most once every CONST_LOCALHOST_ALERT_FLAGS_TTL seconds per address so that
+    repeat alerts do not query the database.
+    """
+    now = time.time()
+    cached = _localhost_alert_flags.get(local_ip)
+    if cached and now - cached[0] < CONST_LOCALHOST_ALERT_FLAGS_TTL:
+        return cached[1], cached[2]
+
+    localhost_info = get_localhost_by_ip(local_ip)
+    excluded = bool(localhost_info and len(localhost_info) > 19 and localhost_info[19] == 1)
+    # Default to True if localhost not found
+    alerts_enabled = localhost_info[16] if localhost_info else True
+
+    if len(_localhost_alert_flags) >= CONST_ALERT_DEDUPE_MAX_ENTRIES:
+        _localhost_alert_flags.clear()
+    _localhost_alert_flags[local_ip] = (now, excluded, alerts_enabled)
+    return excluded, alerts_enabled
+
+
 def handle_alert(config_dict, detection_key, telegram_message, local_ip, original_flow, alert_category, enrichment_1, enrichment_2, alert_id_hash):
     """
     Handle alerting logic based on the configuration level and alerts_enabled status.
@@ -24,38 +51,37 @@ def handle_alert(config_dict, detection_key, telegram_message, local_ip, origina
         alert_id_hash (str): Unique identifier hash for the alert.
 
     Returns:
-        str: "insert", "update", or None based on the operation performed.
+        str: "insert", "update", "suppressed", or None based on the operation performed.
     """
     logger = logging.getLogger(__name__)
 
     # Get the detection level from the configuration
     detection_level = config_dict.get(detection_key, 0)
     
-    if localhost_info and len(localhost_info) > 19 and localhost_info[19] == 1:
-        log_info(logger, f"[INFO] Alert logic skipped for {local_ip} host is excluded from alerting")
-        return None
-    
     # Only proceed if detection is enabled
     if detection_level >= 1:
         # Check if alerts are enabled for this IP address
-        localhost_info = get_localhost_by_ip(local_ip)
-        alerts_enabled = True  # Default to True if localhost not found
-        
-        if localhost_info:
-            alerts_enabled = localhost_info[16]
-            
+        excluded, alerts_enabled = _get_localhost_alert_flags(local_ip)
+
+        if excluded:
+            log_info(logger, f"[INFO] Alert logic skipped for {local_ip} host is excluded from alerting")
+            return None
+
         # Log the alert to the database regardless of alerts_enabled status
         insert_or_update = log_alert_to_db(local_ip, original_flow, alert_category, 
-                                          enrichment_1, enrichment_2, alert_id_hash, False)
+                                          enrichment_1, enrichment_2, alert_id_hash, False, config_dict)
+
+        if insert_or_update == "suppressed":
+            return insert_or_update
         
         # Only send Telegram notifications if alerts are enabled for this IP
         if alerts_enabled and detection_level >= 2:
             if insert_or_update == "insert":
                 log_info(logger, f"[INFO] Sending Telegram alert for {local_ip} (new alert)")
-                send_telegram_message(telegram_message, original_flow)
+                send_telegram_message(telegram_message, original_flow, config_dict)
             elif insert_or_update == "update" and detection_level == 3:
                 log_info(logger, f"[INFO] Sending Telegram alert for {local_ip} (updated alert)")
-                send_telegram_message(telegram_message, original_flow)
+                send_telegram_message(telegram_message, original_flow, config_dict)
             elif not insert_or_update:
                 log_warn(logger, f"[WARN] Failed to log alert for {local_ip}, Telegram message not sent")
         elif not alerts_enabled and detection_level >= 2:
@@ -0,0 +1,177 @@
+import sys
+import os
+from pathlib import Path
+current_dir = Path(__file__).resolve().parent
+parent_dir = str(current_dir.parent)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+import logging
+import threading
+import time
+from src.const import (
+    CONST_NOTIFICATION_DISPATCH_INTERVAL,
+    CONST_NOTIFICATION_RETENTION_DAYS
+)
+from src.locallogging import log_info, log_error, log_warn
+from database.configuration import get_config_settings
+from database.notificationoutbox import (
+    enqueue_notification,
+    claim_pending_notifications,
+    complete_notifications,
+    release_notifications,
+    delete_old_notifications
+)
+
+# Delivery functions by channel name, each takes (config_dict, messages) and
+# returns None on success or an error description
+_channel_senders = {}
+# Optional per channel function taking the claimed message texts and returning
+# how many of the leading ones fit in a single notification
+_channel_digest_fits = {}
+# Per channel token bucket: channel -> [available tokens, last refill time]
+_channel_tokens = {}
+_dispatcher_thread = None
+_dispatcher_lock = threading.Lock()
+_dispatcher_wakeup = threading.Event()
+
+
+def register_notification_channel(channel, sender, digest_fit=None):
+    """
+    Register the delivery function of a notification channel.
+
+    Args:
+        channel (str): Channel name used in the outbox, e.g. "telegram".
+        sender (callable): Function taking (config_dict, messages) that delivers the
+                           messages as a single notification and returns None on
+                           success or an error description on failure.
+        digest_fit (callable): Optional function taking the message texts and returning
+                               how many of the leading ones fit in one notification.
+                               The rest are left in the outbox for the next digest.
+    """
+    _channel_senders[channel] = sender
+    if digest_fit:
+        _channel_digest_fits[channel] = digest_fit
+
+
+def queue_notification(channel, message):
+    """
+    Add a message to the outbox and wake the dispatcher. Never waits on the network.
+
+    Args:
+        channel (str): Channel name, e.g. "telegram".
+        message (str): The message text.
+
+    Returns:
+        int: The outbox id, or None if the message could not be queued.
+    """
+    outbox_id = enqueue_notification(channel, message)
+    if outbox_id is not None:
+        start_notification_dispatcher()
+        _dispatcher_wakeup.set()
+    return outbox_id
+
+
+def _take_token(channel, rate_per_minute):
+    """Take one send token from the channel's bucket, refilled at rate_per_minute."""
+    if rate_per_minute <= 0:
+        return True
+    now = time.time()
+    tokens, last_refill = _channel_tokens.get(channel, [rate_per_minute, now])
+    tokens = min(rate_per_minute, tokens + (now - last_refill) * rate_per_minute / 60.0)
+    if tokens < 1:
+        _channel_tokens[channel] = [tokens, now]
+        return False
+    _channel_tokens[channel] = [tokens - 1, now]
+    return True
+
+
+def dispatch_pending_notifications(config_dict):
+    """
+    Deliver due outbox messages for every registered channel.
+
+    Messages that piled up since the last dispatch (a burst, or a backlog held
+    back by the rate limit) are merged into one digest notification of up to
+    NotificationDigestMaxMessages messages. Messages that do not fit in one
+    notification of the channel are released back to the outbox and go out in
+    the next digest.
+
+    Args:
+        config_dict (dict): Configuration dictionary.
+
+    Returns:
+        int: Number of outbox messages delivered.
+    """
+    logger = logging.getLogger(__name__)
+    rate_per_minute = int(config_dict.get('NotificationRateLimitPerMinute', 20))
+    max_attempts = int(config_dict.get('NotificationMaxAttempts', 5))
+    digest_max = max(1, int(config_dict.get('NotificationDigestMaxMessages', 20)))
+
+    delivered = 0
+    for channel, sender in list(_channel_senders.items()):
+        while _take_token(channel, rate_per_minute):
+            rows = claim_pending_notifications(channel, digest_max)
+            if not rows:
+                if rate_per_minute > 0:
+                    # Give back the unused token
+                    _channel_tokens[channel][0] += 1
+                break
+
+            digest_fit = _channel_digest_fits.get(channel)
+            if digest_fit and len(rows) > 1:
+                fit = max(1, digest_fit([row[1] for row in rows]))
+                if fit < len(rows):
+                    release_notifications([row[0] for row in rows[fit:]])
+                    rows = rows[:fit]
+
+            ids = [row[0] for row in rows]
+            try:
+                error = sender(config_dict, [row[1] for row in rows])
+            except Exception as e:
+                error = str(e)
+
+            complete_notifications(ids, error, max_attempts)
+            if error is None:
+                delivered += len(rows)
+                log_info(logger, f"[INFO] Delivered {len(rows)} {channel} notification(s) in one message.")
+            else:
+                given_up = [row[0] for row in rows if row[2] + 1 >= max_attempts]
+                if given_up:
+                    log_error(logger, f"[ERROR] Giving up on {len(given_up)} {channel} notification(s) after {max_attempts} attempts: {error}")
+                else:
+                    log_warn(logger, f"[WARN] Failed to deliver {len(rows)} {channel} notification(s), will retry: {error}")
+                break
+    return delivered
+
+
+def _dispatcher_loop():
+    logger = logging.getLogger(__name__)
+    last_cleanup = 0
+    while True:
+        _dispatcher_wakeup.wait(CONST_NOTIFICATION_DISPATCH_INTERVAL)
+        _dispatcher_wakeup.clear()
+        try:
+            config_dict = get_config_settings()
+            if not config_dict:
+                continue
+            dispatch_pending_notifications(config_dict)
+
+            if time.time() - last_cleanup >= 3600:
+                delete_old_notifications(CONST_NOTIFICATION_RETENTION_DAYS)
+                last_cleanup = time.time()
+        except Exception as e:
+            log_warn(logger, f"[WARN] Notification dispatcher iteration failed: {e}")
+
+
+def start_notification_dispatcher():
+    """
+    Start the background thread delivering outbox messages, once per process.
+    Messages left in the outbox by a previous run are picked up on start.
+    """
+    global _dispatcher_thread
+    logger = logging.getLogger(__name__)
+    with _dispatcher_lock:
+        if _dispatcher_thread and _dispatcher_thread.is_alive():
+            return
+        _dispatcher_thread = threading.Thread(target=_dispatcher_loop, name="notification-dispatcher", daemon=True)
+        _dispatcher_thread.start()
+        log_info(logger, "[INFO] Notification dispatcher started.")
@@ -1,9 +1,17 @@
 import requests
-from src.const import IS_CONTAINER, VERSION, CONST_SITE
+from src.const import (
+    IS_CONTAINER,
+    VERSION,
+    CONST_SITE,
+    CONST_NOTIFICATION_CONNECT_TIMEOUT,
+    CONST_NOTIFICATION_READ_TIMEOUT,
+    CONST_TELEGRAM_MAX_MESSAGE_LENGTH
+)
 from database.configuration import get_config_settings
 import os
 import logging
 from src.locallogging import log_info, log_error, log_warn
+from notifications.outbox import register_notification_channel, queue_notification
 
 if (IS_CONTAINER):
     SITE = os.getenv("SITE", CONST_SITE)
@@ -11,36 +19,130 @@ if (IS_CONTAINER):
 
 
 
-def send_telegram_message(message, flow):
+# Reused across notifications so the TLS connection to the Telegram API is kept alive
+_session = requests.Session()
+
+
+def telegram_configured(config_dict):
+    """Return True if Telegram notifications are enabled and configured."""
+    return bool(config_dict.get('TelegramBotToken') and config_dict.get('TelegramChatId') and config_dict.get('TelegramEnabled'))
+
+
+def post_telegram_message(config_dict, text):
+    """
+    Post a message to the Telegram group chat.
+
+    Args:
+        config_dict (dict): Configuration dictionary with the Telegram settings.
+        text (str): The formatted message.
+
+    Returns:
+        str: None if the message was sent, otherwise a description of the error.
+    """
+    url = f"https://api.telegram.org/bot{config_dict['TelegramBotToken']}/sendMessage"
+    payload = {
+        "chat_id": config_dict['TelegramChatId'],
+        "text": text,
+        "parse_mode": "HTML"
+    }
+    try:
+        response = _session.post(url, json=payload, timeout=(CONST_NOTIFICATION_CONNECT_TIMEOUT, CONST_NOTIFICATION_READ_TIMEOUT))
+    except requests.RequestException as e:
+        return f"Exception occurred while sending Telegram message: {e}"
+    if response.status_code == 200:
+        return None
+    return f"Status code: {response.status_code}, Response: {response.text}"
+
+
+def _digest_header(count):
+    if count == 1:
+        return f"⚠️ HomelabIDS Security Alert - {SITE}\n\n"
+    return f"⚠️ HomelabIDS Security Alerts - {SITE} ({count} alerts)\n\n"
+
+
+def _truncate_html(text, limit):
+    """Cut text to limit characters without leaving a partial HTML tag or entity at the end."""
+    if len(text) <= limit:
+        return text
+    text = text[:limit]
+    tag_start = text.rfind("<")
+    if tag_start > text.rfind(">"):
+        text = text[:tag_start]
+    entity_start = text.rfind("&")
+    if entity_start > text.rfind(";"):
+        text = text[:entity_start]
+    return text
+
+
+def count_fitting_telegram_alerts(messages):
+    """
+    Count how many of the leading alerts fit in one Telegram digest message.
+
+    Args:
+        messages (list): Alert message texts, oldest first.
+
+    Returns:
+        int: Number of messages that fit, at least 1 since a single alert is truncated.
+    """
+    budget = CONST_TELEGRAM_MAX_MESSAGE_LENGTH - len(_digest_header(len(messages)))
+    fit = 0
+    for message in messages:
+        budget -= len(message) + 2
+        if budget < 0:
+            break
+        fit += 1
+    return max(1, fit)
+
+
+def format_telegram_alerts(messages):
+    """
+    Format one alert, or a digest of several alerts, as a single Telegram message.
+    The dispatcher only passes as many alerts as count_fitting_telegram_alerts
+    allows, a single alert that is too long is truncated.
+
+    Args:
+        messages (list): Alert message texts, oldest first.
+
+    Returns:
+        str: The formatted message.
+    """
+    text = _digest_header(len(messages)) + "\n\n".join(messages)
+    return _truncate_html(text, CONST_TELEGRAM_MAX_MESSAGE_LENGTH)
+
+
+def deliver_telegram_alerts(config_dict, messages):
+    """
+    Outbox sender for the telegram channel.
+
+    Args:
+        config_dict (dict): Configuration dictionary.
+        messages (list): Alert message texts to send as one notification.
+
+    Returns:
+        str: None if delivered, otherwise a description of the error.
+    """
+    if not telegram_configured(config_dict):
+        return "Telegram is not enabled or TelegramBotToken/TelegramChatId is not set"
+    return post_telegram_message(config_dict, format_telegram_alerts(messages))
+
+
+register_notification_channel("telegram", deliver_telegram_alerts, count_fitting_telegram_alerts)
+
+
+def send_telegram_message(message, flow, config_dict=None):
     """
-    Sends a message to a Telegram group chat.
+    Queues a message for the Telegram group chat. Delivery is done by the
+    notification dispatcher thread, so this never waits on the Telegram API.
 
     Args:
         message (str): The message to send.
         flow: The flow data associated with the alert.
+        config_dict (dict): Optional configuration dictionary, used to skip queueing
+                            when Telegram is not enabled.
     """
-    config_dict = get_config_settings()
-    logger = logging.getLogger(__name__)
-    if config_dict['TelegramBotToken'] and config_dict['TelegramChatId'] and config_dict['TelegramEnabled']:
-        try:
-            
-            # Create header with warning emoji and site name
-            header = f"⚠️ HomelabIDS Security Alert - {SITE}\n\n"
-            formatted_message = header + message
-
-            url = f"https://api.telegram.org/bot{config_dict['TelegramBotToken']}/sendMessage"
-            payload = {
-                "chat_id": config_dict['TelegramChatId'],
-                "text": formatted_message,
-                "parse_mode": "HTML"
-            }
-            response = requests.post(url, json=payload)
-            if response.status_code == 200:
-                log_info(logger, f"[INFO] Telegram message sent successfully.")
-            else:
-                log_error(logger, f"[ERROR] Failed to send Telegram message. Status code: {response.status_code}, Response: {response.text}")
-        except Exception as e:
-            log_error(logger, f"[ERROR] Exception occurred while sending Telegram message: {e}")
+    if config_dict is not None and not telegram_configured(config_dict):
+        return
+    queue_notification("telegram", message)
 
 
 def send_test_telegram_message():
@@ -51,22 +153,12 @@ def send_test_telegram_message():
     config_dict= get_config_settings()
 
     
-    if config_dict['TelegramBotToken'] and config_dict['TelegramChatId'] and config_dict['TelegramEnabled']:
-        try:
-            message = f"HomelabIDS is online - running version {VERSION} at {SITE}."
-            url = f"https://api.telegram.org/bot{config_dict['TelegramBotToken']}/sendMessage"
-            payload = {
-                "chat_id": config_dict['TelegramChatId'],
-                "text": message,
-                "parse_mode": "HTML"
-            }
-            response = requests.post(url, json=payload)
-            if response.status_code == 200:
-                log_info(logger, f"[INFO] Test Telegram message sent successfully.")
-            else:
-                log_error(logger, f"[ERROR] Failed to send test Telegram message. Status code: {response.status_code}, Response: {response.text}")
-        except Exception as e:
-            log_error(logger, f"[ERROR] Exception occurred while sending test Telegram message: {e}")
+    if telegram_configured(config_dict):
+        message = f"HomelabIDS is online - running version {VERSION} at {SITE}."
+        error = post_telegram_message(config_dict, message)
+        if error is None:
+            log_info(logger, f"[INFO] Test Telegram message sent successfully.")
+        else:
+            log_error(logger, f"[ERROR] Failed to send test Telegram message. {error}")
     else:
         log_warn(logger, f"[WARN] TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID is not set. Skipping test Telegram message.")
-
@@ -61,7 +61,11 @@ if __name__ == "__main__":
     create_table(CONST_CREATE_CUSTOMTAGS_SQL, "customtags")
     create_table(CONST_CREATE_TRAFFICSTATS_SQL, "trafficstats")
     create_table(CONST_CREATE_ALERTS_SQL, "alerts")
+    create_table(CONST_CREATE_NOTIFICATIONOUTBOX_SQL, "notificationoutbox")
     create_table(CONST_CREATE_ALLFLOWS_SQL, "allflows")
+    create_table(CONST_CREATE_ALLFLOWSDAILY_SQL, "allflowsdaily")
+    create_table(CONST_CREATE_TAGDICTIONARY_SQL, "tagdictionary")
+    create_table(CONST_CREATE_FLOWTAGSOVERFLOW_SQL, "flowtagsoverflow")
     create_table(CONST_CREATE_NEWFLOWS_SQL, "newflows")
     delete_all_records("newflows")
     create_table(CONST_CREATE_LOCALHOSTS_SQL, "localhosts")
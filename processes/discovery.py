@@ -128,7 +128,19 @@ if __name__ == "__main__":
 
     DISCOVERY_RUN_INTERVAL = config_dict.get("DiscoveryProcessRunInterval", 22800)  # Default to 60 seconds if not set
 
+    event_socket = subscribe_events("discovery")
+    last_run = 0
+
     while True:
-        do_discovery()
-        time.sleep(DISCOVERY_RUN_INTERVAL)
+        if time.time() - last_run >= DISCOVERY_RUN_INTERVAL:
+            do_discovery()
+            last_run = time.time()
+
+        # Sleep until the next run, waking early only to pick up a changed run interval
+        remaining = max(0, DISCOVERY_RUN_INTERVAL - (time.time() - last_run))
+        if wait_for_events(event_socket, remaining, [CONST_EVENT_CONFIG_CHANGED]):
+            config_dict = get_config_settings()
+            if config_dict:
+                DISCOVERY_RUN_INTERVAL = config_dict.get("DiscoveryProcessRunInterval", 22800)
+                log_info(logger, f"[INFO] Discovery run interval set to {DISCOVERY_RUN_INTERVAL} seconds.")
 
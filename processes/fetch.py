@@ -64,6 +64,51 @@ def pihole_logs_thread():
         log_info(logger, f"[INFO] Pihole thread sleeping for {pihole_fetch_interval} seconds")
         time.sleep(pihole_fetch_interval)
 
+# Set while the main loop downloads and rebuilds data, maintenance waits for it to finish
+fetch_in_progress = threading.Event()
+
+def database_maintenance_thread():
+    """
+    Thread function running SQLite maintenance (ANALYZE, incremental vacuum and WAL
+    checkpoints) once a day during DatabaseMaintenanceHour.
+    """
+    logger = logging.getLogger(__name__)
+    log_info(logger, "[INFO] Starting database maintenance thread")
+
+    while True:
+        time.sleep(CONST_DATABASE_MAINTENANCE_CHECK_INTERVAL)
+        try:
+            config_dict = get_config_settings()
+            if not config_dict or fetch_in_progress.is_set():
+                continue
+
+            if database_maintenance_due(config_dict):
+                log_info(logger, "[INFO] Running database maintenance...")
+                run_database_maintenance(config_dict)
+                log_info(logger, "[INFO] Database maintenance finished.")
+        except Exception as e:
+            log_error(logger, f"[ERROR] Error during database maintenance: {e}")
+
+def explore_refresh_thread():
+    """
+    Thread function upserting the flows seen since the last run into the explore
+    table every ExploreRefreshInterval seconds (0 disables). The main loop still
+    runs the full rebuild once per fetch interval.
+    """
+    logger = logging.getLogger(__name__)
+    log_info(logger, "[INFO] Starting explore refresh thread")
+
+    while True:
+        config_dict = get_config_settings()
+        refresh_interval = int(config_dict.get('ExploreRefreshInterval', 300)) if config_dict else 300
+        time.sleep(refresh_interval if refresh_interval > 0 else 300)
+        try:
+            # The main loop rebuilds explore while a fetch is in progress
+            if refresh_interval > 0 and not fetch_in_progress.is_set():
+                refresh_master_flow_view()
+        except Exception as e:
+            log_error(logger, f"[ERROR] Error during explore refresh: {e}")
+
 def main():
     """
     Main program to fetch and update external data at a fixed interval.
@@ -81,8 +126,15 @@ def main():
     pihole_thread = threading.Thread(target=pihole_logs_thread, daemon=True)
     pihole_thread.start()
     log_info(logger, "[INFO] Started hourly Pihole DNS logs fetch thread")
+
+    maintenance_thread = threading.Thread(target=database_maintenance_thread, daemon=True)
+    maintenance_thread.start()
+
+    refresh_thread = threading.Thread(target=explore_refresh_thread, daemon=True)
+    refresh_thread.start()
     
     while True:
+        fetch_in_progress.set()
         try:
             log_info(logger,"[INFO] Deleting old traffic stats...")
             delete_old_traffic_stats()
@@ -94,6 +146,14 @@ def main():
         if not config_dict:
             log_error(logger, "[ERROR] Failed to load configuration settings")
             exit(1)
+
+        try:
+            if config_dict.get('AllFlowsRetentionDays', 0) > 0:
+                log_info(logger, "[INFO] Purging expired flows from allflows...")
+                purge_expired_allflows(config_dict)
+                log_info(logger, "[INFO] Finished purging expired flows.")
+        except Exception as e:
+            log_error(logger, f"[ERROR] Error during purging expired flows: {e}")
         # Call the update_tor_nodes function
 
         try: 
@@ -159,6 +219,10 @@ def main():
         bulk_populate_master_flow_view()
         log_info(logger, "[INFO] Populating Explore Master Flow Table finished.")
 
+        publish_event(CONST_EVENT_ENRICHMENT_UPDATED, {"source": "fetch"})
+
+
+        fetch_in_progress.clear()
 
         # Wait for the next interval
         log_info(logger, f"[INFO] Sleeping for {fetch_interval} seconds before the next fetch.")
@@ -13,12 +13,14 @@ import sqlite3  # Import the sqlite3 module
 from init import *
 
 from notifications.telegram import send_test_telegram_message  # Import send_test_telegram_message from notifications.py
+from notifications.outbox import start_notification_dispatcher
 
 from src.const import CONST_REINITIALIZE_DB, IS_CONTAINER
 import schedule
 import time
 import logging
-from src.detections import process_data
+from src.detections import process_data, invalidate_enrichment_cache
+from detect.detect_new_outbound_connections import load_seen_destinations
 
 if (IS_CONTAINER):
     REINITIALIZE_DB=os.getenv("REINITIALIZE_DB", CONST_REINITIALIZE_DB)
@@ -38,6 +40,15 @@ if __name__ == "__main__":
 
     send_test_telegram_message()
 
+    # Deliver alerts queued in the notification outbox, including any left over from a previous run
+    start_notification_dispatcher()
+
+    # Build the seen-destination filters before the first batch lands in allflows
+    if config_dict.get("NewOutboundDetection", 0) > 0:
+        load_seen_destinations(config_dict)
+
+    event_socket = subscribe_events("processor")
+
     while True:
 
         config_dict = get_config_settings()
@@ -49,4 +60,8 @@ if __name__ == "__main__":
         log_info(logger, f"[INFO] Process run interval set to {PROCESS_RUN_INTERVAL} seconds.")
 
         process_data()
-        time.sleep(PROCESS_RUN_INTERVAL)
\ No newline at end of file
+
+        # Wake up as soon as the collector announces a new flow batch, polling is the fallback
+        events = wait_for_events(event_socket, PROCESS_RUN_INTERVAL, [CONST_EVENT_FLOW_BATCH_READY, CONST_EVENT_ENRICHMENT_UPDATED])
+        if any(event["event"] == CONST_EVENT_ENRICHMENT_UPDATED for event in events):
+            invalidate_enrichment_cache()
\ No newline at end of file
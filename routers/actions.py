@@ -102,4 +102,21 @@ def setup_actions_routes(app):
         except Exception as e:
             log_error(logger, f"[ERROR] Failed to retrieve actions: {e}")
             response.status = 500
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+    @app.route('/api/actions/errorreports', method=['GET'])
+    def get_error_reports_api():
+        """
+        API endpoint to retrieve how often each distinct error was logged.
+
+        Returns:
+            JSON object containing the error counts per signature.
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            reports = get_error_reports()
+            response.content_type = 'application/json'
+            return json.dumps(reports, indent=2)
+        except Exception as e:
+            log_error(logger, f"[ERROR] Failed to retrieve error reports: {e}")
+            response.status = 500
+            return {"error": str(e)}
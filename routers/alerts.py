@@ -221,6 +221,22 @@ def setup_alerts_routes(app):
             response.status = 500
             return {"error": str(e)}
 
+    @app.route('/api/alerts/suppression', method=['GET'])
+    def alert_suppression_counters():
+        """
+        API endpoint to get the number of repeat alerts merged and new alerts suppressed
+        by the rate limit, per host and category.
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            counters = get_alert_suppression_counters()
+            response.content_type = 'application/json'
+            return json.dumps(counters)
+        except Exception as e:
+            log_error(logger, f"[ERROR] Failed to get alert suppression counters: {e}")
+            response.status = 500
+            return {"error": str(e)}
+
     @app.route('/api/alerts/recent/<ip_address>', method=['GET'])
     def get_recent_alerts_by_ip_api(ip_address):
         """
@@ -62,6 +62,7 @@ def setup_configurations_routes(app):
             
             try:
                 update_config_setting(key, value)
+                publish_event(CONST_EVENT_CONFIG_CHANGED, {"key": key})
                 
                 response.content_type = 'application/json'
                 log_info(logger, f"[INFO] Added new configuration: {key}")
@@ -14,7 +14,14 @@ import logging
 import json
 from init import *
 from src.devicecategories import CONST_DEVICE_CATEGORIES
-from database.explore import get_latest_master_flows, search_master_flows_by_concat
+from database.explore import (
+    get_latest_master_flows,
+    search_master_flows,
+    decode_explore_cursor,
+    parse_explore_filters,
+    get_explore_summary,
+    EXPLORE_FILTER_NAMES
+)
 
 app = Bottle()
 
@@ -33,11 +40,23 @@ def setup_explore_routes(app):
         Query params:
             limit (int): Number of rows per page (default 1000)
             page (int): Page number (default 0)
+            cursor (str): The 'next' value of the previous page, takes precedence over page
+            src_country, dst_country, src_asn, dst_asn, src_port, dst_port, protocol,
+            src_cidr, dst_cidr, ip, since, until, hours: Optional filters, see
+            database.explore.parse_explore_filters
         """
         try:
             limit = int(request.query.get('limit', 100))
             page = int(request.query.get('page', 0))
-            data = get_latest_master_flows(limit=limit, page=page)
+            after = request.query.get('cursor') or None
+            try:
+                if after:
+                    decode_explore_cursor(after)
+                filters = parse_explore_filters({name: request.query.get(name) for name in EXPLORE_FILTER_NAMES})
+            except ValueError as e:
+                response.status = 400
+                return json.dumps({"success": False, "error": str(e)})
+            data = get_latest_master_flows(limit=limit, page=page, after=after, filters=filters)
             response.content_type = 'application/json'
             return json.dumps({"success": True, "data": data})
         except Exception as e:
@@ -47,7 +66,7 @@ def setup_explore_routes(app):
     @app.get('/api/explore/search')
     def api_explore_search():
         """
-        Search master flows by concat column with pagination.
+        Search master flows by substring of any searchable column with pagination.
         Query params:
             q (str): Search string (required)
             page (int): Page number (default 0)
@@ -55,17 +74,45 @@ def setup_explore_routes(app):
         """
         try:
             search_string = request.query.get('q', '')
-            if "_" in search_string:
-                search_string = search_string.replace("_", r"\_")
             if not search_string:
                 response.status = 400
                 return json.dumps({"success": False, "error": "Missing required parameter: q"})
             page = int(request.query.get('page', 0))
             page_size = int(request.query.get('page_size', 100))
-            data = search_master_flows_by_concat(search_string, page=page, page_size=page_size)
+            data = search_master_flows(search_string, page=page, page_size=page_size)
             response.content_type = 'application/json'
             return json.dumps({"success": True, "data": data})
         except Exception as e:
             response.status = 500
             return json.dumps({"success": False, "error": str(e)})
 
+    # Path name of each summary endpoint and the exploresummary dimension it serves
+    summary_dimensions = {"countries": "country", "asns": "asn", "ports": "dst_port", "hosts": "host"}
+
+    @app.get('/api/explore/summary/<name>')
+    def api_explore_summary(name):
+        """
+        Top remote countries, remote ASNs, destination ports or local hosts by bytes,
+        read from the rollups maintained with the explore table.
+        Path:
+            name (str): countries, asns, ports or hosts
+        Query params:
+            limit (int): Number of rows (default 10, at most 1000)
+        """
+        try:
+            if name not in summary_dimensions:
+                response.status = 404
+                return json.dumps({"success": False, "error": f"Unknown summary: {name}"})
+            try:
+                data = get_explore_summary(summary_dimensions[name], int(request.query.get('limit', CONST_EXPLORE_SUMMARY_DEFAULT_LIMIT)))
+            except ValueError as e:
+                response.status = 400
+                return json.dumps({"success": False, "error": str(e)})
+            if data is None:
+                response.status = 500
+                return json.dumps({"success": False, "error": "Unable to read the explore summary"})
+            response.content_type = 'application/json'
+            return json.dumps({"success": True, "data": data})
+        except Exception as e:
+            response.status = 500
+            return json.dumps({"success": False, "error": str(e)})
@@ -79,6 +79,7 @@ def setup_ignorelist_routes(app):
             try:
 
                 insert_ignorelist_entry(ignorelist_id, src_ip, dst_ip, dst_port, protocol, src_port=src_port)
+                publish_event(CONST_EVENT_IGNORELIST_CHANGED, {"ignorelist_id": ignorelist_id})
                 
                 response.content_type = 'application/json'
                 log_info(logger, f"[INFO] Added new ignorelist entry: {ignorelist_id} {src_ip} -> {dst_ip}:{dst_port}/{protocol}")
@@ -97,6 +98,7 @@ def setup_ignorelist_routes(app):
             # Delete a ignorelist entry
             try:
                 delete_ignorelist_entry(id)
+                publish_event(CONST_EVENT_IGNORELIST_CHANGED, {"ignorelist_id": id})
                 response.content_type = 'application/json'
                 log_info(logger, f"Deleted ignorelist entry: {id}")
                 return {"message": "IgnoreList entry deleted successfully"}
@@ -0,0 +1,104 @@
+import base64
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string keys using double hashing of a single
+    blake2b digest. Answers "possibly seen" / "definitely not seen".
+    """
+
+    def __init__(self, capacity, error_rate, num_bits=None, num_hashes=None, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = num_bits or max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = num_hashes or max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def add(self, key):
+        """Add a key, returning True if it was not already (probably) present."""
+        added = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "count": self.count,
+            "bits": base64.b64encode(bytes(self.bits)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["capacity"],
+            data["error_rate"],
+            num_bits=data["num_bits"],
+            num_hashes=data["num_hashes"],
+            bits=bytearray(base64.b64decode(data["bits"])),
+            count=data["count"],
+        )
+
+
+class ScalableBloomFilter:
+    """
+    Chain of Bloom filters that adds a larger filter whenever the current one
+    reaches capacity, keeping the false positive rate bounded as a host talks
+    to more destinations.
+    """
+
+    def __init__(self, initial_capacity=10000, error_rate=0.001, filters=None):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        # Halving the error rate of each new filter keeps the compound rate below error_rate
+        self.filters = filters or [BloomFilter(initial_capacity, error_rate / 2)]
+
+    def __contains__(self, key):
+        return any(key in bloom for bloom in self.filters)
+
+    def add(self, key):
+        """Add a key, returning True if it was not already (probably) present."""
+        if key in self:
+            return False
+        if self.filters[-1].is_full():
+            last = self.filters[-1]
+            self.filters.append(BloomFilter(last.capacity * 2, last.error_rate / 2))
+        return self.filters[-1].add(key)
+
+    def to_dict(self):
+        return {
+            "initial_capacity": self.initial_capacity,
+            "error_rate": self.error_rate,
+            "filters": [bloom.to_dict() for bloom in self.filters],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["initial_capacity"],
+            data["error_rate"],
+            filters=[BloomFilter.from_dict(bloom) for bloom in data["filters"]],
+        )
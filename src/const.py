@@ -27,11 +27,14 @@ TABLE_DB_MAP = {
     "localhosts": CONST_LOCALHOSTS_DB,
     "alerts": CONST_ALERTS_DB,
     "actions": CONST_ACTIONS_DB,
+    "errorreports": CONST_ACTIONS_DB,
     "trafficstats": CONST_TRAFFICSTATS_DB,
     "configuration": CONST_CONFIGURATION_DB,
     "allflows": CONST_ALLFLOWS_DB,
+    "allflowscompact": CONST_ALLFLOWS_DB,
     "customtags": CONST_CUSTOMTAGS_DB,
     "dnsqueries": CONST_DNSQUERIES_DB,
+    "ipdomains": CONST_DNSQUERIES_DB,
     "explore": CONST_EXPLORE_DB,
     "geolocation": CONST_GEOLOCATION_DB,
     "ignorelist": CONST_IGNORELIST_DB,
@@ -42,14 +45,104 @@ TABLE_DB_MAP = {
     "services": CONST_SERVICES_DB,
     "tornodes": CONST_TORNODES_DB,
     "dbperformance": CONST_PERFORMANCE_DB,
+    "dbmaintenance": CONST_PERFORMANCE_DB,
     "dnskeyvalue": CONST_EXPLORE_DB,
+    "explorestate": CONST_EXPLORE_DB,
+    "explorefts": CONST_EXPLORE_DB,
+    "exploresummary": CONST_EXPLORE_DB,
+    "allflowsdaily": CONST_ALLFLOWS_DB,
+    "tagdictionary": CONST_ALLFLOWS_DB,
+    "flowtagsoverflow": CONST_ALLFLOWS_DB,
+    "notificationoutbox": CONST_ALERTS_DB,
+    "dbperformancehistogram": CONST_PERFORMANCE_DB,
+    "dbperformancedigest": CONST_PERFORMANCE_DB,
     # Add other mappings as needed
 }
 CONST_TEST_SOURCE_DB = ['/database/test_source_1.db']
+# Pragmas applied once to every new pooled connection (databases are in WAL mode)
+CONST_SQLITE_CONNECTION_PRAGMAS = [
+    "busy_timeout = 10000",
+    "synchronous = NORMAL",
+    "cache_size = -8000",
+    "mmap_size = 67108864",
+    "temp_store = MEMORY",
+]
+CONST_SQLITE_CACHED_STATEMENTS = 256
+CONST_SQLITE_MAX_IDLE_CONNECTIONS = 4
+# Query telemetry recorded by run_timed_query
+CONST_QUERY_TELEMETRY_QUEUE_SIZE = 10000
+CONST_QUERY_TELEMETRY_BATCH_SIZE = 500
+CONST_QUERY_TELEMETRY_FLUSH_INTERVAL = 5
+CONST_QUERY_TELEMETRY_DEFAULT_SAMPLE_PERCENT = 10
+CONST_QUERY_TELEMETRY_DEFAULT_RETENTION_HOURS = 24
+CONST_QUERY_TELEMETRY_HISTOGRAM_RETENTION_DAYS = 7
+CONST_QUERY_TELEMETRY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+CONST_QUERY_TELEMETRY_OVERFLOW_BUCKET = 2147483647
+# Relative error of the percentiles reported from dbperformancedigest
+CONST_QUERY_TELEMETRY_SKETCH_ACCURACY = 0.01
+CONST_QUERY_TELEMETRY_DIGEST_RETENTION_DAYS = 90
+# Database maintenance (checkpoint, ANALYZE, incremental vacuum) run by fetch.py
+CONST_DATABASE_MAINTENANCE_CHECK_INTERVAL = 600
+CONST_DATABASE_MAINTENANCE_MIN_INTERVAL_HOURS = 20
+CONST_DATABASE_MAINTENANCE_ANALYSIS_LIMIT = 1000
+# Rows read, enriched and upserted per chunk of the incremental explore refresh
+CONST_EXPLORE_REFRESH_BATCH_SIZE = 1000
+# Flows read, enriched and written per step of a full explore rebuild
+CONST_EXPLORE_BUILD_CHUNK_SIZE = 5000
+# The trigram search index needs at least this many characters, shorter searches scan explore
+CONST_EXPLORE_SEARCH_MIN_LENGTH = 3
+# Explore row counts and filter plans cached per dataset version, by query
+CONST_EXPLORE_COUNT_CACHE_SIZE = 256
+# Minimum rows counted per filter when choosing the index that drives a filtered explore query
+CONST_EXPLORE_FILTER_PROBE_LIMIT = 5000
+# Default and maximum rows returned by the explore summary endpoints
+CONST_EXPLORE_SUMMARY_DEFAULT_LIMIT = 10
+CONST_EXPLORE_SUMMARY_MAX_LIMIT = 1000
+# Addresses kept in the in-process IP to domain cache and seconds before an entry is read again
+CONST_IP_DOMAIN_CACHE_SIZE = 10000
+CONST_IP_DOMAIN_CACHE_TTL = 300
+CONST_EVENT_SOCKET_DIR = "/database/events"
+CONST_EVENT_FLOW_BATCH_READY = "flow_batch_ready"
+CONST_EVENT_CONFIG_CHANGED = "config_changed"
+CONST_EVENT_ENRICHMENT_UPDATED = "enrichment_updated"
+CONST_EVENT_IGNORELIST_CHANGED = "ignorelist_changed"
+# Upper bound on how long a process relies on cached data when no event arrives
+CONST_EVENT_FALLBACK_REFRESH_SECONDS = 3600
+# Upper bound on alert ids tracked in memory for dedupe before the oldest are evicted
+CONST_ALERT_DEDUPE_MAX_ENTRIES = 10000
+# Seconds handle_alert reuses a host's whitelisted/alerts_enabled flags before reading localhosts again
+CONST_LOCALHOST_ALERT_FLAGS_TTL = 60
+# Notification outbox dispatcher timing, all in seconds
+CONST_NOTIFICATION_DISPATCH_INTERVAL = 5
+CONST_NOTIFICATION_CONNECT_TIMEOUT = 5
+CONST_NOTIFICATION_READ_TIMEOUT = 15
+CONST_NOTIFICATION_RETRY_BACKOFF = 30
+CONST_NOTIFICATION_RETRY_BACKOFF_MAX = 3600
+CONST_NOTIFICATION_CLAIM_TIMEOUT = 300
+CONST_NOTIFICATION_RETENTION_DAYS = 7
+# Telegram rejects messages longer than 4096 characters
+CONST_TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+CONST_SEEN_DESTINATIONS_FILE = "/database/seendestinations.json"
+# Per local host Bloom filter sizing for the new outbound connection seen-set
+CONST_SEEN_DESTINATIONS_CAPACITY = 10000
+CONST_SEEN_DESTINATIONS_ERROR_RATE = 0.001
+# Seconds between saves of the seen-destination filters, the rest is replayed from allflows on start
+CONST_SEEN_DESTINATIONS_SAVE_INTERVAL = 300
+# Log lines are queued for a background writer, lines beyond the queue size are dropped
+CONST_LOG_QUEUE_SIZE = 10000
+# Seconds between refreshes of LogLevel and WriteLogFile in the logging functions
+CONST_LOG_SETTINGS_REFRESH_INTERVAL = 5
+CONST_LOG_DIR = "/database"
+# Errors are deduplicated by signature and reported in batches, all in seconds
+CONST_ERROR_REPORT_INTERVAL = 60
+CONST_ERROR_REPORT_BACKOFF_MAX = 3600
+CONST_ERROR_REPORT_CONNECT_TIMEOUT = 5
+CONST_ERROR_REPORT_READ_TIMEOUT = 15
+CONST_ERROR_REPORT_MAX_SIGNATURES = 1000
 CONST_SITE= 'TESTPPE'
 CONST_LINK_LOCAL_RANGE = ["169.254.0.0/16"]
 CONST_REINITIALIZE_DB = 0
-CONST_DATABASE_SCHEMA_VERSION=16
+CONST_DATABASE_SCHEMA_VERSION=24
 CONST_CREATE_DBPERFORMANCE_SQL='''
             CREATE TABLE IF NOT EXISTS dbperformance (
                 id INTEGER PRIMARY KEY,
@@ -59,14 +152,56 @@ CONST_CREATE_DBPERFORMANCE_SQL='''
                 execution_time REAL,
                 rows_returned INTEGER,
                 run_timestamp TEXT
-            )'''
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_dbperformance_run_timestamp ON dbperformance(run_timestamp);
+
+            -- Every query execution, counted per minute, function and latency bucket
+            CREATE TABLE IF NOT EXISTS dbperformancehistogram (
+                minute TEXT,            -- '%Y-%m-%d %H:%M'
+                function TEXT,
+                bucket_ms INTEGER,      -- upper bound of the latency bucket in ms
+                count INTEGER DEFAULT 0,
+                total_time REAL DEFAULT 0,
+                PRIMARY KEY (minute, function, bucket_ms)
+            );
+
+            -- Per hour latency digest of every function, merged to answer percentiles over any range
+            CREATE TABLE IF NOT EXISTS dbperformancedigest (
+                hour TEXT,              -- '%Y-%m-%d %H'
+                function TEXT,
+                count INTEGER,
+                total_time REAL,
+                min_time REAL,
+                max_time REAL,
+                sketch TEXT,            -- DDSketch bins as JSON
+                PRIMARY KEY (hour, function)
+            );
+
+            -- One row per database and maintenance run
+            CREATE TABLE IF NOT EXISTS dbmaintenance (
+                id INTEGER PRIMARY KEY,
+                run_timestamp TEXT,
+                db_name TEXT,
+                duration REAL,              -- seconds
+                size_before INTEGER,        -- database file plus WAL, in bytes
+                size_after INTEGER,
+                wal_size_before INTEGER,
+                wal_size_after INTEGER,
+                freelist_before INTEGER,    -- free pages
+                freelist_after INTEGER,
+                checkpoint_busy INTEGER,    -- 1 if readers kept the WAL checkpoint from completing
+                error TEXT
+            );
+'''
 CONST_CREATE_DNSKEYVALUE_SQL='''
             CREATE TABLE IF NOT EXISTS dnskeyvalue (
                 ip TEXT PRIMARY KEY,
                 domain TEXT
             )'''
-CONST_CREATE_EXPLORE_SQL='''
-            CREATE TABLE IF NOT EXISTS explore (
+# The explore table alone, {table} is explore or the shadow table of a full rebuild
+CONST_CREATE_EXPLORE_TABLE_SQL='''
+            CREATE TABLE IF NOT EXISTS {table} (
                 flow_id INTEGER PRIMARY KEY,
                 src_ip TEXT,
                 dst_ip TEXT,
@@ -89,8 +224,99 @@ CONST_CREATE_EXPLORE_SQL='''
                 dst_asn TEXT,
                 src_isp TEXT,
                 dst_isp TEXT,
-                concat TEXT
-            )'''
+                local_ip TEXT
+            );
+'''
+# Rollups of explore by dimension, {table} is exploresummary or the shadow table of a full rebuild
+CONST_CREATE_EXPLORE_SUMMARY_TABLE_SQL='''
+            CREATE TABLE IF NOT EXISTS {table} (
+                dimension TEXT,
+                key TEXT,
+                bytes INTEGER DEFAULT 0,
+                packets INTEGER DEFAULT 0,
+                flows INTEGER DEFAULT 0,
+                PRIMARY KEY (dimension, key)
+            );
+'''
+# Rollup key of an explore row by dimension, {row} is the row (new, old) or table name. Countries
+# and ASNs are those of the remote side, local_ip is the side found in localhosts.
+CONST_EXPLORE_SUMMARY_KEYS = {
+    "country": "CASE WHEN {row}.local_ip = {row}.dst_ip THEN {row}.src_country ELSE {row}.dst_country END",
+    "asn": "CASE WHEN {row}.local_ip = {row}.dst_ip THEN {row}.src_asn ELSE {row}.dst_asn END",
+    "dst_port": "{row}.dst_port",
+    "host": "{row}.local_ip",
+}
+_EXPLORE_SUMMARY_ADD_SQL = ''.join(f'''
+                INSERT INTO exploresummary (dimension, key, bytes, packets, flows)
+                SELECT '{dimension}', {key.format(row="new")}, new.bytes, new.packets, 1 WHERE {key.format(row="new")} IS NOT NULL
+                ON CONFLICT (dimension, key) DO UPDATE SET
+                    bytes = bytes + excluded.bytes, packets = packets + excluded.packets, flows = flows + excluded.flows;''' for dimension, key in CONST_EXPLORE_SUMMARY_KEYS.items())
+_EXPLORE_SUMMARY_SUBTRACT_SQL = ''.join(f'''
+                UPDATE exploresummary SET bytes = bytes - old.bytes, packets = packets - old.packets, flows = flows - 1
+                WHERE dimension = '{dimension}' AND key = {key.format(row="old")};''' for dimension, key in CONST_EXPLORE_SUMMARY_KEYS.items())
+CONST_CREATE_EXPLORE_SQL=CONST_CREATE_EXPLORE_TABLE_SQL.format(table="explore") + CONST_CREATE_EXPLORE_SUMMARY_TABLE_SQL.format(table="exploresummary") + '''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_explore_flow_key ON explore (src_ip_int, dst_ip_int, src_port, dst_port, protocol);
+            CREATE INDEX IF NOT EXISTS idx_explore_last_seen ON explore (last_seen);
+            -- Keyset pagination order, the index ends with the implicit rowid (flow_id)
+            CREATE INDEX IF NOT EXISTS idx_explore_packets ON explore (packets);
+            -- Structured filters, src_ip_int ranges use idx_explore_flow_key
+            CREATE INDEX IF NOT EXISTS idx_explore_dst_ip_int ON explore (dst_ip_int);
+            CREATE INDEX IF NOT EXISTS idx_explore_dst_port ON explore (dst_port);
+            CREATE INDEX IF NOT EXISTS idx_explore_src_country ON explore (src_country);
+            CREATE INDEX IF NOT EXISTS idx_explore_dst_country ON explore (dst_country);
+            CREATE INDEX IF NOT EXISTS idx_explore_src_asn ON explore (src_asn);
+            CREATE INDEX IF NOT EXISTS idx_explore_dst_asn ON explore (dst_asn);
+
+            -- Substring search index over the searchable explore columns, kept in sync by the triggers
+            CREATE VIRTUAL TABLE IF NOT EXISTS explorefts USING fts5 (
+                src_ip, dst_ip, src_port, dst_port, protocol, tags, src_dns, dst_dns,
+                src_country, dst_country, src_asn, dst_asn, src_isp, dst_isp,
+                content='explore', content_rowid='flow_id', tokenize='trigram'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS explore_fts_insert AFTER INSERT ON explore BEGIN
+                INSERT INTO explorefts (rowid, src_ip, dst_ip, src_port, dst_port, protocol, tags, src_dns, dst_dns,
+                                        src_country, dst_country, src_asn, dst_asn, src_isp, dst_isp)
+                VALUES (new.flow_id, new.src_ip, new.dst_ip, new.src_port, new.dst_port, new.protocol, new.tags, new.src_dns, new.dst_dns,
+                        new.src_country, new.dst_country, new.src_asn, new.dst_asn, new.src_isp, new.dst_isp);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS explore_fts_delete AFTER DELETE ON explore BEGIN
+                INSERT INTO explorefts (explorefts, rowid, src_ip, dst_ip, src_port, dst_port, protocol, tags, src_dns, dst_dns,
+                                        src_country, dst_country, src_asn, dst_asn, src_isp, dst_isp)
+                VALUES ('delete', old.flow_id, old.src_ip, old.dst_ip, old.src_port, old.dst_port, old.protocol, old.tags, old.src_dns, old.dst_dns,
+                        old.src_country, old.dst_country, old.src_asn, old.dst_asn, old.src_isp, old.dst_isp);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS explore_fts_update AFTER UPDATE ON explore BEGIN
+                INSERT INTO explorefts (explorefts, rowid, src_ip, dst_ip, src_port, dst_port, protocol, tags, src_dns, dst_dns,
+                                        src_country, dst_country, src_asn, dst_asn, src_isp, dst_isp)
+                VALUES ('delete', old.flow_id, old.src_ip, old.dst_ip, old.src_port, old.dst_port, old.protocol, old.tags, old.src_dns, old.dst_dns,
+                        old.src_country, old.dst_country, old.src_asn, old.dst_asn, old.src_isp, old.dst_isp);
+                INSERT INTO explorefts (rowid, src_ip, dst_ip, src_port, dst_port, protocol, tags, src_dns, dst_dns,
+                                        src_country, dst_country, src_asn, dst_asn, src_isp, dst_isp)
+                VALUES (new.flow_id, new.src_ip, new.dst_ip, new.src_port, new.dst_port, new.protocol, new.tags, new.src_dns, new.dst_dns,
+                        new.src_country, new.dst_country, new.src_asn, new.dst_asn, new.src_isp, new.dst_isp);
+            END;
+
+            -- Top N by bytes per dimension, the rollups are kept in sync by the triggers
+            CREATE INDEX IF NOT EXISTS idx_exploresummary_bytes ON exploresummary (dimension, bytes);
+
+            CREATE TRIGGER IF NOT EXISTS explore_summary_insert AFTER INSERT ON explore BEGIN''' + _EXPLORE_SUMMARY_ADD_SQL + '''
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS explore_summary_delete AFTER DELETE ON explore BEGIN''' + _EXPLORE_SUMMARY_SUBTRACT_SQL + '''
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS explore_summary_update AFTER UPDATE ON explore BEGIN''' + _EXPLORE_SUMMARY_SUBTRACT_SQL + _EXPLORE_SUMMARY_ADD_SQL + '''
+            END;
+
+            -- last_seen (epoch seconds) of the newest allflows row already in explore
+            CREATE TABLE IF NOT EXISTS explorestate (
+                name TEXT PRIMARY KEY,
+                value INTEGER
+            );
+'''
 CONST_CREATE_NEWFLOWS_SQL='''
     CREATE TABLE IF NOT EXISTS newflows (
         src_ip TEXT,
@@ -105,6 +331,7 @@ CONST_CREATE_NEWFLOWS_SQL='''
         last_seen TEXT,
         times_seen INTEGER,
         tags TEXT,
+        tag_mask INTEGER DEFAULT 0,
         PRIMARY KEY (src_ip, dst_ip, src_port, dst_port, protocol)
     )'''
 
@@ -117,28 +344,111 @@ CONST_CREATE_SERVICES_SQL="""
         PRIMARY KEY (port_number, protocol)
     )"""
 
+# allflows is stored compactly in allflowscompact: IPv4 addresses as integers,
+# epoch second timestamps and a clustered WITHOUT ROWID primary key. The
+# allflows view keeps the text shapes (dotted quads, local time strings) for
+# readers and also exposes the integer columns so filters can use the indexes.
 CONST_CREATE_ALLFLOWS_SQL='''
-    CREATE TABLE IF NOT EXISTS allflows (
-        src_ip TEXT,
-        dst_ip TEXT,
-        src_port INTEGER,
-        dst_port INTEGER,
-        protocol INTEGER,
+    PRAGMA auto_vacuum = INCREMENTAL;
+
+    CREATE TABLE IF NOT EXISTS allflowscompact (
+        src_ip INTEGER NOT NULL,
+        dst_ip INTEGER NOT NULL,
+        src_port INTEGER NOT NULL,
+        dst_port INTEGER NOT NULL,
+        protocol INTEGER NOT NULL,
         packets INTEGER,
         bytes INTEGER,
-        flow_start TEXT,
-        flow_end TEXT,
+        flow_start INTEGER,
+        flow_end INTEGER,
         times_seen INTEGER DEFAULT 1,
-        last_seen TEXT,
+        last_seen INTEGER,
         tags TEXT,
+        tag_mask INTEGER DEFAULT 0,
         PRIMARY KEY (src_ip, dst_ip, src_port, dst_port, protocol)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_allflowscompact_dst_ip ON allflowscompact(dst_ip);
+
+    CREATE INDEX IF NOT EXISTS idx_allflowscompact_last_seen ON allflowscompact(last_seen);
+
+    CREATE VIEW IF NOT EXISTS allflows AS
+    SELECT
+        (src_ip >> 24) || '.' || ((src_ip >> 16) & 255) || '.' || ((src_ip >> 8) & 255) || '.' || (src_ip & 255) AS src_ip,
+        (dst_ip >> 24) || '.' || ((dst_ip >> 16) & 255) || '.' || ((dst_ip >> 8) & 255) || '.' || (dst_ip & 255) AS dst_ip,
+        src_port,
+        dst_port,
+        protocol,
+        packets,
+        bytes,
+        datetime(flow_start, 'unixepoch', 'localtime') AS flow_start,
+        datetime(flow_end, 'unixepoch', 'localtime') AS flow_end,
+        times_seen,
+        datetime(last_seen, 'unixepoch', 'localtime') AS last_seen,
+        tags,
+        tag_mask,
+        src_ip AS src_ip_int,
+        dst_ip AS dst_ip_int,
+        last_seen AS last_seen_epoch
+    FROM allflowscompact;
+    '''
+
+CONST_CREATE_ALLFLOWSDAILY_SQL='''
+    CREATE TABLE IF NOT EXISTS allflowsdaily (
+        day TEXT,
+        src_ip TEXT,
+        dst_ip TEXT,
+        dst_port INTEGER,
+        protocol INTEGER,
+        packets INTEGER DEFAULT 0,
+        bytes INTEGER DEFAULT 0,
+        flow_count INTEGER DEFAULT 0,
+        times_seen INTEGER DEFAULT 0,
+        first_seen TEXT,
+        last_seen TEXT,
+        PRIMARY KEY (day, src_ip, dst_ip, dst_port, protocol)
     );
 
-    CREATE INDEX IF NOT EXISTS idx_allflows_src_ip_tags ON allflows(src_ip);
+    CREATE INDEX IF NOT EXISTS idx_allflowsdaily_src_ip ON allflowsdaily(src_ip);
+    '''
 
-    CREATE INDEX IF NOT EXISTS idx_allflows_dst_ip_tags ON allflows(dst_ip);
+# Fixed bit positions for the built-in flow tags; custom tags are assigned the
+# next free bit in the tagdictionary table up to CONST_TAG_BITMASK_WIDTH
+CONST_TAG_BITMASK_WIDTH = 63
+CONST_BUILTIN_TAG_BITS = {
+    "IgnoreList": 0,
+    "Broadcast": 1,
+    "Multicast": 2,
+    "LinkLocal": 3,
+    "DeadConnectionDetection": 4,
+}
+
+CONST_CREATE_TAGDICTIONARY_SQL='''
+    CREATE TABLE IF NOT EXISTS tagdictionary (
+        tag_name TEXT PRIMARY KEY,
+        tag_bit INTEGER UNIQUE
+    );
 
-    CREATE INDEX IF NOT EXISTS idx_allflows_flow_dates ON allflows(flow_start, last_seen);   
+    INSERT OR IGNORE INTO tagdictionary (tag_name, tag_bit) VALUES
+        ('IgnoreList', 0),
+        ('Broadcast', 1),
+        ('Multicast', 2),
+        ('LinkLocal', 3),
+        ('DeadConnectionDetection', 4);
+    '''
+
+CONST_CREATE_FLOWTAGSOVERFLOW_SQL='''
+    CREATE TABLE IF NOT EXISTS flowtagsoverflow (
+        src_ip TEXT,
+        dst_ip TEXT,
+        src_port INTEGER,
+        dst_port INTEGER,
+        protocol INTEGER,
+        tag_name TEXT,
+        PRIMARY KEY (src_ip, dst_ip, src_port, dst_port, protocol, tag_name)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_flowtagsoverflow_tag_name ON flowtagsoverflow(tag_name);
     '''
 
 CONST_CREATE_ALERTS_SQL='''
@@ -156,6 +466,33 @@ CONST_CREATE_ALERTS_SQL='''
     );
     
     CREATE INDEX IF NOT EXISTS idx_alerts_ip_address ON alerts(ip_address);
+
+    CREATE TABLE IF NOT EXISTS alertsuppression (
+        ip_address TEXT,
+        category TEXT,
+        merged INTEGER DEFAULT 0,     -- repeats folded into a batched times_seen update
+        suppressed INTEGER DEFAULT 0, -- new alerts dropped by the per host/category rate limit
+        last_updated TEXT,
+        PRIMARY KEY (ip_address, category)
+    );
+'''
+
+CONST_CREATE_NOTIFICATIONOUTBOX_SQL='''
+    CREATE TABLE IF NOT EXISTS notificationoutbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel TEXT,
+        message TEXT,
+        status TEXT DEFAULT 'pending',  -- pending, sending, sent or failed
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at REAL,           -- epoch seconds, used for retry backoff
+        claimed_by INTEGER,             -- pid of the dispatcher sending the message
+        claimed_at REAL,
+        last_error TEXT,
+        created_at TEXT,
+        sent_at TEXT
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_notificationoutbox_status ON notificationoutbox(status, channel, next_attempt_at);
 '''
 
 CONST_CREATE_IGNORELIST_SQL='''
@@ -289,6 +626,15 @@ BEGIN
     SET id = (SELECT COALESCE(MAX(id), 0) + 1 FROM dnsqueries)
     WHERE rowid = NEW.rowid AND id IS NULL;
 END;
+
+-- Addresses of the DNS responses with the domain they answered, last_seen follows the latest query of the domain
+CREATE TABLE IF NOT EXISTS ipdomains (
+    ip TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    last_seen TEXT,
+    PRIMARY KEY (ip, domain)
+);
+CREATE INDEX IF NOT EXISTS idx_ipdomains_domain ON ipdomains (domain);
 '''
 
 CONST_CREATE_ACTIONS_SQL = '''
@@ -297,7 +643,18 @@ CONST_CREATE_ACTIONS_SQL = '''
     action_text TEXT,
     acknowledged INTEGER DEFAULT 0,
     insert_date TEXT DEFAULT (datetime('now', 'localtime'))
-    )
+    );
+
+    CREATE TABLE IF NOT EXISTS errorreports (
+    signature TEXT PRIMARY KEY,
+    script_name TEXT,
+    file_name TEXT,
+    line_number TEXT,
+    message TEXT,
+    count INTEGER DEFAULT 0,
+    first_seen TEXT,
+    last_seen TEXT
+    );
 '''
 
 CONST_INSTALL_CONFIGS = [
@@ -371,6 +728,20 @@ CONST_INSTALL_CONFIGS = [
     ('PiHoleDnsFetchRecordSize', '10000'),
     ('PiHoleDnsFetchInterval', '3600'),
     ('TrafficStatsPurgeIntervalDays','31'),
+    ('AllFlowsRetentionDays','0'),
+    ('AllFlowsRetentionBatchSize','5000'),
+    ('AllFlowsIncrementalVacuumPages','5000'),
+    ('AlertDedupeFlushInterval','60'),
+    ('AlertRateLimitPerHostCategory','100'),
+    ('NotificationRateLimitPerMinute','20'),
+    ('NotificationMaxAttempts','5'),
+    ('NotificationDigestMaxMessages','20'),
+    ('QueryTelemetrySamplePercent','10'),
+    ('QueryTelemetryRetentionHours','24'),
+    ('LogLevel','INFO'),
+    ('DatabaseMaintenanceHour','3'),
+    ('DatabaseMaintenanceVacuumPages','10000'),
+    ('ExploreRefreshInterval','300'),
     ('SinkHoleDns', '0'),
     ('DhcpServer', '0'),
     ('DnsResponseLookupResolver',''),
@@ -0,0 +1,83 @@
+import json
+import math
+
+
+class DDSketch:
+    """
+    Mergeable quantile sketch with relative error guarantees (DDSketch).
+
+    Values are counted in logarithmic bins so that any quantile is answered with
+    a relative error of at most relative_accuracy, and two sketches with the same
+    accuracy are merged by adding their bin counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _key(self, value):
+        return int(math.ceil(math.log(value) / self.log_gamma))
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        if value <= 0:
+            self.zero_count += count
+        else:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + count
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += count
+
+    def _collapse(self):
+        # Fold the lowest bins together, keeping the accuracy of the high quantiles
+        keys = sorted(self.bins)
+        excess = keys[:len(keys) - self.max_bins + 1]
+        folded = sum(self.bins.pop(key) for key in excess)
+        target = keys[len(excess)]
+        self.bins[target] = self.bins.get(target, 0) + folded
+
+    def merge(self, other):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q):
+        """Return the approximate value at quantile q (0..1), or None if the sketch is empty."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.bins))
+
+    def to_json(self):
+        return json.dumps({
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "bins": self.bins,
+        })
+
+    @classmethod
+    def from_json(cls, data):
+        data = json.loads(data)
+        sketch = cls(data["relative_accuracy"])
+        sketch.zero_count = data["zero_count"]
+        sketch.bins = {int(key): count for key, count in data["bins"].items()}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
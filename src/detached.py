@@ -1,20 +1,66 @@
+import os
 import sqlite3
+import threading
 from src.const import CONST_ACTIONS_DB, CONST_CONFIGURATION_DB
 
-def get_config_settings_detached():
-    """Read configuration settings from the configuration database into a dictionary."""
+# Process-local configuration cache. A dedicated connection only ever reads the
+# configuration database, so its PRAGMA data_version changes whenever any other
+# connection (in this or another process) commits, which invalidates the cache.
+_config_cache_lock = threading.Lock()
+_config_cache_conn = None
+_config_cache_pid = None
+_config_cache_version = None
+_config_cache = None
 
-    try:
-        conn = connect_to_db_detached(CONST_CONFIGURATION_DB)
-        if not conn:
-            return None
-        cursor = conn.cursor()
-        cursor.execute("SELECT key, value FROM configuration")
-        config_dict = dict(cursor.fetchall())
-        conn.close()
-        return config_dict
-    except sqlite3.Error as e:
-        return None
+
+def read_config_cache():
+    """
+    Return the cached configuration, reloading it if the configuration database changed.
+
+    Returns:
+        tuple: (config_dict, reloaded). config_dict is shared by all callers and must
+               be treated as read-only; it is None if the database could not be read.
+    """
+    global _config_cache_conn, _config_cache_pid, _config_cache_version, _config_cache
+    with _config_cache_lock:
+        try:
+            # Connections must not be shared with a forked child
+            if _config_cache_conn is None or _config_cache_pid != os.getpid():
+                _config_cache_conn = sqlite3.connect(CONST_CONFIGURATION_DB, check_same_thread=False)
+                _config_cache_pid = os.getpid()
+                _config_cache_version = None
+
+            version = _config_cache_conn.execute("PRAGMA data_version").fetchone()[0]
+            if _config_cache is not None and version == _config_cache_version:
+                return _config_cache, False
+
+            rows = _config_cache_conn.execute("SELECT key, value FROM configuration").fetchall()
+            _config_cache = dict(rows)
+            _config_cache_version = version
+            return _config_cache, True
+        except sqlite3.Error:
+            # Reopen on the next call, e.g. after the database file was recreated
+            if _config_cache_conn is not None:
+                _config_cache_conn.close()
+            _config_cache_conn = None
+            _config_cache = None
+            return None, False
+
+
+def reset_config_cache():
+    """Drop the cached configuration and its connection, e.g. before the database file is removed."""
+    global _config_cache_conn, _config_cache
+    with _config_cache_lock:
+        if _config_cache_conn is not None:
+            _config_cache_conn.close()
+        _config_cache_conn = None
+        _config_cache = None
+
+
+def get_config_settings_detached():
+    """Read configuration settings from the configuration cache into a dictionary."""
+    config_dict, _ = read_config_cache()
+    return config_dict
     
 def connect_to_db_detached(DB_NAME):
     """Establish a connection to the specified database."""
@@ -54,3 +100,37 @@ def insert_action_detached(action_text):
         if 'conn' in locals() and conn:
             conn.close()
 
+
+
+def record_error_reports_detached(rows):
+    """
+    Add error occurrences to the per signature counts in the errorreports table.
+
+    Args:
+        rows (list): Tuples of (signature, script_name, file_name, line_number,
+                     message, count, first_seen, last_seen).
+
+    Returns:
+        bool: True if the operation was successful, False otherwise.
+    """
+    try:
+        conn = connect_to_db_detached(CONST_ACTIONS_DB)
+
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO errorreports (signature, script_name, file_name, line_number, message, count, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(signature) DO UPDATE SET
+                message = excluded.message,
+                count = count + excluded.count,
+                last_seen = excluded.last_seen
+        """, rows)
+        conn.commit()
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Error recording error reports: {e}")
+        return False
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
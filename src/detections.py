@@ -14,6 +14,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from locallogging import log_info, log_error, log_warn
 from init import * 
 from database.newflows import get_new_flows
+from database.tagdictionary import get_tag_mask
 
 
 from integrations.geolocation import load_geolocation_data
@@ -21,7 +22,7 @@ from integrations.reputation import load_reputation_data
 
 from detect.detect_custom_tag import detect_custom_tag
 from detect.detect_dead_connections import detect_dead_connections
-from detect.detect_new_outbound_connections import detect_new_outbound_connections
+from detect.detect_new_outbound_connections import detect_new_outbound_connections, ensure_seen_destinations
 from detect.detect_geolocation_flows import detect_geolocation_flows
 from detect.detect_unauthorized_dns import detect_unauthorized_dns
 from detect.detect_unauthorized_ntp import detect_unauthorized_ntp
@@ -40,6 +41,35 @@ from detect.detect_high_risk_ports import detect_high_risk_ports
 from detect.detect_incorrect_ntp_stratum import detect_incorrect_ntp_stratum
 
 
+# Geolocation and reputation data kept between batches until fetch announces an update
+_enrichment_cache = {}
+
+
+def invalidate_enrichment_cache():
+    """Drop cached enrichment datasets so they are reloaded on the next batch."""
+    _enrichment_cache.clear()
+
+
+def get_cached_enrichment(name, loader):
+    """
+    Return an enrichment dataset from the cache, loading it if missing or older
+    than CONST_EVENT_FALLBACK_REFRESH_SECONDS.
+
+    Args:
+        name (str): Cache key for the dataset.
+        loader (callable): Function that loads the dataset from the database.
+
+    Returns:
+        The cached dataset.
+    """
+    cached = _enrichment_cache.get(name)
+    if cached and time.time() - cached[0] < CONST_EVENT_FALLBACK_REFRESH_SECONDS:
+        return cached[1]
+    data = loader()
+    _enrichment_cache[name] = (time.time(), data)
+    return data
+
+
 # Function to process data
 def process_data():
     logger = logging.getLogger(__name__)
@@ -65,36 +95,37 @@ def process_data():
 
                 log_info(logger,f"[INFO] Processing {len(newflows)} rows.")
 
+                # The seen-destination filters must be loaded before this batch lands in allflows
+                if config_dict.get("NewOutboundDetection", 0) > 0:
+                    ensure_seen_destinations(config_dict)
+
                 # Pass the rows to update_all_flows
                 update_all_flows(newflows, config_dict)
                 update_traffic_stats(newflows, config_dict)
 
                 if config_dict.get('GeolocationFlowsDetection',0) > 0:
-                    geolocation_data = load_geolocation_data()
+                    geolocation_data = get_cached_enrichment("geolocation", load_geolocation_data)
 
                 if config_dict.get('ReputationListDetection', 0) > 0:
-                    reputation_data = load_reputation_data()
+                    reputation_data = get_cached_enrichment("reputation", load_reputation_data)
 
                 # Proper way to check config values with default of 0
                 if config_dict.get("NewHostsDetection", 0) > 0:
                     update_local_hosts(newflows, config_dict)
                 
-                log_info(logger,f"[INFO] Started removing IgnoreList flows")
-                # process ignorelisted entries and remove from detection rows
-                filtered_rows = [row for row in newflows if 'IgnoreList' not in str(row[11])]
-                log_info(logger,f"[INFO] Finished removing IgnoreList flows - processing flow count is {len(filtered_rows)}")
-
+                # process ignorelisted, broadcast, multicast and link-local entries and remove from detection rows
+                excluded_tags = ["IgnoreList"]
                 if config_dict.get('RemoveBroadcastFlows', 0) >0:
-                    filtered_rows = [row for row in filtered_rows if 'Broadcast' not in str(row[11])]
-                    log_info(logger,f"[INFO] Finished removing Broadcast flows - processing flow count is {len(filtered_rows)}")
-
+                    excluded_tags.append("Broadcast")
                 if config_dict.get('RemoveMulticastFlows', 0) >0:
-                    filtered_rows = [row for row in filtered_rows if 'Multicast' not in str(row[11])]
-                    log_info(logger,f"[INFO] Finished removing Multicast flows - processing flow count is {len(filtered_rows)}")
-
+                    excluded_tags.append("Multicast")
                 if config_dict.get('RemoveLinkLocalFlows', 0) >0:
-                    filtered_rows = [row for row in filtered_rows if 'LinkLocal' not in str(row[11])]
-                    log_info(logger,f"[INFO] Finished removing LinkLocal flows - processing flow count is {len(filtered_rows)}")
+                    excluded_tags.append("LinkLocal")
+
+                log_info(logger,f"[INFO] Started removing {', '.join(excluded_tags)} flows")
+                excluded_tag_mask = get_tag_mask(excluded_tags)
+                filtered_rows = [row for row in newflows if not (row[12] or 0) & excluded_tag_mask]
+                log_info(logger,f"[INFO] Finished removing {', '.join(excluded_tags)} flows - processing flow count is {len(filtered_rows)}")
 
                 if config_dict.get("NewOutboundDetection", 0) > 0:
                     detect_new_outbound_connections(filtered_rows, config_dict)
@@ -153,4 +184,7 @@ def process_data():
 
         except sqlite3.Error as e:
             log_error(logger, f"[ERROR] Error reading from database: {e}")        
+
+    # Write out repeat alerts merged in memory during this cycle once the flush interval has passed
+    flush_pending_alerts(config_dict=config_dict)
     log_info(logger,f"[INFO] Processing finished.") 
@@ -0,0 +1,132 @@
+import sys
+import os
+from pathlib import Path
+current_dir = Path(__file__).resolve().parent
+parent_dir = str(current_dir.parent)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+src_dir = f"{parent_dir}/src"
+if str(src_dir) not in sys.path:
+    sys.path.insert(0, str(src_dir))
+import glob
+import json
+import logging
+import select
+import socket
+import time
+from src.const import CONST_EVENT_SOCKET_DIR
+from src.locallogging import log_info, log_warn
+
+
+def subscribe_events(process_name):
+    """
+    Bind a Unix datagram socket for this process in the shared event directory
+    so that it receives every event published on the local bus.
+
+    Args:
+        process_name (str): Name of the subscribing process (e.g. "processor").
+
+    Returns:
+        socket.socket: The bound socket, or None if the event bus is unavailable,
+                       in which case callers fall back to polling.
+    """
+    logger = logging.getLogger(__name__)
+    socket_path = os.path.join(CONST_EVENT_SOCKET_DIR, f"{process_name}.sock")
+    try:
+        os.makedirs(CONST_EVENT_SOCKET_DIR, exist_ok=True)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(socket_path)
+        sock.setblocking(False)
+        log_info(logger, f"[INFO] Subscribed {process_name} to local event bus at {socket_path}")
+        return sock
+    except (OSError, AttributeError) as e:
+        log_warn(logger, f"[WARN] Local event bus unavailable for {process_name}, falling back to polling: {e}")
+        return None
+
+
+def publish_event(event, payload=None):
+    """
+    Publish an event to every process subscribed to the local event bus.
+    Delivery is best effort: subscribers that are not running are skipped.
+
+    Args:
+        event (str): The event name, one of the CONST_EVENT_* constants.
+        payload (dict): Optional JSON-serializable event details.
+
+    Returns:
+        int: Number of subscribers the event was delivered to.
+    """
+    logger = logging.getLogger(__name__)
+    message = json.dumps({"event": event, "payload": payload or {}, "timestamp": time.time()}).encode("utf-8")
+    delivered = 0
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+    except (OSError, AttributeError) as e:
+        log_warn(logger, f"[WARN] Unable to publish event {event}: {e}")
+        return 0
+
+    try:
+        for socket_path in glob.glob(os.path.join(CONST_EVENT_SOCKET_DIR, "*.sock")):
+            try:
+                sock.sendto(message, socket_path)
+                delivered += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Subscriber is gone, it rebinds its socket when it restarts
+                continue
+            except OSError:
+                # Subscriber queue is full, it will pick the change up on its next poll
+                continue
+    finally:
+        sock.close()
+    return delivered
+
+
+def _drain_events(sock, events):
+    """Read every pending datagram from the socket, keeping those matching events."""
+    received = []
+    while True:
+        try:
+            data = sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return received
+        except OSError:
+            return received
+        try:
+            message = json.loads(data.decode("utf-8"))
+        except ValueError:
+            continue
+        if events is None or message.get("event") in events:
+            received.append(message)
+
+
+def wait_for_events(sock, timeout, events=None):
+    """
+    Wait until one of the given events is published or the timeout expires.
+    Pending events are coalesced, so a burst of publications wakes the caller once.
+
+    Args:
+        sock (socket.socket): Socket returned by subscribe_events, or None to just sleep.
+        timeout (float): Maximum number of seconds to wait (polling fallback).
+        events (list): Event names to wake up for, or None for any event.
+
+    Returns:
+        list: The matching event messages received, empty if the wait timed out.
+    """
+    if sock is None:
+        time.sleep(timeout)
+        return []
+
+    received = _drain_events(sock, events)
+    deadline = time.time() + timeout
+    while not received:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        ready, _, _ = select.select([sock], [], [], remaining)
+        if not ready:
+            break
+        received = _drain_events(sock, events)
+    return received
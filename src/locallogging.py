@@ -10,53 +10,209 @@ import os
 import traceback
 import uuid
 import hashlib
-from src.const import IS_CONTAINER, CONST_SITE
-from src.detached import get_config_settings_detached, insert_action_detached
+import atexit
+import queue
+import re
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from src.const import (
+    IS_CONTAINER,
+    CONST_SITE,
+    CONST_LOG_QUEUE_SIZE,
+    CONST_LOG_SETTINGS_REFRESH_INTERVAL,
+    CONST_LOG_DIR,
+    CONST_ERROR_REPORT_INTERVAL,
+    CONST_ERROR_REPORT_BACKOFF_MAX,
+    CONST_ERROR_REPORT_CONNECT_TIMEOUT,
+    CONST_ERROR_REPORT_READ_TIMEOUT,
+    CONST_ERROR_REPORT_MAX_SIGNATURES
+)
+from src.detached import get_config_settings_detached, insert_action_detached, record_error_reports_detached
 
 if (IS_CONTAINER):
     SITE = os.getenv("SITE", CONST_SITE)
 
-def write_daily_log(logger,message, config_dict):
-    """Write a log message to a daily log file in /database/ if enabled in config."""
-    try:
-        if config_dict != None:
-            if config_dict.get("WriteLogFile", 0) == 1:
-                # Explicitly use /database/ as the log directory
-                log_dir = os.path.abspath(os.path.join(os.sep, "database"))
-                os.makedirs(log_dir, exist_ok=True)
-                log_filename = datetime.now().strftime("%Y-%m-%d.log")
-                log_path = os.path.join(log_dir, log_filename)
-                with open(log_path, "a", encoding="utf-8") as f:
-                    f.write(message + "\n")
-    except Exception as e:
-        # Fallback: print error if logging fails
-        print(f"[WARN] Failed to write to daily log file: {e}")
-        logger.warning(f"[WARN] Failed to write to daily log file: {e}")
+# Settings read from the configuration cache at most every
+# CONST_LOG_SETTINGS_REFRESH_INTERVAL seconds so that a disabled level costs
+# one comparison per call
+_log_level = logging.INFO
+_write_log_file = False
+_log_settings_refresh_at = 0.0
+_log_lines_dropped = 0
+_log_lines_dropped_reported = 0
+_log_listener = None
+_log_listener_lock = threading.Lock()
+_log_queue = queue.Queue(CONST_LOG_QUEUE_SIZE)
+
+# Errors logged since the last report batch, by signature
+_error_reports = {}
+# Errors logged by this process since it started, by signature
+_error_totals = {}
+_error_reports_lock = threading.Lock()
+_error_actions_created = set()
+_error_reporter_thread = None
+_error_session = None
+_send_errors_to_cloud = False
+
+
+def _refresh_log_settings():
+    """Reload LogLevel and WriteLogFile from the cached configuration."""
+    global _log_level, _write_log_file, _log_settings_refresh_at
+    _log_settings_refresh_at = time.monotonic() + CONST_LOG_SETTINGS_REFRESH_INTERVAL
+    config_dict = get_config_settings_detached()
+    if config_dict is None:
+        return
+    level = logging.getLevelName(str(config_dict.get("LogLevel", "INFO")).upper())
+    _log_level = level if isinstance(level, int) else logging.INFO
+    _write_log_file = config_dict.get("WriteLogFile", 0) == 1
+
+
+def _log_enabled(level):
+    if time.monotonic() >= _log_settings_refresh_at:
+        _refresh_log_settings()
+    return level >= _log_level
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller, lines are dropped when the queue is full."""
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        global _log_lines_dropped, _log_lines_dropped_reported
+        try:
+            self.queue.put_nowait(record)
+            if _log_lines_dropped != _log_lines_dropped_reported:
+                dropped = _log_lines_dropped - _log_lines_dropped_reported
+                _log_lines_dropped_reported = _log_lines_dropped
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"[WARN] {dropped} log lines were dropped because the log queue was full",
+                }))
+        except queue.Full:
+            _log_lines_dropped += 1
+
+
+class _DailyLogFileHandler(logging.Handler):
+    """
+    Appends lines to /database/YYYY-MM-DD.log while WriteLogFile is enabled.
+    The file stays open and is only reopened when the date changes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._stream = None
+        self._stream_date = None
+
+    def emit(self, record):
+        if not _write_log_file:
+            self.close_stream()
+            return
+        try:
+            today = datetime.now().strftime("%Y-%m-%d")
+            if self._stream is None or self._stream_date != today:
+                self.close_stream()
+                os.makedirs(CONST_LOG_DIR, exist_ok=True)
+                self._stream = open(os.path.join(CONST_LOG_DIR, f"{today}.log"), "a", encoding="utf-8", buffering=1)
+                self._stream_date = today
+            self._stream.write(record.getMessage() + "\n")
+        except Exception as e:
+            # Fallback: print error if logging fails
+            print(f"[WARN] Failed to write to daily log file: {e}")
+            self.close_stream()
+
+    def close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except Exception:
+                pass
+            self._stream = None
+            self._stream_date = None
+
+    def close(self):
+        self.close_stream()
+        super().close()
+
+
+class _ConsoleHandler(logging.Handler):
+    """Prints lines to stdout from the log writer thread."""
+
+    def emit(self, record):
+        try:
+            print(record.getMessage(), flush=True)
+        except Exception:
+            pass
+
+
+_log_queue_handler = _DroppingQueueHandler(_log_queue)
+
+
+def _start_log_listener():
+    """Start the background thread writing queued lines to the console and daily log file."""
+    global _log_listener
+    with _log_listener_lock:
+        if _log_listener is None:
+            _log_listener = QueueListener(_log_queue, _ConsoleHandler(), _DailyLogFileHandler())
+            _log_listener.start()
+            atexit.register(flush_logs)
+
+
+def flush_logs():
+    """Write out every queued log line and stop the writer thread, it restarts on the next log call."""
+    global _log_listener
+    with _log_listener_lock:
+        if _log_listener is not None:
+            _log_listener.stop()
+            for handler in _log_listener.handlers:
+                handler.close()
+            _log_listener = None
+
+
+def get_log_lines_dropped():
+    """Return the number of log lines dropped because the log queue was full."""
+    return _log_lines_dropped
+
+
+def _emit_log_line(logger, level, formatted_message):
+    # Only hand the line to the stdlib logger when a handler is configured, otherwise
+    # logging's last resort handler would write it to stderr a second time
+    if logger.isEnabledFor(level) and logger.hasHandlers():
+        logger.log(level, formatted_message)
+    if _log_listener is None:
+        _start_log_listener()
+    _log_queue_handler.emit(logging.makeLogRecord({
+        "levelno": level,
+        "levelname": logging.getLevelName(level),
+        "msg": formatted_message,
+    }))
+
 
 def log_info(logger, message):
     """Log a message and print it to the console with timestamp."""
+    if not _log_enabled(logging.INFO):
+        return
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
     script_name = os.path.basename(sys.argv[0])
     formatted_message = f"[{timestamp}] {script_name} {message}"
-    print(formatted_message)
-    logger.info(formatted_message)
-    config_dict = get_config_settings_detached()
-    write_daily_log(logger,formatted_message, config_dict)
+    _emit_log_line(logger, logging.INFO, formatted_message)
 
 def log_warn(logger, message):
     """Log a warning message and print it to the console with timestamp."""
+    if not _log_enabled(logging.WARNING):
+        return
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
     script_name = os.path.basename(sys.argv[0])
     formatted_message = f"[{timestamp}] {script_name} {message}"
-    print(formatted_message)
-    logger.warning(formatted_message)
-    config_dict = get_config_settings_detached()
-    write_daily_log(logger,formatted_message, config_dict)
+    _emit_log_line(logger, logging.WARNING, formatted_message)
 
 def log_error(logger, message):
     """
     Log an error message and optionally report it to the cloud API, excluding specified messages.
-    Also writes to the daily log file if enabled.
+    Also writes to the daily log file if enabled. Errors are always logged regardless of LogLevel.
     """
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
     script_name = os.path.basename(sys.argv[0])
@@ -69,11 +225,9 @@ def log_error(logger, message):
         file_name = script_name
         line_number = "N/A"
     formatted_message = f"[{timestamp}] {script_name}[/{file_name}/{line_number}] {message}"
-    print(formatted_message)
-    logger.error(formatted_message)
-    config_dict = get_config_settings_detached()
-    write_daily_log(logger,formatted_message, config_dict)
-
+    if time.monotonic() >= _log_settings_refresh_at:
+        _refresh_log_settings()
+    _emit_log_line(logger, logging.ERROR, formatted_message)
     excluded_messages = [
         "[ERROR] Failed to download country blocks CSV: 429",
         "[ERROR] Error updating Tor nodes: HTTPSConnectionPool(host='www.dan.me.uk', port=443): Read timed out. (read timeout=30)",
@@ -82,36 +236,191 @@ def log_error(logger, message):
         "[ERROR] Failed to download Tor node list: 403"
 
     ]
+    excluded = any(excluded_msg in message for excluded_msg in excluded_messages)
 
-    if config_dict.get('SendErrorsToCloudApi', 0) == 1:
-        if excluded_messages and any(excluded_msg in message for excluded_msg in excluded_messages):
-            log_info(logger, "[INFO] Error message excluded from cloud API reporting.")
-            return
-        try:
-            import requests
-            url = f"http://api.homelabids.com:8045/api/errorreport/{config_dict['MachineUniqueIdentifier']}"
-            payload = {
-                "error_message": message,
+    # Reporting happens on the error reporter thread, never on the failing code path
+    _record_error(timestamp, script_name, file_name, line_number, message, excluded)
+
+    if excluded and _send_errors_to_cloud:
+        return
+    if SITE == "TESTPPE":
+        exit(0)
+
+
+def _error_signature(script_name, file_name, line_number, message):
+    """Identify repeats of an error, ignoring the numbers (ids, counts, addresses) in its message."""
+    normalized = re.sub(r"\d+", "#", message)[:300]
+    return hashlib.sha1(f"{script_name}|{file_name}|{line_number}|{normalized}".encode("utf-8")).hexdigest()
+
+
+def _record_error(timestamp, script_name, file_name, line_number, message, excluded):
+    """Count an error under its signature for the next report batch."""
+    signature = _error_signature(script_name, file_name, line_number, message)
+    with _error_reports_lock:
+        report = _error_reports.get(signature)
+        if report is None and len(_error_reports) >= CONST_ERROR_REPORT_MAX_SIGNATURES:
+            # Keep counting distinct errors beyond the cap under a single signature
+            signature = "overflow"
+            report = _error_reports.get(signature)
+            message = f"[ERROR] More than {CONST_ERROR_REPORT_MAX_SIGNATURES} distinct errors in one report interval"
+        if report is None:
+            report = _error_reports[signature] = {
                 "script_name": script_name,
                 "file_name": file_name,
-                "timestamp": timestamp,
-                "site": SITE,
-                "line_number": line_number,
-                "machine_unique_identifier": config_dict['MachineUniqueIdentifier']
+                "line_number": str(line_number),
+                "message": message,
+                "excluded": excluded,
+                "first_seen": timestamp,
+                "count": 0,
+                "unrecorded": 0,
             }
-            response = requests.post(url, json=payload)
-            if response.status_code == 200:
-                log_info(logger, "[INFO] Error reported to cloud API successfully.")
+        report["count"] += 1
+        report["unrecorded"] += 1
+        report["last_seen"] = timestamp
+        report["message"] = message
+        _error_totals[signature] = _error_totals.get(signature, 0) + 1
+    _start_error_reporter()
+
+
+def get_error_report_counts():
+    """
+    Return the number of errors logged by this process per signature.
+
+    Returns:
+        dict: signature -> {"count": total occurrences, "pending": occurrences not reported yet}
+    """
+    with _error_reports_lock:
+        return {
+            signature: {"count": total, "pending": _error_reports.get(signature, {}).get("count", 0)}
+            for signature, total in _error_totals.items()
+        }
+
+
+def _post_error_report(session, config_dict, report):
+    """Send one deduplicated error to the cloud API, returning None on success or an error description."""
+    url = f"http://api.homelabids.com:8045/api/errorreport/{config_dict['MachineUniqueIdentifier']}"
+    payload = {
+        "error_message": report["message"],
+        "script_name": report["script_name"],
+        "file_name": report["file_name"],
+        "timestamp": report["last_seen"],
+        "site": SITE,
+        "line_number": report["line_number"],
+        "machine_unique_identifier": config_dict['MachineUniqueIdentifier'],
+        "occurrences": report["count"],
+        "first_seen": report["first_seen"],
+    }
+    try:
+        response = session.post(url, json=payload, timeout=(CONST_ERROR_REPORT_CONNECT_TIMEOUT, CONST_ERROR_REPORT_READ_TIMEOUT))
+        if response.status_code == 200:
+            return None
+        return f"{response.status_code} {url}"
+    except Exception as e:
+        return f"{url}: {e}"
+
+
+def report_pending_errors():
+    """
+    Persist the counts of errors logged since the last batch and report them.
+
+    Each signature is sent to the cloud API once per batch with its number of
+    occurrences when SendErrorsToCloudApi is enabled; otherwise an action is
+    created the first time a signature is seen by this process.
+
+    Returns:
+        bool: False if the cloud API could not be reached and the batch must be retried.
+    """
+    global _send_errors_to_cloud, _error_session
+    logger = logging.getLogger(__name__)
+    with _error_reports_lock:
+        batch = dict(_error_reports)
+        _error_reports.clear()
+    if not batch:
+        return True
+
+    _record_error_counts(batch)
+
+    config_dict = get_config_settings_detached() or {}
+    _send_errors_to_cloud = config_dict.get('SendErrorsToCloudApi', 0) == 1
+    if not _send_errors_to_cloud:
+        for signature, report in batch.items():
+            if signature not in _error_actions_created:
+                _error_actions_created.add(signature)
+                insert_action_detached(
+                    f"A fatal error occured in one of the system processes. It is suggested to turn on 'Send Errors To Cloud API' in settings in order to get these errors automatically sent to the developers. Error is as follows: [{report['last_seen']}] {report['script_name']}[/{report['file_name']}/{report['line_number']}] {report['message']}"
+                )
+        return True
+
+    if _error_session is None:
+        import requests
+        _error_session = requests.Session()
+
+    # Excluded signatures are only counted, never sent or retried
+    unsent = [(signature, report) for signature, report in batch.items() if not report["excluded"]]
+    reported = 0
+    for signature, report in unsent:
+        error = _post_error_report(_error_session, config_dict, report)
+        if error is not None:
+            log_warn(logger, f"[WARN] Failed to report errors to cloud API, will retry: {error}")
+            # Put the unsent reports back so their counts are sent with the next batch
+            with _error_reports_lock:
+                for retry_signature, retry_report in unsent[reported:]:
+                    current = _error_reports.get(retry_signature)
+                    if current:
+                        # Only the counts were recorded already, the new occurrences are not
+                        current["count"] += retry_report["count"]
+                        current["first_seen"] = retry_report["first_seen"]
+                    else:
+                        _error_reports[retry_signature] = retry_report
+            return False
+        reported += 1
+    if reported:
+        log_info(logger, f"[INFO] Reported {reported} distinct errors to cloud API.")
+    return True
+
+
+def _error_reporter_loop():
+    interval = CONST_ERROR_REPORT_INTERVAL
+    while True:
+        time.sleep(interval)
+        try:
+            if report_pending_errors():
+                interval = CONST_ERROR_REPORT_INTERVAL
             else:
-                log_warn(logger, f"[WARN] Failed to report error to cloud API: {response.status_code} {url}")
+                interval = min(interval * 2, CONST_ERROR_REPORT_BACKOFF_MAX)
         except Exception as e:
-            log_warn(logger, f"[WARN] Failed to send error report to cloud API {url}: {e}")
-    else:
-        insert_action_detached(
-            f"A fatal error occured in one of the system processes. It is suggested to turn on 'Send Errors To Cloud API' in settings in order to get these errors automatically sent to the developers. Error is as follows: [{timestamp}] {script_name}[/{file_name}/{line_number}] {message}"
-        )
-    if SITE == "TESTPPE":
-        exit(0)
+            print(f"[WARN] Error reporter iteration failed: {e}")
+
+
+def _start_error_reporter():
+    global _error_reporter_thread
+    if _error_reporter_thread is not None:
+        return
+    with _error_reports_lock:
+        if _error_reporter_thread is None:
+            _error_reporter_thread = threading.Thread(target=_error_reporter_loop, name="error-reporter", daemon=True)
+            _error_reporter_thread.start()
+            atexit.register(_persist_pending_error_counts)
+
+
+def _record_error_counts(reports):
+    """Add the occurrences not recorded yet to the errorreports table."""
+    rows = [
+        (signature, report["script_name"], report["file_name"], report["line_number"], report["message"],
+         report["unrecorded"], report["first_seen"], report["last_seen"])
+        for signature, report in reports.items()
+        if report["unrecorded"]
+    ]
+    if rows:
+        record_error_reports_detached(rows)
+    for report in reports.values():
+        report["unrecorded"] = 0
+
+
+def _persist_pending_error_counts():
+    """Keep the counts of unreported errors when the process exits, without waiting on the network."""
+    with _error_reports_lock:
+        _record_error_counts(_error_reports)
 
 
 def dump_json(obj):
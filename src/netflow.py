@@ -89,33 +89,43 @@ def process_netflow_packets():
     """Process queued packets at fixed interval"""
     logger = logging.getLogger(__name__)
 
+    # Config and ignorelist are only reloaded when another process announces a
+    # change on the event bus, with a periodic reload as a fallback
+    event_socket = subscribe_events("collector")
+    config_dict = None
+    last_refresh = 0
+
     while True:
         try:
-
-            ignorelist = get_ignorelist()
-            config_dict = get_config_settings()
- 
-            if not config_dict:
-                log_error(logger, "[ERROR] Failed to load configuration settings")
-                time.sleep(60)  # Wait before retry
-                continue
-
-            tag_entries_json = config_dict.get("TagEntries", "[]")
-            tag_entries = []
-            if tag_entries_json != "[]":
-                tag_entries = json.loads(tag_entries_json)
-  
-            LOCAL_NETWORKS = get_local_network_cidrs(config_dict)
-
-            # Calculate broadcast addresses for all local networks
-            broadcast_addresses = set()
-            if len(LOCAL_NETWORKS) > 0:
-                for network in LOCAL_NETWORKS:
-                    broadcast_ip = calculate_broadcast(network)
-                    if broadcast_ip:
-                        broadcast_addresses.add(broadcast_ip)
-                broadcast_addresses.add('255.255.255.255')
-                broadcast_addresses.add('0.0.0.0')
+            changes = wait_for_events(event_socket, 0, [CONST_EVENT_CONFIG_CHANGED, CONST_EVENT_IGNORELIST_CHANGED])
+
+            if not config_dict or changes or time.time() - last_refresh > CONST_EVENT_FALLBACK_REFRESH_SECONDS:
+                ignorelist = get_ignorelist()
+                config_dict = get_config_settings()
+     
+                if not config_dict:
+                    log_error(logger, "[ERROR] Failed to load configuration settings")
+                    time.sleep(60)  # Wait before retry
+                    continue
+
+                tag_entries_json = config_dict.get("TagEntries", "[]")
+                tag_entries = []
+                if tag_entries_json != "[]":
+                    tag_entries = json.loads(tag_entries_json)
+      
+                LOCAL_NETWORKS = get_local_network_cidrs(config_dict)
+
+                # Calculate broadcast addresses for all local networks
+                broadcast_addresses = set()
+                if len(LOCAL_NETWORKS) > 0:
+                    for network in LOCAL_NETWORKS:
+                        broadcast_ip = calculate_broadcast(network)
+                        if broadcast_ip:
+                            broadcast_addresses.add(broadcast_ip)
+                    broadcast_addresses.add('255.255.255.255')
+                    broadcast_addresses.add('0.0.0.0')
+
+                last_refresh = time.time()
         except Exception as e:
             log_error(logger, f"[ERROR] Dependencies for collector not met {e}")
 
@@ -167,6 +177,9 @@ def process_netflow_packets():
 
                 log_info(logger, f"[INFO] Processed {total_flows} flows from {len(packets)} packets")
 
+                if total_flows > 0:
+                    publish_event(CONST_EVENT_FLOW_BATCH_READY, {"flows": total_flows})
+
                 last_flows = total_flows
                 last_bytes = total_bytes
                 last_packets = total_packets
@@ -12,6 +12,7 @@ import logging
 
 
 from init import *
+from database.tagdictionary import tags_to_mask
 
 
 def tag_ignorelist(record, ignorelist_entries):
@@ -185,7 +186,7 @@ def apply_tags(record, ignorelist_entries, broadcast_addresses, tag_entries, con
         tag_entries: List of custom tag entries
 
     Returns:
-        record: Updated record with tags
+        record: Updated record with tags and the matching tag_mask bitmask
     """
     # Initialize tags if not present
     if 'tags' not in record:
@@ -216,5 +217,7 @@ def apply_tags(record, ignorelist_entries, broadcast_addresses, tag_entries, con
             if custom_tags:
                 record['tags'] += custom_tags
 
+    record['tag_mask'] = tags_to_mask(record['tags'])
+
     return record
 
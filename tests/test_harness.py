@@ -31,6 +31,7 @@ from src.tags import apply_tags
 from src.detections import (
     update_local_hosts,
     detect_new_outbound_connections,
+    ensure_seen_destinations,
     router_flows_detection,
     foreign_flows_detection,
     local_flows_detection,
@@ -413,6 +414,7 @@ def main():
     # Convert back to arrays for use in update_allflows
     tagged_rows = [[row[col] if col in row else None for col in column_names] for row in tagged_rows_as_dicts]
 
+    ensure_seen_destinations(config_dict)
     update_all_flows(tagged_rows, config_dict)
     update_traffic_stats(tagged_rows, config_dict)
 
@@ -0,0 +1,384 @@
+"""
+Query plan regression tests for the hot queries.
+
+Every database is created through the normal create_table paths in a temporary
+directory and seeded with a synthetic dataset. Each registered hot query is run
+through the function that owns it while the SQL it executes is traced. The test
+then checks EXPLAIN QUERY PLAN of that statement for the expected indexes and
+times the function against a regression threshold.
+
+Run with: python -m unittest tests/test_query_plans.py
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import unittest
+from collections import namedtuple
+from datetime import datetime, timedelta
+from pathlib import Path
+current_dir = Path(__file__).resolve().parent
+parent_dir = str(current_dir.parent)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+src_dir = f"{parent_dir}/src"
+if str(src_dir) not in sys.path:
+    sys.path.insert(0, str(src_dir))
+
+# log_error exits the process on the TESTPPE site
+os.environ.setdefault("SITE", "QUERYPLANTEST")
+import init  # loads the modules in dependency order
+import database.core as core
+import src.detached as detached
+from src.const import (
+    TABLE_DB_MAP,
+    CONST_CONFIGURATION_DB,
+    CONST_CREATE_CONFIG_SQL,
+    CONST_CREATE_DBPERFORMANCE_SQL,
+    CONST_CREATE_LOCALHOSTS_SQL,
+    CONST_CREATE_ALERTS_SQL,
+    CONST_CREATE_TRAFFICSTATS_SQL,
+    CONST_CREATE_ALLFLOWS_SQL,
+    CONST_CREATE_TAGDICTIONARY_SQL,
+    CONST_CREATE_FLOWTAGSOVERFLOW_SQL,
+    CONST_CREATE_EXPLORE_SQL,
+    CONST_CREATE_DNSKEYVALUE_SQL,
+    CONST_CREATE_DNSQUERIES_SQL,
+    CONST_CREATE_GEOLOCATION_SQL,
+    CONST_CREATE_IPASN_SQL
+)
+from src.network import ip_to_int
+from database.core import create_table, connect_to_db, disconnect_from_db, flush_query_telemetry
+from database.allflows import (
+    get_flows_by_source_ip,
+    get_dead_connections_from_database,
+    get_tag_statistics,
+    get_outbound_destinations
+)
+from database.alerts import summarize_alerts_by_ip, get_recent_alerts_by_ip
+from database.trafficstats import get_traffic_stats_for_ip
+from database.dnsqueries import get_ip_domains, reset_ip_domain_cache
+from database.explore import (
+    get_latest_master_flows,
+    get_explore_summary,
+    search_master_flows,
+    refresh_master_flow_view,
+    encode_explore_cursor,
+    parse_explore_filters
+)
+
+SEED_HOSTS = 200
+SEED_FLOWS = 50000
+SEED_ALERTS = 20000
+SEED_TRAFFIC_HOURS = 100
+SEED_EXPLORE = 50000
+SEED_IP_DOMAINS = 20000
+# Addresses with DNS answers, 10.0.0.0 onwards
+SEED_DNS_IPS = [f"10.0.{i // 256}.{i % 256}" for i in range(SEED_IP_DOMAINS)]
+
+# match: substring identifying the traced statement to explain
+# expect: substrings that must appear in the query plan
+# no_scan: tables that must not be read with a full scan
+# max_ms: regression threshold for the best of three runs of the function
+HotQuery = namedtuple("HotQuery", ["name", "run", "match", "expect", "no_scan", "max_ms"])
+
+HOT_QUERIES = [
+    HotQuery(
+        "get_flows_by_source_ip",
+        lambda: get_flows_by_source_ip("192.168.1.10"),
+        "WHERE src_ip_int =",
+        ["SEARCH allflowscompact USING PRIMARY KEY (src_ip=?)"],
+        ["allflowscompact"],
+        50,
+    ),
+    HotQuery(
+        "get_dead_connections_from_database",
+        get_dead_connections_from_database,
+        "LEFT JOIN allflows a2",
+        ["SEARCH allflowscompact USING PRIMARY KEY (src_ip=? AND dst_ip=? AND src_port=? AND dst_port=? AND protocol=?)"],
+        [],
+        2000,
+    ),
+    HotQuery(
+        "get_tag_statistics",
+        lambda: get_tag_statistics("192.168.1.10"),
+        "split_tags",
+        ["USING PRIMARY KEY (src_ip=?)", "USING INDEX idx_allflowscompact_dst_ip (dst_ip=?)"],
+        ["allflowscompact"],
+        100,
+    ),
+    HotQuery(
+        "get_outbound_destinations",
+        lambda: get_outbound_destinations((datetime.now() - timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')),
+        "last_seen_epoch >=",
+        ["idx_allflowscompact_last_seen"],
+        ["allflowscompact"],
+        200,
+    ),
+    HotQuery(
+        "get_traffic_stats_for_ip",
+        lambda: get_traffic_stats_for_ip("192.168.1.10"),
+        "FROM trafficstats",
+        ["(ip_address=?)"],
+        ["trafficstats"],
+        100,
+    ),
+    HotQuery(
+        "summarize_alerts_by_ip",
+        summarize_alerts_by_ip,
+        "LEFT JOIN alerts.alerts a",
+        ["idx_alerts_ip_address (ip_address=?)"],
+        ["a"],
+        500,
+    ),
+    HotQuery(
+        "get_recent_alerts_by_ip",
+        lambda: get_recent_alerts_by_ip("192.168.1.10"),
+        "WHERE ip_address =",
+        ["idx_alerts_ip_address (ip_address=?)"],
+        ["alerts"],
+        100,
+    ),
+    HotQuery(
+        "refresh_master_flow_view",
+        refresh_master_flow_view,
+        "a.last_seen_epoch >=",
+        ["idx_allflowscompact_last_seen"],
+        ["allflowscompact"],
+        500,
+    ),
+    HotQuery(
+        "get_latest_master_flows",
+        lambda: get_latest_master_flows(100, 0, encode_explore_cursor(50000, SEED_EXPLORE)),
+        "(packets, flow_id) <",
+        ["SEARCH explore USING INDEX idx_explore_packets"],
+        ["explore"],
+        50,
+    ),
+    # Page numbers still walk the index up to the offset
+    HotQuery(
+        "get_latest_master_flows_by_page",
+        lambda: get_latest_master_flows(100, 5),
+        "LIMIT 100 OFFSET 500",
+        ["SCAN explore USING INDEX idx_explore_packets"],
+        [],
+        100,
+    ),
+    HotQuery(
+        "get_latest_master_flows_filtered",
+        lambda: get_latest_master_flows(100, 0, None, parse_explore_filters({"ip": "192.168.1.10", "dst_port": "443"})),
+        "ORDER BY +packets DESC",
+        ["MULTI-INDEX OR", "idx_explore_flow_key (src_ip_int=?)", "idx_explore_dst_ip_int (dst_ip_int=?)"],
+        ["explore"],
+        100,
+    ),
+    HotQuery(
+        "search_master_flows",
+        lambda: search_master_flows("google"),
+        "JOIN explore e",
+        ["SCAN explorefts VIRTUAL TABLE INDEX", "SEARCH e USING INTEGER PRIMARY KEY (rowid=?)"],
+        ["e"],
+        500,
+    ),
+    HotQuery(
+        "get_explore_summary",
+        lambda: get_explore_summary("country", 10),
+        "FROM exploresummary",
+        ["SEARCH exploresummary USING INDEX idx_exploresummary_bytes (dimension=?)"],
+        ["exploresummary"],
+        50,
+    ),
+    # A flow enrichment chunk, read without the cache
+    HotQuery(
+        "get_ip_domains",
+        lambda: (reset_ip_domain_cache(), get_ip_domains(SEED_DNS_IPS[::20])),
+        "FROM ipdomains",
+        ["SEARCH ipdomains USING INDEX sqlite_autoindex_ipdomains_1 (ip=?)"],
+        ["ipdomains"],
+        100,
+    ),
+]
+
+_traced = []
+_tracing = False
+
+
+def _traced_open_connection(open_connection):
+    def wrapper(db_name, read_only):
+        conn = open_connection(db_name, read_only)
+        conn.set_trace_callback(lambda sql, conn=conn: _tracing and _traced.append((conn, sql)))
+        return conn
+    return wrapper
+
+
+def _redirect_databases(directory):
+    """Point every table at a database file in directory, for both module copies of const."""
+    for module_name in ("const", "src.const"):
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        for table, db_path in list(module.TABLE_DB_MAP.items()):
+            module.TABLE_DB_MAP[table] = os.path.join(directory, os.path.basename(db_path))
+    detached.CONST_CONFIGURATION_DB = os.path.join(directory, os.path.basename(CONST_CONFIGURATION_DB))
+    detached.reset_config_cache()
+
+
+def _seed(rng):
+    now = datetime.now()
+    hosts = [f"192.168.1.{i}" for i in range(1, SEED_HOSTS + 1)]
+    remote = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(5000)]
+
+    conn = connect_to_db("localhosts")
+    conn.executemany("INSERT INTO localhosts (ip_address, first_seen) VALUES (?, ?)",
+                     [(host, now.strftime('%Y-%m-%d %H:%M:%S')) for host in hosts])
+    conn.commit()
+    disconnect_from_db(conn)
+
+    epoch = int(time.time())
+    flows = {}
+    while len(flows) < SEED_FLOWS:
+        src_ip, dst_ip = rng.choice(hosts), rng.choice(remote)
+        if rng.random() < 0.5:
+            src_ip, dst_ip = dst_ip, src_ip
+        key = (ip_to_int(src_ip), ip_to_int(dst_ip), rng.randint(1024, 65535), rng.choice([53, 80, 123, 443, 8080]), rng.choice([6, 17]))
+        last_seen = epoch - rng.randint(0, 14 * 86400)
+        flows[key] = (rng.randint(1, 1000), rng.randint(60, 1000000), last_seen - 3600, last_seen, rng.randint(1, 50), last_seen,
+                      rng.choice(["", "", "DNS;", "IgnoreList_1;"]))
+    conn = connect_to_db("allflows")
+    conn.executemany("""
+        INSERT INTO allflowscompact (src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes, flow_start, flow_end, times_seen, last_seen, tags)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [key + value for key, value in flows.items()])
+    conn.commit()
+    disconnect_from_db(conn)
+
+    conn = connect_to_db("alerts")
+    conn.executemany("""
+        INSERT INTO alerts (id, ip_address, flow, category, times_seen, first_seen, last_seen, acknowledged)
+        VALUES (?, ?, '{}', ?, 1, ?, ?, 0)
+    """, [(f"alert{i}", rng.choice(hosts), rng.choice(["NewOutboundConnection", "DeadConnection", "HighRiskPort"]),
+           (now - timedelta(minutes=rng.randint(0, 11 * 60))).strftime('%Y-%m-%d %H:%M:%S'),
+           (now - timedelta(minutes=rng.randint(0, 11 * 60))).strftime('%Y-%m-%d %H:%M:%S'))
+          for i in range(SEED_ALERTS)])
+    conn.commit()
+    disconnect_from_db(conn)
+
+    conn = connect_to_db("trafficstats")
+    conn.executemany("INSERT INTO trafficstats (ip_address, timestamp, total_packets, total_bytes) VALUES (?, ?, ?, ?)",
+                     [(host, (now - timedelta(hours=hour)).strftime('%Y-%m-%d-%H'), rng.randint(1, 1000), rng.randint(1, 100000))
+                      for host in hosts for hour in range(SEED_TRAFFIC_HOURS)])
+    conn.commit()
+    disconnect_from_db(conn)
+
+    conn = connect_to_db("explore")
+    explore_rows = []
+    for flow_id in range(SEED_EXPLORE):
+        src_ip, dst_ip = rng.choice(hosts), rng.choice(remote)
+        dst_dns = rng.choice(["www.google.com", "api.github.com", "cdn.example.net", ""])
+        country = rng.choice(["US", "DE", "JP", "BR"])
+        explore_rows.append((flow_id, src_ip, dst_ip, ip_to_int(src_ip), ip_to_int(dst_ip), rng.randint(1024, 65535),
+                             rng.choice([53, 80, 443]), "TCP", "", now.strftime('%Y-%m-%d %H:%M:%S'), now.strftime('%Y-%m-%d %H:%M:%S'),
+                             rng.randint(1, 100000), rng.randint(60, 10000000), rng.randint(1, 50), "", dst_dns, "", country,
+                             "", "AS15169", "", "Example ISP", src_ip))
+    conn.executemany(f"INSERT INTO explore VALUES ({', '.join('?' * 23)})", explore_rows)
+    conn.commit()
+    disconnect_from_db(conn)
+
+    conn = connect_to_db("ipdomains")
+    conn.executemany("INSERT INTO ipdomains (ip, domain, last_seen) VALUES (?, ?, ?)",
+                     [(ip, rng.choice(["www.google.com", "api.github.com", "cdn.example.net"]), now.strftime('%Y-%m-%d %H:%M:%S'))
+                      for ip in SEED_DNS_IPS])
+    conn.commit()
+    disconnect_from_db(conn)
+
+    conn = connect_to_db("explore")
+    # Incremental refreshes pick up the flows of the last hour
+    conn.execute("INSERT INTO explorestate (name, value) VALUES ('watermark', ?)", (epoch - 3600,))
+    conn.commit()
+    disconnect_from_db(conn)
+
+    for table in ("allflowscompact", "alerts", "localhosts", "trafficstats", "explore"):
+        conn = connect_to_db(table)
+        conn.execute("ANALYZE")
+        conn.commit()
+        disconnect_from_db(conn)
+
+
+def setUpModule():
+    global _temp_dir
+    _temp_dir = tempfile.TemporaryDirectory()
+    _redirect_databases(_temp_dir.name)
+    core._open_connection = _traced_open_connection(core._open_connection)
+
+    create_table(CONST_CREATE_CONFIG_SQL, "configuration")
+    create_table(CONST_CREATE_DBPERFORMANCE_SQL, "dbperformance")
+    create_table(CONST_CREATE_LOCALHOSTS_SQL, "localhosts")
+    create_table(CONST_CREATE_ALERTS_SQL, "alerts")
+    create_table(CONST_CREATE_TRAFFICSTATS_SQL, "trafficstats")
+    create_table(CONST_CREATE_ALLFLOWS_SQL, "allflows")
+    create_table(CONST_CREATE_TAGDICTIONARY_SQL, "tagdictionary")
+    create_table(CONST_CREATE_FLOWTAGSOVERFLOW_SQL, "flowtagsoverflow")
+    create_table(CONST_CREATE_EXPLORE_SQL, "explore")
+    create_table(CONST_CREATE_DNSKEYVALUE_SQL, "dnskeyvalue")
+    create_table(CONST_CREATE_DNSQUERIES_SQL, "dnsqueries")
+    create_table(CONST_CREATE_GEOLOCATION_SQL, "geolocation")
+    create_table(CONST_CREATE_IPASN_SQL, "ipasn")
+    _seed(random.Random(42))
+
+
+def tearDownModule():
+    global _tracing
+    _tracing = False
+    flush_query_telemetry()
+    for db_path in set(TABLE_DB_MAP.values()):
+        core.close_pooled_connections(db_path)
+    _temp_dir.cleanup()
+
+
+class QueryPlanTest(unittest.TestCase):
+
+    def _run_traced(self, hot_query):
+        global _tracing
+        del _traced[:]
+        _tracing = True
+        try:
+            start = time.perf_counter()
+            hot_query.run()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        finally:
+            _tracing = False
+        return elapsed_ms, list(_traced)
+
+    def _query_plan(self, conn, sql):
+        details = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+        return details
+
+    def test_hot_query_plans(self):
+        for hot_query in HOT_QUERIES:
+            with self.subTest(query=hot_query.name):
+                _, traced = self._run_traced(hot_query)
+                statements = [(conn, sql) for conn, sql in traced if hot_query.match in sql]
+                self.assertTrue(statements, f"{hot_query.name} did not execute a statement containing {hot_query.match!r}")
+
+                conn, sql = statements[0]
+                plan = self._query_plan(conn, sql)
+                plan_text = "\n".join(plan)
+                for expected in hot_query.expect:
+                    self.assertIn(expected, plan_text, f"{hot_query.name} no longer uses {expected!r}:\n{plan_text}")
+                for detail in plan:
+                    scan = re.match(r"SCAN (\w+)", detail)
+                    if scan:
+                        self.assertNotIn(scan.group(1), hot_query.no_scan, f"{hot_query.name} scans {scan.group(1)}:\n{plan_text}")
+
+    def test_hot_query_timings(self):
+        for hot_query in HOT_QUERIES:
+            with self.subTest(query=hot_query.name):
+                best_ms = min(self._run_traced(hot_query)[0] for _ in range(3))
+                self.assertLessEqual(best_ms, hot_query.max_ms,
+                                     f"{hot_query.name} took {best_ms:.1f} ms, threshold {hot_query.max_ms} ms")
+
+
+if __name__ == "__main__":
+    unittest.main()